@@ -0,0 +1,308 @@
+"""
+Medidas de rendimiento del puente
+
+Uso:
+    python bench.py <escenario> [n]
+
+Escenarios:
+    pool    arranque y rendimiento de un proceso por vehículo frente al
+            grupo fijo de trabajadores de puente_pool
+    layout  entradas y salidas por segundo del Monitor con el estado en un
+            único RawArray frente a siete Value('i') sincronizados
+    wakeups despertares (y despertares inútiles) con el relevo contado del
+            Monitor frente a despertar a todos con notify_all
+    async   memoria por vehículo esperando y vehículos por segundo con los
+            coches como corrutinas de puente_async
+"""
+
+import sys
+import time
+import asyncio
+import tracemalloc
+from multiprocessing import Process, Queue
+from multiprocessing import Lock, Condition, Value
+
+from puente_03 import Monitor, NORTH, SOUTH, WAITING, ON, WAKEUPS, FAILED_WAKEUPS
+from puente_03 import ADMITTED, URGENT, SEQ
+import puente_pool
+import puente_async
+
+
+def quiet_car(cid: int, direction: int, monitor: Monitor) -> None:
+    '''
+    Un coche sin esperas ni mensajes: sólo entra y sale del monitor, para
+    medir el coste de la gestión de los vehículos y no el del puente
+    '''
+    monitor.wants_enter_car(direction)
+    monitor.leaves_car(direction)
+
+
+def report(title: str, n: int, startup: float, total: float) -> None:
+    print(f"{title:<12} n={n:<6} arranque {startup*1000:9.1f} ms   "
+          f"total {total*1000:9.1f} ms   {n/total:10.0f} vehículos/s")
+
+
+def bench_pool(n: int = 200) -> None:
+    '''
+    Lanza n coches (alternando dirección) de las dos formas:
+        - un Process por coche, como gen_cars de puente_03
+        - un grupo de puente_pool.NWORKERS trabajadores alimentado por una cola
+
+    El arranque es el tiempo hasta tener todos los procesos lanzados (un
+    proceso por coche) o el grupo listo; el total incluye además que todos
+    los coches hayan salido del puente.
+    '''
+    monitor = Monitor()
+    t0 = time.perf_counter()
+    plst = []
+    for cid in range(n):
+        p = Process(target=quiet_car, args=(cid, cid % 2, monitor))
+        p.start()
+        plst.append(p)
+    t1 = time.perf_counter()
+    for p in plst:
+        p.join()
+    t2 = time.perf_counter()
+    report("procesos", n, t1 - t0, t2 - t0)
+
+    monitor = Monitor()
+    jobs = Queue()
+    t0 = time.perf_counter()
+    wlst = puente_pool.start_workers(jobs, monitor)
+    t1 = time.perf_counter()
+    for cid in range(n):
+        jobs.put((quiet_car, (cid, cid % 2)))
+    puente_pool.stop_workers(jobs, wlst)
+    t2 = time.perf_counter()
+    report(f"pool x{len(wlst)}", n, t1 - t0, t2 - t0)
+
+
+class ValueMonitor():
+    '''
+    Copia de la parte de coches del Monitor de puente_03 tal como era antes
+    de agrupar el estado: siete Value('i'), cada uno con su propio cerrojo,
+    leídos y escritos dentro de self.mutex
+    '''
+
+    def __init__(self):
+        self.mutex = Lock()
+        self.ncar_north = Value('i', 0)
+        self.ncar_south = Value('i', 0)
+        self.nped = Value('i', 0)
+        self.ncar_waiting_north = Value('i',0)
+        self.ncar_waiting_south = Value('i',0)
+        self.nped_waiting = Value('i',0)
+        self.turn = Value('i',0)
+        self.can_north_cars=Condition(self.mutex)
+        self.can_south_cars=Condition(self.mutex)
+        self.can_ped=Condition(self.mutex)
+
+    def north_cars(self):
+        return self.ncar_south.value == 0 and self.nped.value==0 and\
+            (self.turn.value == 0 or (self.ncar_waiting_south.value == 0 and\
+            self.nped_waiting.value == 0))
+
+    def south_cars(self):
+        return self.ncar_north.value == 0 and self.nped.value==0 and\
+            (self.turn.value == 1 or (self.ncar_waiting_north.value == 0 and\
+            self.nped_waiting.value == 0))
+
+    def wants_enter_car(self, direction: int) -> None:
+        self.mutex.acquire()
+        if direction == 0 :
+            self.ncar_waiting_north.value += 1
+            self.can_north_cars.wait_for(self.north_cars)
+            self.ncar_waiting_north.value -=1
+            self.ncar_north.value += 1
+        elif direction == 1 :
+            self.ncar_waiting_south.value += 1
+            self.can_south_cars.wait_for(self.south_cars)
+            self.ncar_waiting_south.value -=1
+            self.ncar_south.value += 1
+        self.mutex.release()
+
+    def leaves_car(self, direction: int) -> None:
+        self.mutex.acquire()
+        if direction == 0:
+            self.ncar_north.value -= 1
+            if self.ncar_waiting_south.value != 0:
+                self.turn.value = 1
+                if self.ncar_north.value == 0:
+                    self.can_south_cars.notify_all()
+            elif self.nped_waiting.value != 0:
+                self.turn.value = 2
+                if self.ncar_north.value==0:
+                    self.can_ped.notify_all()
+            else:
+                self.turn.value = 0
+        elif direction == 1:
+            self.ncar_south.value -= 1
+            if self.nped_waiting.value != 0:
+                self.turn.value = 2
+                if self.ncar_south.value == 0:
+                    self.can_ped.notify_all()
+            elif self.ncar_waiting_north.value != 0:
+                self.turn.value = 0
+                if self.ncar_south.value == 0:
+                    self.can_north_cars.notify_all()
+                else:
+                    self.turn.value = 1
+        self.mutex.release()
+
+
+def enter_leave_loop(monitor, direction: int, n: int) -> None:
+    for _ in range(n):
+        monitor.wants_enter_car(direction)
+        monitor.leaves_car(direction)
+
+
+def bench_layout(n: int = 100000, nprocs: int = 4) -> None:
+    '''
+    Pares entrada/salida por segundo de cada representación del estado:
+        - un solo proceso haciendo n pares (coste sin contención)
+        - nprocs procesos en la misma dirección repartiéndose los n pares
+          (coste con el mutex disputado)
+    '''
+    for title, factory in (("Value x7", ValueMonitor), ("RawArray", Monitor)):
+        monitor = factory()
+        t0 = time.perf_counter()
+        enter_leave_loop(monitor, 0, n)
+        single = time.perf_counter() - t0
+
+        monitor = factory()
+        plst = [Process(target=enter_leave_loop, args=(monitor, 0, n // nprocs))
+                for _ in range(nprocs)]
+        t0 = time.perf_counter()
+        for p in plst:
+            p.start()
+        for p in plst:
+            p.join()
+        shared = time.perf_counter() - t0
+        print(f"{title:<10} 1 proceso {n/single:10.0f} pares/s   "
+              f"{nprocs} procesos {n/shared:10.0f} pares/s")
+
+
+class HerdMonitor(Monitor):
+    '''
+    El Monitor con la forma de despertar anterior: al cambiar el turno se
+    despierta a todos los de la clase (notify_all) y cada uno vuelve a
+    evaluar su predicado, como hacía wait_for
+    '''
+
+    def _enter(self, cls: int, priority: int = 0, timeout: float = None) -> bool:
+        '''
+        Como Monitor._enter (prioridad, plazo y contadores), pero al
+        despertar vuelve a evaluar el predicado en lugar de recoger una
+        entrada concedida
+        '''
+        condition, predicate = self._gate(cls)
+        state = self.state
+        if priority > 0:
+            state[URGENT + cls] += 1
+        state[WAITING + cls] += 1
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            state[SEQ] += 1
+            notified = condition.wait(remaining)
+            state[SEQ] += 1
+            if notified:
+                state[WAKEUPS] += 1
+            if predicate():
+                break
+            if not notified:
+                self._withdraw(cls, priority)
+                return False
+            state[FAILED_WAKEUPS] += 1
+        state[WAITING + cls] -= 1
+        state[ON + cls] += 1
+        state[ADMITTED + cls] += 1
+        self.policy.entered(self, cls)
+        if priority > 0:
+            state[URGENT + cls] -= 1
+        return True
+
+    def _admit_waiting(self, cls: int) -> None:
+        self._gate(cls)[0].notify_all()
+
+
+def crossing_loop(monitor, direction: int, n: int) -> None:
+    for _ in range(n):
+        monitor.wants_enter_car(direction)
+        time.sleep(0.005)
+        monitor.leaves_car(direction)
+
+
+def bench_wakeups(n: int = 2000, nprocs: int = 8) -> None:
+    '''
+    nprocs procesos por dirección cruzan n veces en total cada uno de los
+    dos sentidos, con un pequeño tiempo en el puente para que se formen
+    colas y el turno cambie a menudo
+    '''
+    for title, factory in (("notify_all", HerdMonitor), ("relevo", Monitor)):
+        monitor = factory()
+        plst = [Process(target=crossing_loop, args=(monitor, d, n // nprocs))
+                for d in (NORTH, SOUTH) for _ in range(nprocs)]
+        t0 = time.perf_counter()
+        for p in plst:
+            p.start()
+        for p in plst:
+            p.join()
+        total = time.perf_counter() - t0
+        wakeups, failed = monitor.wakeups()
+        print(f"{title:<11} {2*n/total:8.0f} cruces/s   despertares {wakeups:7d}"
+              f"   sin poder entrar {failed:7d}")
+
+
+async def quiet_async_car(cid: int, direction: int, monitor) -> None:
+    await monitor.wants_enter_car(direction)
+    await monitor.leaves_car(direction)
+
+
+async def async_waiting(n: int) -> None:
+    monitor = puente_async.AsyncMonitor()
+    # un coche en dirección sur ocupa el puente y los n del norte se quedan
+    # todos esperando en el monitor
+    await monitor.wants_enter_car(SOUTH)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(quiet_async_car(cid, NORTH, monitor))
+             for cid in range(n)]
+    while monitor.state[WAITING + NORTH] < n:
+        await asyncio.sleep(0)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    await monitor.leaves_car(SOUTH)
+    await asyncio.gather(*tasks)
+    total = time.perf_counter() - t0
+    print(f"{n} coches esperando: {used/n/1024:.1f} KiB por coche, "
+          f"salen en {total*1000:.1f} ms ({n/total:.0f} coches/s)")
+
+
+def bench_async(n: int = 20000) -> None:
+    '''
+    Deja n coches bloqueados a la vez en el AsyncMonitor, mide la memoria
+    que ocupan (tracemalloc) y el tiempo hasta que todos han entrado y salido
+    '''
+    asyncio.run(async_waiting(n))
+
+
+SCENARIOS = {
+    'pool': bench_pool,
+    'layout': bench_layout,
+    'wakeups': bench_wakeups,
+    'async': bench_async,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in SCENARIOS:
+        print(__doc__)
+        sys.exit(1)
+    args = [int(a) for a in sys.argv[2:]]
+    SCENARIOS[sys.argv[1]](*args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""
+Banco de pruebas común para los Monitor de puente_01, puente_02 y puente_03
+
+Uso:
+    python bench_versiones.py [--versions puente_01,puente_02,puente_03]
+                              [--seeds 3] [--scale 0.02] [--timeout 10]
+                              [--out bench_versiones.json]
+
+Cada versión recibe exactamente la misma secuencia de llegadas (generada con
+una semilla) para cada escenario. Los vehículos son hilos dentro de un proceso
+hijo por ejecución, de modo que una versión que se bloquea o lanza
+excepciones se puede dar por perdida sin afectar al resto. Los tiempos se
+comprimen con --scale (0.02 = 50 veces más rápido que el tiempo real) y los
+resultados se dan ya en segundos sin comprimir.
+"""
+
+import json
+import time
+import random
+import argparse
+import importlib
+import threading
+from multiprocessing import Process, Queue
+
+NORTH = 0
+SOUTH = 1
+PED = 2
+NAMES = ('north', 'south', 'ped')
+
+# escenarios: número de vehículos, tiempos medios entre llegadas y tiempos de
+# cruce; el primero es el de main() en puente_03
+SCENARIOS = [
+    {'name': 'base', 'ncars': 100, 'nped': 10, 'time_cars_north': 0.5,
+     'time_cars_south': 0.5, 'time_ped': 5, 'cross_car': 0.5, 'cross_ped': 1.0},
+    {'name': 'saturado', 'ncars': 150, 'nped': 30, 'time_cars_north': 0.2,
+     'time_cars_south': 0.2, 'time_ped': 1, 'cross_car': 0.5, 'cross_ped': 1.0},
+    {'name': 'asimetrico', 'ncars': 100, 'nped': 10, 'time_cars_north': 0.2,
+     'time_cars_south': 1.0, 'time_ped': 5, 'cross_car': 0.5, 'cross_ped': 1.0},
+    {'name': 'peatones_lentos', 'ncars': 60, 'nped': 20, 'time_cars_north': 0.5,
+     'time_cars_south': 0.5, 'time_ped': 2, 'cross_car': 0.5, 'cross_ped': 3.0},
+]
+
+STARVATION = 20.0 # una espera mayor que esto (en segundos) cuenta como inanición
+
+
+def arrival_schedule(scenario: dict, seed: int) -> list:
+    '''
+    Llegadas (t, clase, id, duración) ordenadas por tiempo, igual que las
+    harían gen_cars y gen_pedestrian: la primera en t=0 y las siguientes tras
+    tiempos exponenciales
+    '''
+    rng = random.Random(seed)
+    schedule = []
+    for cls, n, mean, cross in ((NORTH, scenario['ncars'], scenario['time_cars_north'], scenario['cross_car']),
+                                (SOUTH, scenario['ncars'], scenario['time_cars_south'], scenario['cross_car']),
+                                (PED, scenario['nped'], scenario['time_ped'], scenario['cross_ped'])):
+        t = 0.0
+        for vid in range(1, n + 1):
+            schedule.append((t, cls, vid, cross))
+            t += rng.expovariate(1/mean)
+    schedule.sort()
+    return schedule
+
+
+class Bridge():
+    '''
+    Lo que ve el banco de pruebas desde fuera del monitor: cuántos vehículos
+    de cada clase hay en el puente según sus propias entradas y salidas. Sirve
+    para detectar entradas que violan la seguridad con cualquier versión.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.on = [0, 0, 0]
+        self.violations = 0
+
+    def enter(self, cls: int) -> None:
+        with self.lock:
+            others = sum(self.on) - self.on[cls]
+            if others > 0:
+                self.violations += 1
+            self.on[cls] += 1
+
+    def leave(self, cls: int) -> None:
+        with self.lock:
+            self.on[cls] -= 1
+
+
+def vehicle(monitor, bridge: Bridge, cls: int, duration: float,
+            scale: float, out: list, errors: list) -> None:
+    try:
+        out[0] = time.monotonic()
+        if cls == PED:
+            monitor.wants_enter_pedestrian()
+        else:
+            monitor.wants_enter_car(cls)
+        out[1] = time.monotonic()
+        bridge.enter(cls)
+        time.sleep(duration * scale)
+        bridge.leave(cls)
+        if cls == PED:
+            monitor.leaves_pedestrian()
+        else:
+            monitor.leaves_car(cls)
+        out[2] = time.monotonic()
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+
+
+def run_one(version: str, schedule: list, scale: float, timeout: float,
+            results: Queue) -> None:
+    '''
+    Cuerpo del proceso hijo: lanza cada vehículo en su instante (comprimido)
+    y devuelve por la cola los tiempos de cada uno
+    '''
+    errors = []
+    records = [[None, None, None] for _ in schedule]
+    try:
+        monitor = importlib.import_module(version).Monitor()
+    except Exception as e:
+        results.put({'errors': [f"{type(e).__name__}: {e}"], 'records': [],
+                     'violations': 0})
+        return
+    bridge = Bridge()
+    start = time.monotonic()
+    threads = []
+    for (t, cls, _, duration), out in zip(schedule, records):
+        delay = start + t * scale - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        th = threading.Thread(target=vehicle, daemon=True,
+                              args=(monitor, bridge, cls, duration, scale, out, errors))
+        th.start()
+        threads.append(th)
+    deadline = time.monotonic() + timeout
+    for th in threads:
+        th.join(max(0.0, deadline - time.monotonic()))
+    rel = [[None if x is None else (x - start) / scale for x in r] for r in records]
+    results.put({'errors': errors, 'records': rel, 'violations': bridge.violations})
+
+
+def percentile(values: list, p: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def summarize(version: str, scenario: dict, seed: int, schedule: list,
+              raw: dict, timed_out: bool) -> dict:
+    records = raw['records']
+    done = [r for r in records if r[2] is not None]
+    result = {
+        'version': version, 'scenario': scenario['name'], 'seed': seed,
+        'vehicles': len(schedule), 'completed': len(done),
+        'stuck': len(schedule) - len(done),
+        'deadlock': timed_out or len(done) < len(schedule),
+        'errors': sorted(set(raw['errors'])),
+        'safety_violations': raw['violations'],
+    }
+    end = max((r[2] for r in done), default=0.0)
+    result['makespan'] = end
+    result['throughput'] = len(done) / end if end > 0 else 0.0
+    starved = 0
+    for cls, name in enumerate(NAMES):
+        waits = [r[1] - r[0] for (_, c, _, _), r in zip(schedule, records)
+                 if c == cls and r[1] is not None]
+        starved += sum(1 for w in waits if w > STARVATION)
+        result[name] = {
+            'admitted': len(waits),
+            'wait_p50': percentile(waits, 0.5),
+            'wait_p95': percentile(waits, 0.95),
+            'wait_p99': percentile(waits, 0.99),
+            'wait_max': max(waits, default=None),
+        }
+    result['starvation'] = starved
+    return result
+
+
+def run_version(version: str, scenario: dict, seed: int, scale: float,
+                timeout: float) -> dict:
+    schedule = arrival_schedule(scenario, seed)
+    results = Queue()
+    p = Process(target=run_one, args=(version, schedule, scale, timeout, results))
+    p.start()
+    limit = schedule[-1][0] * scale + timeout + 5
+    try:
+        raw = results.get(timeout=limit)
+        timed_out = False
+    except Exception:
+        raw = {'errors': ['sin respuesta del proceso'], 'records': [], 'violations': 0}
+        timed_out = True
+    p.join(1)
+    if p.is_alive():
+        p.terminate()
+        p.join()
+    if not raw['records']:
+        raw['records'] = [[None, None, None] for _ in schedule]
+    return summarize(version, scenario, seed, schedule, raw, timed_out)
+
+
+def show(r: dict) -> None:
+    waits = '  '.join(f"{n} p99 {r[n]['wait_p99']:.1f}s" if r[n]['wait_p99'] is not None
+                      else f"{n} p99 -" for n in NAMES)
+    status = 'BLOQUEO' if r['deadlock'] else 'ok'
+    print(f"{r['version']:<9} {r['scenario']:<16} seed {r['seed']:<3} {status:<8}"
+          f"{r['completed']:4d}/{r['vehicles']:<4d} {r['throughput']:6.2f} veh/s  "
+          f"{waits}  inanición {r['starvation']}  inseguras {r['safety_violations']}"
+          + (f"  errores: {'; '.join(r['errors'])}" if r['errors'] else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--versions', default='puente_01,puente_02,puente_03')
+    parser.add_argument('--seeds', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=0.02)
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        help='segundos reales de margen tras la última llegada')
+    parser.add_argument('--scenarios', default=','.join(s['name'] for s in SCENARIOS))
+    parser.add_argument('--out', default='bench_versiones.json')
+    args = parser.parse_args()
+
+    wanted = args.scenarios.split(',')
+    results = []
+    for scenario in SCENARIOS:
+        if scenario['name'] not in wanted:
+            continue
+        for seed in range(args.seeds):
+            for version in args.versions.split(','):
+                r = run_version(version, scenario, seed, args.scale, args.timeout)
+                show(r)
+                results.append(r)
+
+    with open(args.out, 'w') as f:
+        json.dump({'scale': args.scale, 'timeout': args.timeout,
+                   'starvation': STARVATION, 'scenarios': SCENARIOS,
+                   'results': results}, f, indent=1)
+    print(f"resultados en {args.out}")
+
+
+if __name__ == '__main__':
+    main()
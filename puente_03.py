@@ -5,11 +5,34 @@ Solution to the one-way tunnel
 import time
 import random
 from multiprocessing import Lock, Condition, Process
-from multiprocessing import Value
+from multiprocessing import RawArray
 
 
 SOUTH = 1
 NORTH = 0
+PED = 2 #los peatones son la tercera clase: coincide con su turno
+
+#posiciones dentro del bloque de estado del monitor
+ON = 0 #ON + clase: número de vehículos de esa clase en el puente
+WAITING = 3 #WAITING + clase: número de vehículos de esa clase esperando
+TURN = 6
+GRANTED = 7 #GRANTED + clase: entradas ya concedidas a procesos dormidos
+WAKEUPS = 10 #veces que un proceso bloqueado se ha despertado
+FAILED_WAKEUPS = 11 #veces que se ha despertado sin poder entrar
+ADMITTED = 12 #ADMITTED + clase: entradas de esa clase desde el principio
+URGENT = 15 #URGENT + clase: vehículos con prioridad esperando entrada
+SEQ = 18 #versión del estado: impar mientras alguien lo está cambiando
+STATE_SIZE = 19
+
+TIMEOUT = -1.0 #lo que devuelve wants_enter_* si se acaba el plazo (ver wants_enter_car)
+
+#eventos de cada vehículo (ver report y puente_log)
+WANTS = 0
+ENTERS = 1
+LEAVING = 2
+OUT = 3
+MESSAGES = ("wants to enter", "enters the bridge", "leaving the bridge",
+            "out of the bridge")
 
 NCARS = 100
 NPED = 10
@@ -17,63 +40,156 @@ TIME_CARS_NORTH = 0.5  # a new car enters each 0.5s
 TIME_CARS_SOUTH = 0.5  # a new car enters each 0.5s
 TIME_PED = 5 # a new pedestrian enters each 5s
 TIME_IN_BRIDGE_CARS = (1, 0.5) # normal 1s, 0.5s
-TIME_IN_BRIDGE_PEDESTRIAN = (30, 10) # normal 1s, 0.5s
+TIME_IN_BRIDGE_PEDESTRIAN = (30, 10) # normal 30s, 10s
+MIN_TIME_IN_BRIDGE = 0.05 # la normal se corta por debajo: nadie cruza en 0s
+
+class StrictRotation():
+    '''
+    Política de admisión por turnos estrictos: la de siempre.
+
+    Una política decide quién entra y cuándo cambia el turno. El Monitor
+    llama a sus métodos con el mutex cogido, pasándose a sí mismo para que
+    lean y escriban su bloque de estado (monitor.state):
+        admits(monitor, cls)  predicado de entrada de la clase cls
+        entered(monitor, cls) un vehículo de la clase cls acaba de entrar
+        leaves(monitor, cls)  un vehículo de la clase cls acaba de salir (ya
+                              descontado del puente): actualiza el turno y
+                              devuelve la clase a la que hay que dar paso, o
+                              None si todavía no se puede
+    Si necesita más estado que el del monitor lo guarda en su propia memoria
+    compartida (ver puente_politicas).
+    '''
+
+    def admits(self, monitor, cls: int) -> bool:
+        state = monitor.state
+        if cls == NORTH:
+            #Para que un coche con dirección norte pueda acceder al puente se
+            #tienen que cumplir las siguientes condiciones:
+            #    1) No hay coches dirección sur ni peatones en el puente
+            #    2) El turno actual es el 0 o no hay coches en dirección sur
+            #       ni peatones esperando
+            return state[ON + SOUTH] == 0 and state[ON + PED]==0 and\
+                (state[TURN] == 0 or (state[WAITING + SOUTH] == 0 and\
+                state[WAITING + PED] == 0))
+        elif cls == SOUTH:
+            #Para que un coche con dirección sur pueda acceder al puente se
+            #tienen que cumplir las siguientes condiciones:
+            #    1) No hay coches dirección norte ni peatones en el puente
+            #    2) El turno actual es el 1 o no hay coches en dirección norte
+            #       ni peatones esperando
+            return state[ON + NORTH] == 0 and state[ON + PED]==0 and\
+                (state[TURN] == 1 or (state[WAITING + NORTH] == 0 and\
+                state[WAITING + PED] == 0))
+        #Para que un peatón pueda acceder al puente se tienen que cumplir las
+        #siguientes condiciones:
+        #    1) No hay coches  en el puente
+        #    2) El turno actual es el 2 o no hay coches esperando
+        return state[ON + NORTH] == 0 and state[ON + SOUTH]==0 and\
+            (state[TURN] == 2 or(state[WAITING + NORTH] == 0 and\
+                                 state[WAITING + SOUTH] == 0))
+
+    def entered(self, monitor, cls: int) -> None:
+        pass
+
+    def leaves(self, monitor, cls: int):
+        '''
+        Reglas de cambio de turno de leaves_car y leaves_pedestrian (ver sus
+        comentarios)
+        '''
+        state = monitor.state
+        if cls == NORTH:
+            if state[WAITING + SOUTH] != 0:
+                state[TURN] = 1
+                if state[ON + NORTH] == 0:
+                    return SOUTH
+            elif state[WAITING + PED] != 0:
+                state[TURN] = 2
+                if state[ON + NORTH]==0:
+                    return PED
+            else:
+                state[TURN] = 0
+
+        elif cls == SOUTH:
+            if state[WAITING + PED] != 0:
+                state[TURN] = 2
+                if state[ON + SOUTH] == 0:
+                    return PED
+            elif state[WAITING + NORTH] != 0:
+                state[TURN] = 0
+                if state[ON + SOUTH] == 0:
+                    return NORTH
+            else:
+                state[TURN] = 1
+
+        else:
+            if state[WAITING + NORTH] != 0:
+                state[TURN] = 0
+                if state[ON + PED] == 0:
+                    return NORTH
+            elif state[WAITING + SOUTH] != 0:
+                state[TURN] = 1
+                if state[ON + PED] == 0:
+                    return SOUTH
+            else:
+                state[TURN] = 2
+        return None
+
 
 class Monitor():
     
-    def __init__(self):
+    def __init__(self, metrics=None, policy=None):
         self.mutex = Lock()
-        self.ncar_north = Value('i', 0) #número de coches dirección norte en el puente
-        self.ncar_south = Value('i', 0) #número de coches dirección sur en el puento
-        self.nped = Value('i', 0) #número de peatones en el puente
-        self.ncar_waiting_north = Value('i',0) #número de coches esperando en dir norte
-        self.ncar_waiting_south = Value('i',0) #número de coches esperando en dir sur
-        self.nped_waiting = Value('i',0) #número de peatones esperando
-        self.turn = Value('i',0)
+        #todo el estado está en un único bloque de memoria compartida sin
+        #cerrojo propio: sólo se escribe con self.mutex cogido, y quien
+        #escribe pone state[SEQ] impar mientras lo hace (ver snapshot)
+        self.state = RawArray('i', STATE_SIZE)
         #turn 0 coches norte
         #turn 1 coches sur
         #turn 2 peatones
         self.can_north_cars=Condition(self.mutex)
         self.can_south_cars=Condition(self.mutex)
         self.can_ped=Condition(self.mutex)
+        #métricas opcionales (ver puente_metricas), None si no se quieren
+        self.metrics = metrics
+        #política de admisión (ver StrictRotation y puente_politicas)
+        self.policy = policy if policy is not None else StrictRotation()
  
     def north_cars(self):
         '''
-        Para que un coche con dirección norte pueda acceder al puente se tienen
-        que cumplir las siguientes condiciones:
-            1) No hay coches dirección sur ni peatones en el puente
-            2) El turno actual es el 0 o no hay coches en dirección sur ni peatones
-               esperando
+        Predicado de entrada de los coches en dirección norte: lo decide la
+        política de admisión (por defecto StrictRotation), salvo que haya
+        vehículos con prioridad esperando (ver _admits)
         '''
-        return self.ncar_south.value == 0 and self.nped.value==0 and\
-            (self.turn.value == 0 or (self.ncar_waiting_south.value == 0 and\
-            self.nped_waiting.value == 0))
-            
+        return self._admits(NORTH)
+
     def south_cars(self):
+        return self._admits(SOUTH)
+
+    def ped(self):
+        return self._admits(PED)
+
+    def _admits(self, cls: int) -> bool:
         '''
-        Para que un coche con dirección sur pueda acceder al puente se tienen
-        que cumplir las siguientes condiciones:
-            1) No hay coches dirección norte ni peatones en el puente
-            2) El turno actual es el 1 o no hay coches en dirección norte ni 
-                peatonesesperando
+        Mientras haya vehículos con prioridad esperando no se sigue la
+        política: sólo entran los de las clases con alguno de ellos (todos
+        los de esa clase, para no separarlos de su turno) y en cuanto es
+        seguro. Las demás clases dejan de entrar para que el puente se vacíe
+        y el cambio llegue cuanto antes.
         '''
-        return self.ncar_north.value == 0 and self.nped.value==0 and\
-                                        (self.turn.value == 1 or\
-                                           (self.ncar_waiting_north.value == 0 and\
-                                           self.nped_waiting.value == 0))
-    def ped(self):
+        state = self.state
+        if state[URGENT + NORTH] == state[URGENT + SOUTH] == state[URGENT + PED] == 0:
+            return self.policy.admits(self, cls)
+        return state[URGENT + cls] > 0 and \
+            all(state[ON + k] == 0 for k in (NORTH, SOUTH, PED) if k != cls)
+
+    def clock(self) -> float:
         '''
-        Para que un peatón pueda acceder al puente se tienenque cumplir las 
-        siguientes condiciones:
-            1) No hay coches  en el puente
-            2) El turno actual es el 2 o no hay coches esperando
+        Reloj que usan las políticas que dependen del tiempo
         '''
-        return self.ncar_north.value == 0 and self.ncar_south.value==0 and\
-            (self.turn.value == 2 or(self.ncar_waiting_north.value == 0 and\
-                                           self.ncar_waiting_south.value == 0))
-       
+        return time.monotonic()
 
-    def wants_enter_car(self, direction: int) -> None:
+    def wants_enter_car(self, direction: int, priority: int = 0,
+                        timeout: float = None) -> float:
         '''
         ENTRADA AL PUENTE: COCHES
         
@@ -92,28 +208,164 @@ class Monitor():
         
         De este modo se cumple que el número de coche esperando y de coches
         en el puente es siempre mayor o igual que cero
+
+        Devuelve siempre el instante de entrada (de time.monotonic), que se
+        le pasa luego a leaves_car para que las métricas midan el tiempo en
+        el puente, o TIMEOUT si no ha entrado. TIMEOUT es un número distinto
+        de cero, así que se comprueba con entered == TIMEOUT y no con not.
+
+        Un coche con priority > 0 (una ambulancia) entra en cuanto es seguro,
+        por delante del turno (ver _admits). Con timeout, si en ese tiempo no
+        ha conseguido entrar deja de esperar y devuelve TIMEOUT. Una
+        dirección que no es NORTH ni SOUTH es un error (ValueError).
         '''
-        
+        if direction not in (NORTH, SOUTH):
+            raise ValueError(f"dirección no válida: {direction}")
+        start = self._clock()
         self.mutex.acquire()
+        self.state[SEQ] += 1
+        entered = TIMEOUT
         if direction == 0 :
-            
-            self.ncar_waiting_north.value += 1
-            self.can_north_cars.wait_for(self.north_cars)
-            self.ncar_waiting_north.value -=1
-            self.ncar_north.value += 1
-                
-                
-        elif direction == 1 :
-                
-            self.ncar_waiting_south.value += 1
-            self.can_south_cars.wait_for(self.south_cars)
-            self.ncar_waiting_south.value -=1
-            self.ncar_south.value += 1
-                
+            if self._enter(NORTH, priority, timeout):
+                entered = self._admitted(NORTH, start)
+        else:
+            if self._enter(SOUTH, priority, timeout):
+                entered = self._admitted(SOUTH, start)
+        self.state[SEQ] += 1
         self.mutex.release()
-                  
+        return entered
 
-    def leaves_car(self, direction: int) -> None:
+    def _clock(self) -> float:
+        if self.metrics is None:
+            return None
+        return time.monotonic()
+
+    def _admitted(self, cls: int, start: float, k: int = 1) -> float:
+        '''
+        Anota en las métricas la espera de k vehículos que acaban de entrar y
+        devuelve el instante de entrada, haya métricas o no
+        '''
+        now = time.monotonic()
+        if self.metrics is not None:
+            for _ in range(k):
+                self.metrics.admitted(cls, now - start, now)
+        return now
+
+    def _left(self, cls: int, entered: float, k: int = 1) -> None:
+        '''
+        Anota en las métricas la salida de k vehículos, también si no se
+        sabe cuándo entraron (entered None)
+        '''
+        if self.metrics is not None:
+            now = time.monotonic()
+            for _ in range(k):
+                self.metrics.left(cls, entered, now)
+
+    def _gate(self, cls: int):
+        '''
+        Condición y predicado de entrada de cada clase (NORTH, SOUTH, PED)
+        '''
+        if cls == NORTH:
+            return self.can_north_cars, self.north_cars
+        elif cls == SOUTH:
+            return self.can_south_cars, self.south_cars
+        return self.can_ped, self.ped
+
+    def _enter(self, cls: int, priority: int = 0, timeout: float = None) -> bool:
+        '''
+        Entrada de un vehículo de la clase cls, con el mutex cogido.
+
+        Si su predicado se cumple entra directamente. Si no, se apunta como
+        esperando y duerme en su condición hasta que alguien que sale del
+        puente le conceda la entrada (ver _admit_waiting). Quien le despierta
+        ya le ha quitado de la lista de espera y le ha contado en el puente,
+        así que al despertar no vuelve a evaluar el predicado: sólo recoge la
+        entrada concedida. Se cuentan los despertares y los que no traen
+        entrada (que deberían ser cero).
+
+        Un vehículo con prioridad cuenta en URGENT mientras no tiene la
+        entrada. Si se acaba el timeout sin entrada concedida, se borra de
+        la espera y devuelve False.
+        '''
+        state = self.state
+        if priority > 0:
+            state[URGENT + cls] += 1
+        if self._try_enter(cls):
+            if priority > 0:
+                state[URGENT + cls] -= 1
+            return True
+        condition = self._gate(cls)[0]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            state[SEQ] += 1 #el estado queda estable mientras duerme
+            notified = condition.wait(remaining)
+            state[SEQ] += 1
+            if notified:
+                state[WAKEUPS] += 1
+            if state[GRANTED + cls] > 0:
+                state[GRANTED + cls] -= 1
+                if priority > 0:
+                    state[URGENT + cls] -= 1
+                return True
+            if not notified:
+                self._withdraw(cls, priority)
+                return False
+            state[FAILED_WAKEUPS] += 1
+
+    def _withdraw(self, cls: int, priority: int) -> None:
+        '''
+        Un vehículo de la clase cls deja de esperar. Su espera podía estar
+        frenando a otras clases (por el turno o por su prioridad), así que se
+        da paso a quien lo tenga ahora.
+        '''
+        self.state[WAITING + cls] -= 1
+        if priority > 0:
+            self.state[URGENT + cls] -= 1
+        for k in (NORTH, SOUTH, PED):
+            self._admit_waiting(k)
+
+    def _try_enter(self, cls: int) -> bool:
+        '''
+        Apunta un vehículo de la clase cls como esperando y, si su predicado
+        se cumple, lo pasa directamente al puente. Devuelve si ha entrado.
+        '''
+        self.state[WAITING + cls] += 1
+        if self._gate(cls)[1]():
+            self.state[WAITING + cls] -= 1
+            self.state[ON + cls] += 1
+            self.state[ADMITTED + cls] += 1
+            self.policy.entered(self, cls)
+            return True
+        return False
+
+    def _admit_waiting(self, cls: int) -> None:
+        '''
+        Relevo contado, con el mutex cogido: en lugar de despertar a todos los
+        que esperan en la condición de cls (notify_all) para que vuelvan a
+        competir por el mutex y a evaluar su predicado, quien cambia el turno
+        los admite él mismo mientras el predicado de cls se cumpla y despierta
+        exactamente a esos.
+        '''
+        condition, predicate = self._gate(cls)
+        n = 0
+        while self.state[WAITING + cls] > 0 and predicate():
+            self.state[WAITING + cls] -= 1
+            self.state[ON + cls] += 1
+            self.state[ADMITTED + cls] += 1
+            self.policy.entered(self, cls)
+            n += 1
+        if n > 0:
+            self.state[GRANTED + cls] += n
+            condition.notify(n)
+
+    def wakeups(self) -> tuple:
+        '''
+        Devuelve (despertares, despertares sin poder entrar)
+        '''
+        return self.state[WAKEUPS], self.state[FAILED_WAKEUPS]
+
+    def leaves_car(self, direction: int, entered: float = None) -> None:
         '''
         SALIDA DEL PUENTE: COCHES
         
@@ -137,43 +389,74 @@ class Monitor():
         
         Si no hay no peatones ni coches en dirección sur esperando, el turno 
         es 0
+
+        Estas son las reglas de la política por defecto (StrictRotation);
+        con otra política (ver puente_politicas) cambian.
         '''
-        
+        if direction not in (NORTH, SOUTH):
+            raise ValueError(f"dirección no válida: {direction}")
         self.mutex.acquire()
-        if direction == 0:
-             
-            self.ncar_north.value -= 1
-            if self.ncar_waiting_south.value != 0:
-                self.turn.value = 1
-                if self.ncar_north.value == 0:
-                    self.can_south_cars.notify_all()
-                    
-            elif self.nped_waiting.value != 0:
-                self.turn.value = 2
-                if self.ncar_north.value==0:
-                    self.can_ped.notify_all()
-            else:
-                self.turn.value = 0
-            
-        elif direction == 1:
-            self.ncar_south.value -= 1
-            
-            if self.nped_waiting.value != 0:
-                self.turn.value = 2
-                if self.ncar_south.value == 0:
-                    self.can_ped.notify_all()
-                    
-            elif self.ncar_waiting_north.value != 0:
-                self.turn.value = 0
-                if self.ncar_south.value == 0:
-                    self.can_north_cars.notify_all() 
-                else:
-                    self.turn.value = 1
-                
+        self.state[SEQ] += 1
+        self._leaves(direction)
+        self._left(direction, entered)
+        self.state[SEQ] += 1
         self.mutex.release()
-            
 
-    def wants_enter_pedestrian(self) -> None:
+    def wants_enter_cars(self, direction: int, k: int) -> float:
+        '''
+        ENTRADA AL PUENTE: PELOTÓN DE k COCHES
+
+        Los k coches entran juntos en una sola sección crítica. El pelotón
+        espera y recibe la entrada como si fuera un único coche, con el mismo
+        predicado (north_cars o south_cars), así que en WAITING cuenta como
+        uno. Cuando entra, los k - 1 restantes se suman al puente a la vez:
+        es seguro porque desde que se le concede la entrada ya hay un coche
+        de su dirección en el puente y ninguna otra clase puede entrar.
+        Devuelve el instante de entrada, como wants_enter_car.
+        '''
+        if direction not in (NORTH, SOUTH):
+            raise ValueError(f"dirección no válida: {direction}")
+        if k < 1:
+            raise ValueError(f"un pelotón tiene al menos un coche: {k}")
+        start = self._clock()
+        self.mutex.acquire()
+        self.state[SEQ] += 1
+        self._enter(direction)
+        self._join(direction, k - 1)
+        entered = self._admitted(direction, start, k)
+        self.state[SEQ] += 1
+        self.mutex.release()
+        return entered
+
+    def _join(self, cls: int, n: int) -> None:
+        '''
+        Suma al puente n vehículos más de la clase cls, que ya está en él
+        '''
+        self.state[ON + cls] += n
+        self.state[ADMITTED + cls] += n
+        for _ in range(n):
+            self.policy.entered(self, cls)
+
+    def leaves_cars(self, direction: int, k: int, entered: float = None) -> None:
+        '''
+        SALIDA DEL PUENTE: PELOTÓN DE k COCHES
+
+        Los k coches salen a la vez y se aplican una sola vez las reglas de
+        cambio de turno de leaves_car.
+        '''
+        if direction not in (NORTH, SOUTH):
+            raise ValueError(f"dirección no válida: {direction}")
+        if k < 1:
+            raise ValueError(f"un pelotón tiene al menos un coche: {k}")
+        self.mutex.acquire()
+        self.state[SEQ] += 1
+        self._leaves(direction, k)
+        self._left(direction, entered, k)
+        self.state[SEQ] += 1
+        self.mutex.release()
+
+    def wants_enter_pedestrian(self, priority: int = 0,
+                               timeout: float = None) -> float:
         '''
         ENTRADA AL PUENTE: PEATONES
         
@@ -187,16 +470,21 @@ class Monitor():
         
         De este modo se cumple que el número de peatones esperando y de peatones
         en el puente es siempre mayor o igual que cero
+
+        priority, timeout y lo que devuelve como en wants_enter_car.
         '''
         
+        start = self._clock()
         self.mutex.acquire()
-        self.nped_waiting.value += 1
-        self.can_ped.wait_for(self.ped)
-        self.nped_waiting.value -=1
-        self.nped.value +=1
+        self.state[SEQ] += 1
+        entered = TIMEOUT
+        if self._enter(PED, priority, timeout):
+            entered = self._admitted(PED, start)
+        self.state[SEQ] += 1
         self.mutex.release()
+        return entered
         
-    def leaves_pedestrian(self) -> None:
+    def leaves_pedestrian(self, entered: float = None) -> None:
         '''
         SALIDA DEL PUENTE: PEATONES
         
@@ -216,64 +504,123 @@ class Monitor():
         
         Si no hay no peatones ni coches en dirección sur esperando, el turno 
         es 2
+
+        Estas son las reglas de la política por defecto (StrictRotation);
+        con otra política (ver puente_politicas) cambian.
         '''
         
         self.mutex.acquire()
-        self.nped.value -=1
-        
-        if self.ncar_waiting_north.value != 0:
-            self.turn.value = 0
-            if self.nped.value == 0:
-                self.can_north_cars.notify_all()
-                
-        elif self.ncar_waiting_south !=0:
-            self.turn.value = 1
-            if self.nped.value == 0:
-                self.can_south_cars.notify_all()
-        else:
-            self.turn.value == 2
-                
+        self.state[SEQ] += 1
+        self._leaves(PED)
+        self._left(PED, entered)
+        self.state[SEQ] += 1
         self.mutex.release()
 
+    def _leaves(self, cls: int, k: int = 1) -> None:
+        '''
+        Salida de k vehículos de la clase cls, con el mutex cogido. La
+        política actualiza el turno y dice a qué clase hay que dar paso.
+        Está aparte para que otros monitores con sus propias primitivas (por
+        ejemplo el de puente_async) usen la misma lógica.
+        '''
+        state = self.state
+        state[ON + cls] -= k
+        cls = self.policy.leaves(self, cls)
+        urgent = [u for u in (NORTH, SOUTH, PED) if state[URGENT + u] > 0]
+        if urgent:
+            #el cambio de turno es para los que tienen prioridad
+            for u in urgent:
+                self._admit_waiting(u)
+        elif cls is not None:
+            self._admit_waiting(cls)
+
+    def snapshot(self) -> list:
+        '''
+        Copia coherente de todo el estado (menos SEQ) sin coger el mutex, al
+        estilo de un seqlock: se lee la versión, se copia el bloque y se
+        vuelve a leer la versión. Si era impar (alguien estaba escribiendo)
+        o ha cambiado, la copia puede estar a medias y se repite. Quien lee
+        no frena nunca a los vehículos, así que sirve para consultar el
+        estado muy a menudo desde otro proceso.
+        '''
+        state = self.state
+        tries = 0
+        while True:
+            seq = state[SEQ]
+            if seq % 2 == 0:
+                copy = state[:SEQ]
+                if state[SEQ] == seq:
+                    return copy
+            tries += 1
+            if tries % 16 == 0:
+                time.sleep(0) #deja correr a quien escribe
+
     def __repr__(self) -> str:
-        return f"M<cn:{self.ncar_north.value},cs:{self.ncar_south.value},\
-            cwn:{self.ncar_waiting_north.value},\
-            cws:{self.ncar_waiting_south.value}, p:{self.nped.value}, \
-            pw:{self.nped_waiting.value}, turn:{self.turn.value}>"
+        state = self.snapshot()
+        return f"M<cn:{state[ON + NORTH]},cs:{state[ON + SOUTH]},\
+            cwn:{state[WAITING + NORTH]},\
+            cws:{state[WAITING + SOUTH]}, p:{state[ON + PED]}, \
+            pw:{state[WAITING + PED]}, turn:{state[TURN]}>"
 
-def delay_car_north() -> None:
-    time.sleep(0.5)
+def crossing_time(cls: int, rng=random, normal: tuple = None) -> float:
+    '''
+    Tiempo en el puente de un vehículo de la clase cls según
+    TIME_IN_BRIDGE_CARS o TIME_IN_BRIDGE_PEDESTRIAN, o según normal (media,
+    desviación) si se da
+    '''
+    if normal is None:
+        normal = TIME_IN_BRIDGE_PEDESTRIAN if cls == PED else TIME_IN_BRIDGE_CARS
+    mean, sd = normal
+    return max(MIN_TIME_IN_BRIDGE, rng.normalvariate(mean, sd))
 
-def delay_car_south() -> None:
-    time.sleep(0.5)
+def delay_car_north(duration: float = None) -> None:
+    time.sleep(crossing_time(NORTH) if duration is None else duration)
 
-def delay_pedestrian() -> None:
-    time.sleep(1.0)
+def delay_car_south(duration: float = None) -> None:
+    time.sleep(crossing_time(SOUTH) if duration is None else duration)
+
+def delay_pedestrian(duration: float = None) -> None:
+    time.sleep(crossing_time(PED) if duration is None else duration)
+
+def report(vid: int, cls: int, event: int, monitor: Monitor, log=None) -> None:
+    '''
+    Informa de un evento de un vehículo. Sin log se imprime como siempre, con
+    el estado del monitor; con log (por ejemplo un puente_log.EventLog) se
+    guarda un registro de tamaño fijo sin formatear texto ni imprimir
+    '''
+    if log is not None:
+        log.record(vid, cls, event, monitor)
+    elif cls == PED:
+        print(f"pedestrian {vid} {MESSAGES[event]}. {monitor}")
+    else:
+        print(f"car {vid} heading {cls} {MESSAGES[event]}. {monitor}")
 
-def car(cid: int, direction: int, monitor: Monitor)  -> None:
-    print(f"car {cid} heading {direction} wants to enter. {monitor}")
-    monitor.wants_enter_car(direction)
-    print(f"car {cid} heading {direction} enters the bridge. {monitor}")
+def car(cid: int, direction: int, monitor: Monitor, log=None,
+        duration: float = None)  -> None:
+    report(cid, direction, WANTS, monitor, log)
+    entered = monitor.wants_enter_car(direction)
+    report(cid, direction, ENTERS, monitor, log)
     if direction==NORTH :
-        delay_car_north()
+        delay_car_north(duration)
     else:
-        delay_car_south()
-    print(f"car {cid} heading {direction} leaving the bridge. {monitor}")
-    monitor.leaves_car(direction)
-    print(f"car {cid} heading {direction} out of the bridge. {monitor}")
+        delay_car_south(duration)
+    report(cid, direction, LEAVING, monitor, log)
+    monitor.leaves_car(direction, entered)
+    report(cid, direction, OUT, monitor, log)
 
-def pedestrian(pid: int, monitor: Monitor) -> None:
-    print(f"pedestrian {pid} wants to enter. {monitor}")
-    monitor.wants_enter_pedestrian()
-    print(f"pedestrian {pid} enters the bridge. {monitor}")
-    delay_pedestrian()
-    print(f"pedestrian {pid} leaving the bridge. {monitor}")
-    monitor.leaves_pedestrian()
-    print(f"pedestrian {pid} out of the bridge. {monitor}")
+def pedestrian(pid: int, monitor: Monitor, log=None,
+               duration: float = None) -> None:
+    report(pid, PED, WANTS, monitor, log)
+    entered = monitor.wants_enter_pedestrian()
+    report(pid, PED, ENTERS, monitor, log)
+    delay_pedestrian(duration)
+    report(pid, PED, LEAVING, monitor, log)
+    monitor.leaves_pedestrian(entered)
+    report(pid, PED, OUT, monitor, log)
 
 
 
-def gen_pedestrian(monitor: Monitor) -> None:
+def gen_pedestrian(monitor: Monitor, log=None) -> None:
     '''
     Con esta función se generan los peatones
     '''
@@ -281,7 +628,7 @@ def gen_pedestrian(monitor: Monitor) -> None:
     plst = []
     for _ in range(NPED):
         pid += 1
-        p = Process(target=pedestrian, args=(pid, monitor))
+        p = Process(target=pedestrian, args=(pid, monitor, log))
         p.start()
         plst.append(p)
         time.sleep(random.expovariate(1/TIME_PED))
@@ -289,7 +636,7 @@ def gen_pedestrian(monitor: Monitor) -> None:
     for p in plst:
         p.join()
 
-def gen_cars(direction: int, time_cars, monitor: Monitor) -> None:
+def gen_cars(direction: int, time_cars, monitor: Monitor, log=None) -> None:
     '''
     Con esta función se generan los coches
     '''
@@ -297,7 +644,7 @@ def gen_cars(direction: int, time_cars, monitor: Monitor) -> None:
     plst = []
     for _ in range(NCARS):
         cid += 1
-        p = Process(target=car, args=(cid, direction, monitor))
+        p = Process(target=car, args=(cid, direction, monitor, log))
         p.start()
         plst.append(p)
         time.sleep(random.expovariate(1/time_cars))
@@ -0,0 +1,104 @@
+"""
+Evaluación del control adaptativo de turnos (puente_politicas.Adaptive)
+
+Uso:
+    python puente_adaptativa.py [semillas] [política ...]
+
+simula en puente_sim, con las mismas llegadas para todas las políticas, dos
+cargas de trabajo:
+    estable   llegadas de Poisson de ritmo constante en las tres clases
+    ráfagas   cada clase alterna ráfagas de BURST segundos con un ritmo
+              RATIO veces mayor y calmas del mismo ritmo medio dividido,
+              desfasadas entre clases
+y compara las políticas (por defecto strict, slice:3 y adaptive con
+BOUND de espera) en rendimiento, cambios de clase en el puente, espera
+media, p99 y máxima de todas las clases y fracción de vehículos que esperan
+más de BOUND, con la media de las semillas.
+"""
+
+import sys
+import heapq
+import random
+
+from puente_03 import NORTH, SOUTH, PED, crossing_time
+from puente_sim import simulate
+from puente_politicas import make_policy, score, NAMES
+
+
+BOUND = 60.0 # espera máxima que se le pide a adaptive
+DURATION = 1800.0 # segundos de llegadas
+MEANS = {NORTH: 0.4, SOUTH: 0.6, PED: 4.0} # media entre llegadas
+BURST = 60.0 # duración de cada ráfaga y de cada calma
+RATIO = 4.0 # ritmo en ráfaga / ritmo en calma
+
+
+def steady(seed: int):
+    rng = random.Random(seed)
+
+    def stream(cls, mean):
+        t = rng.expovariate(1/mean)
+        while t < DURATION:
+            yield t, cls, crossing_time(cls, rng)
+            t += rng.expovariate(1/mean)
+
+    return heapq.merge(*(stream(cls, mean) for cls, mean in MEANS.items()))
+
+
+def bursty(seed: int):
+    '''
+    Poisson de ritmo variable por aclarado: se generan llegadas al ritmo de
+    ráfaga y se queda cada una con probabilidad ritmo(t) / ritmo de ráfaga
+    '''
+    rng = random.Random(seed)
+    high = 2 * RATIO / (RATIO + 1) # ritmo de ráfaga y de calma con la misma
+    low = 2 / (RATIO + 1)          # media que steady
+
+    def stream(cls, mean):
+        phase = cls * BURST * 2 / 3
+        t = rng.expovariate(high / mean)
+        while t < DURATION:
+            in_burst = int((t + phase) // BURST) % 2 == 0
+            if in_burst or rng.random() < low / high:
+                yield t, cls, crossing_time(cls, rng)
+            t += rng.expovariate(high / mean)
+
+    return heapq.merge(*(stream(cls, mean) for cls, mean in MEANS.items()))
+
+
+def evaluate(spec: str, workload, seeds: int) -> dict:
+    '''
+    Medias sobre las semillas de las medidas de una política
+    '''
+    totals = {}
+    for seed in range(seeds):
+        records = simulate(arrivals=workload(seed), policy=make_policy(spec))
+        r = score(records)
+        done = [v for v in records if v[4] is not None]
+        waits = sorted(v[3] - v[2] for v in done)
+        row = {'throughput': r['throughput'], 'switches': r['switches'],
+               'stuck': r['stuck'], 'mean': sum(waits) / len(waits),
+               'p99': waits[int(0.99 * (len(waits) - 1))], 'max': waits[-1],
+               'over': sum(1 for w in waits if w > BOUND) / len(waits)}
+        for name in NAMES:
+            row[f'{name}_p99'] = r[name]['p99']
+        for k, x in row.items():
+            totals[k] = totals.get(k, 0.0) + x / seeds
+    return totals
+
+
+def main():
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    specs = sys.argv[2:] or ['strict', 'slice:3', f'adaptive:{BOUND:g}']
+    for title, workload in (('estable', steady), ('ráfagas', bursty)):
+        print(f"{title} ({seeds} semillas)")
+        for spec in specs:
+            r = evaluate(spec, workload, seeds)
+            p99 = ' '.join(f"{r[f'{n}_p99']:6.1f}" for n in NAMES)
+            print(f"  {spec:<12} {r['throughput']:5.2f} veh/s  cambios {r['switches']:6.0f}  "
+                  f"espera media {r['mean']:6.1f}s p99 {r['p99']:6.1f}s máx {r['max']:6.1f}s  "
+                  f"p99 norte/sur/peatones {p99}  >{BOUND:g}s {100*r['over']:5.1f}%"
+                  + (f"  bloqueados {r['stuck']:.0f}" if r['stuck'] else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Solution to the one-way tunnel: coches y peatones como corrutinas de asyncio
+"""
+
+import time
+import random
+import asyncio
+
+import puente_03
+from puente_03 import NORTH, SOUTH, PED, NCARS, NPED
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED
+from puente_03 import crossing_time
+from puente_03 import GRANTED, WAKEUPS, FAILED_WAKEUPS, URGENT, STATE_SIZE, TIMEOUT
+
+
+class AsyncMonitor(puente_03.Monitor):
+    '''
+    El Monitor de puente_03 sobre asyncio.Lock y asyncio.Condition.
+
+    Los predicados (north_cars, south_cars, ped), la salida de _leaves, la
+    política de admisión y el relevo contado de _admit_waiting son los de
+    puente_03, así que el reparto por turnos es el mismo; sólo
+    cambian las primitivas y que todos los métodos públicos (también los de
+    pelotones, priority y timeout) son corrutinas. Todo corre en un único
+    bucle de eventos, por lo que el estado es una lista normal.
+    '''
+
+    def __init__(self, policy=None):
+        self.mutex = asyncio.Lock()
+        self.state = [0] * STATE_SIZE
+        self.can_north_cars = asyncio.Condition(self.mutex)
+        self.can_south_cars = asyncio.Condition(self.mutex)
+        self.can_ped = asyncio.Condition(self.mutex)
+        self.metrics = None
+        self.policy = policy if policy is not None else puente_03.StrictRotation()
+
+    async def _enter(self, cls: int, priority: int = 0, timeout: float = None) -> bool:
+        '''
+        Como Monitor._enter, esperando con await; el plazo lo pone
+        asyncio.wait_for, que vuelve a coger el cerrojo antes de avisar
+        '''
+        state = self.state
+        if priority > 0:
+            state[URGENT + cls] += 1
+        if self._try_enter(cls):
+            if priority > 0:
+                state[URGENT + cls] -= 1
+            return True
+        condition = self._gate(cls)[0]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                await asyncio.wait_for(condition.wait(), remaining)
+                notified = True
+            except asyncio.TimeoutError:
+                notified = False
+            if notified:
+                state[WAKEUPS] += 1
+            if state[GRANTED + cls] > 0:
+                state[GRANTED + cls] -= 1
+                if priority > 0:
+                    state[URGENT + cls] -= 1
+                return True
+            if not notified:
+                self._withdraw(cls, priority)
+                return False
+            state[FAILED_WAKEUPS] += 1
+
+    async def wants_enter_car(self, direction: int, priority: int = 0,
+                              timeout: float = None) -> float:
+        if direction not in (NORTH, SOUTH):
+            raise ValueError(f"dirección no válida: {direction}")
+        async with self.mutex:
+            if await self._enter(direction, priority, timeout):
+                return self._admitted(direction, None)
+            return TIMEOUT
+
+    async def leaves_car(self, direction: int, entered: float = None) -> None:
+        if direction not in (NORTH, SOUTH):
+            raise ValueError(f"dirección no válida: {direction}")
+        async with self.mutex:
+            self._leaves(direction)
+
+    async def wants_enter_cars(self, direction: int, k: int) -> float:
+        if direction not in (NORTH, SOUTH):
+            raise ValueError(f"dirección no válida: {direction}")
+        if k < 1:
+            raise ValueError(f"un pelotón tiene al menos un coche: {k}")
+        async with self.mutex:
+            await self._enter(direction)
+            self._join(direction, k - 1)
+            return self._admitted(direction, None, k)
+
+    async def leaves_cars(self, direction: int, k: int, entered: float = None) -> None:
+        if direction not in (NORTH, SOUTH):
+            raise ValueError(f"dirección no válida: {direction}")
+        if k < 1:
+            raise ValueError(f"un pelotón tiene al menos un coche: {k}")
+        async with self.mutex:
+            self._leaves(direction, k)
+
+    async def wants_enter_pedestrian(self, priority: int = 0,
+                                     timeout: float = None) -> float:
+        async with self.mutex:
+            if await self._enter(PED, priority, timeout):
+                return self._admitted(PED, None)
+            return TIMEOUT
+
+    async def leaves_pedestrian(self, entered: float = None) -> None:
+        async with self.mutex:
+            self._leaves(PED)
+
+
+async def delay_car_north(duration: float = None) -> None:
+    await asyncio.sleep(crossing_time(NORTH) if duration is None else duration)
+
+async def delay_car_south(duration: float = None) -> None:
+    await asyncio.sleep(crossing_time(SOUTH) if duration is None else duration)
+
+async def delay_pedestrian(duration: float = None) -> None:
+    await asyncio.sleep(crossing_time(PED) if duration is None else duration)
+
+async def car(cid: int, direction: int, monitor: AsyncMonitor, verbose: bool = True,
+              duration: float = None) -> None:
+    if verbose:
+        print(f"car {cid} heading {direction} wants to enter. {monitor}")
+    await monitor.wants_enter_car(direction)
+    if verbose:
+        print(f"car {cid} heading {direction} enters the bridge. {monitor}")
+    if direction==NORTH :
+        await delay_car_north(duration)
+    else:
+        await delay_car_south(duration)
+    if verbose:
+        print(f"car {cid} heading {direction} leaving the bridge. {monitor}")
+    await monitor.leaves_car(direction)
+    if verbose:
+        print(f"car {cid} heading {direction} out of the bridge. {monitor}")
+
+async def pedestrian(pid: int, monitor: AsyncMonitor, verbose: bool = True,
+                     duration: float = None) -> None:
+    if verbose:
+        print(f"pedestrian {pid} wants to enter. {monitor}")
+    await monitor.wants_enter_pedestrian()
+    if verbose:
+        print(f"pedestrian {pid} enters the bridge. {monitor}")
+    await delay_pedestrian(duration)
+    if verbose:
+        print(f"pedestrian {pid} leaving the bridge. {monitor}")
+    await monitor.leaves_pedestrian()
+    if verbose:
+        print(f"pedestrian {pid} out of the bridge. {monitor}")
+
+
+async def gen_pedestrian(monitor: AsyncMonitor, npeds: int = NPED, verbose: bool = True) -> None:
+    '''
+    Con esta función se generan los peatones, cada uno como una tarea
+    '''
+    tasks = []
+    for pid in range(1, npeds + 1):
+        tasks.append(asyncio.create_task(pedestrian(pid, monitor, verbose)))
+        await asyncio.sleep(random.expovariate(1/TIME_PED))
+    await asyncio.gather(*tasks)
+
+async def gen_cars(direction: int, time_cars, monitor: AsyncMonitor,
+                   ncars: int = NCARS, verbose: bool = True) -> None:
+    '''
+    Con esta función se generan los coches, cada uno como una tarea
+    '''
+    tasks = []
+    for cid in range(1, ncars + 1):
+        tasks.append(asyncio.create_task(car(cid, direction, monitor, verbose)))
+        await asyncio.sleep(random.expovariate(1/time_cars))
+    await asyncio.gather(*tasks)
+
+async def amain():
+    monitor = AsyncMonitor()
+    await asyncio.gather(gen_cars(NORTH, TIME_CARS_NORTH, monitor),
+                         gen_cars(SOUTH, TIME_CARS_SOUTH, monitor),
+                         gen_pedestrian(monitor))
+
+def main():
+    asyncio.run(amain())
+
+
+if __name__ == '__main__':
+    main()
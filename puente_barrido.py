@@ -0,0 +1,225 @@
+"""
+Barridos de parámetros con el simulador de puente_sim
+
+Uso:
+    python puente_barrido.py rejilla.json [--seeds 30] [--out barrido.jsonl]
+                             [--workers N] [--table barrido.csv]
+
+La rejilla es un objeto JSON que da a cada parámetro una lista de valores,
+por ejemplo
+
+    {"ncars": [200], "nped": [20], "time_cars_north": [0.3, 0.5, 1.0],
+     "time_cars_south": [0.5], "time_ped": [5],
+     "cross_car": [[1, 0.5]], "cross_ped": [[30, 10], [5, 1]],
+     "policy": ["strict", "batch:10"]}
+
+Cada combinación (celda) se simula con las semillas 0..seeds-1; la misma
+semilla en celdas que sólo se diferencian en la política da exactamente las
+mismas llegadas. Los parámetros que no aparecen toman el valor de
+puente_03. Las ejecuciones se reparten entre un grupo de procesos y cada
+resultado se añade a --out en cuanto termina, una línea JSON por ejecución.
+Si el barrido se corta, al relanzarlo con el mismo --out sólo se hacen las
+ejecuciones que faltan. Al final se imprime por celda la media de cada
+medida con su intervalo de confianza del 95%.
+"""
+
+import os
+import sys
+import json
+import math
+import argparse
+import itertools
+from multiprocessing import Pool
+
+from puente_03 import NORTH, SOUTH, PED, NCARS, NPED
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED
+from puente_03 import TIME_IN_BRIDGE_CARS, TIME_IN_BRIDGE_PEDESTRIAN
+from puente_sim import simulate
+from puente_politicas import make_policy, score, NAMES
+
+
+DEFAULTS = {'ncars': NCARS, 'nped': NPED,
+            'time_cars_north': TIME_CARS_NORTH,
+            'time_cars_south': TIME_CARS_SOUTH,
+            'time_ped': TIME_PED,
+            'cross_car': list(TIME_IN_BRIDGE_CARS),
+            'cross_ped': list(TIME_IN_BRIDGE_PEDESTRIAN),
+            'policy': 'strict'}
+
+# medidas que se resumen por celda: nombre y cómo sacarla de score()
+MEASURES = [('throughput', lambda r: r['throughput']),
+            ('switches', lambda r: r['switches']),
+            ('stuck', lambda r: r['stuck'])]
+for _name in NAMES:
+    MEASURES.append((f'{_name}_wait_mean', lambda r, n=_name: r[n]['mean']))
+    MEASURES.append((f'{_name}_wait_p99', lambda r, n=_name: r[n]['p99']))
+
+# cuantiles 0.975 de la t de Student para 1..30 grados de libertad
+T975 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+
+def cells(grid: dict) -> list:
+    '''
+    Todas las combinaciones de la rejilla, completadas con DEFAULTS
+    '''
+    unknown = set(grid) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"parámetros desconocidos: {', '.join(sorted(unknown))}")
+    names = sorted(grid)
+    result = []
+    for values in itertools.product(*(grid[n] for n in names)):
+        cell = dict(DEFAULTS)
+        cell.update(zip(names, values))
+        result.append(cell)
+    return result
+
+
+def key(cell: dict) -> str:
+    return json.dumps(cell, sort_keys=True)
+
+
+def run(job: tuple) -> dict:
+    '''
+    Una ejecución: la simulación de una celda con una semilla
+    '''
+    cell, seed = job
+    records = simulate(ncars=cell['ncars'], nped=cell['nped'],
+                       time_cars_north=cell['time_cars_north'],
+                       time_cars_south=cell['time_cars_south'],
+                       time_ped=cell['time_ped'], seed=seed,
+                       policy=make_policy(cell['policy']),
+                       crossing={NORTH: cell['cross_car'], SOUTH: cell['cross_car'],
+                                 PED: cell['cross_ped']})
+    return {'cell': cell, 'seed': seed, 'result': score(records)}
+
+
+def done(path: str) -> set:
+    '''
+    Ejecuciones (celda, semilla) que ya están en el fichero de resultados.
+    Una última línea a medias (si se cortó al escribirla) se ignora.
+    '''
+    finished = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                finished.add((key(row['cell']), row['seed']))
+    return finished
+
+
+def ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def interval(values: list) -> tuple:
+    '''
+    Media y semiancho del intervalo de confianza del 95% (t de Student)
+    '''
+    n = len(values)
+    if n == 0:
+        return None, None
+    mean = sum(values) / n
+    if n == 1:
+        return mean, None
+    var = sum((x - mean) ** 2 for x in values) / (n - 1)
+    t = T975[n - 2] if n - 1 <= len(T975) else 1.960
+    return mean, t * math.sqrt(var / n)
+
+
+def aggregate(path: str) -> list:
+    '''
+    Lee el fichero de resultados y resume cada celda: número de ejecuciones
+    y media e intervalo de cada medida. Sólo se guardan en memoria las
+    listas de valores de cada celda, no las filas.
+    '''
+    table = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            k = key(row['cell'])
+            if k not in table:
+                table[k] = (row['cell'], {name: [] for name, _ in MEASURES})
+            values = table[k][1]
+            for name, get in MEASURES:
+                x = get(row['result'])
+                if x is not None:
+                    values[name].append(x)
+    summary = []
+    for cell, values in table.values():
+        entry = {'cell': cell, 'runs': len(values['throughput'])}
+        for name, _ in MEASURES:
+            entry[name] = interval(values[name])
+        summary.append(entry)
+    return summary
+
+
+def show(summary: list, grid: dict) -> None:
+    varying = [n for n in sorted(grid) if len(grid[n]) > 1]
+    for entry in summary:
+        cell = ' '.join(f"{n}={entry['cell'][n]}" for n in varying) or 'celda única'
+        print(f"{cell}  ({entry['runs']} ejecuciones)")
+        for name, _ in MEASURES:
+            mean, half = entry[name]
+            if mean is None:
+                continue
+            ci = f" ± {half:.3f}" if half is not None else ''
+            print(f"    {name:<18} {mean:10.3f}{ci}")
+
+
+def write_table(summary: list, path: str) -> None:
+    columns = sorted(DEFAULTS)
+    with open(path, 'w') as f:
+        f.write(','.join(columns + ['runs'] +
+                         [f"{n}{s}" for n, _ in MEASURES for s in ('', '_ci')]) + '\n')
+        for entry in summary:
+            row = [json.dumps(entry['cell'][c]).replace(',', ' ') for c in columns]
+            row.append(str(entry['runs']))
+            for name, _ in MEASURES:
+                row.extend('' if x is None else f"{x:.6g}" for x in entry[name])
+            f.write(','.join(row) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('grid', help='fichero JSON con la rejilla')
+    parser.add_argument('--seeds', type=int, default=30)
+    parser.add_argument('--out', default='barrido.jsonl')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--table', help='guarda también el resumen en CSV')
+    args = parser.parse_args()
+
+    with open(args.grid) as f:
+        grid = json.load(f)
+    finished = done(args.out)
+    jobs = [(cell, seed) for cell in cells(grid) for seed in range(args.seeds)
+            if (key(cell), seed) not in finished]
+    print(f"{len(jobs)} ejecuciones pendientes, {len(finished)} ya hechas",
+          file=sys.stderr)
+
+    with Pool(args.workers) as pool, open(args.out, 'a') as out:
+        if out.tell() > 0 and not ends_with_newline(args.out):
+            out.write('\n') #la línea cortada queda sola y se ignora
+        for i, row in enumerate(pool.imap_unordered(run, jobs), 1):
+            out.write(json.dumps(row) + '\n')
+            out.flush()
+            if i % 100 == 0:
+                print(f"{i}/{len(jobs)}", file=sys.stderr)
+
+    summary = aggregate(args.out)
+    show(summary, grid)
+    if args.table:
+        write_table(summary, args.table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+"""
+Explorador de entrelazados para los Monitor de puente_01, puente_02 y
+puente_03
+
+Uso:
+    python puente_explorador.py [módulo] [--runs 2000] [--seed 0]
+                                [--workload 2,2,1,2] [--policy strict]
+    python puente_explorador.py [módulo] --replay --seed S [--workload ...]
+
+ejecuta los métodos del Monitor del módulo (puente_03 por defecto) con un
+planificador cooperativo con semilla en lugar de procesos: Lock, Condition
+y Value del módulo se cambian por sustitutos que sólo dejan correr a un
+vehículo a la vez y le quitan el testigo en cada operación (coger o soltar
+el mutex, esperar, leer o escribir un Value) y mientras cruza. En cada paso
+el planificador elige al azar, con la semilla, qué vehículo sigue, así que
+cada semilla es un entrelazado distinto y siempre el mismo.
+
+La carga es norte,sur,peatones,vueltas: tantos vehículos de cada clase,
+cada uno cruzando ese número de veces. Después de cada paso se comprueba
+con lo que de verdad hay en el puente (no con los contadores del monitor)
+que no hay coches en las dos direcciones ni coches con peatones, y al final
+que nadie se ha quedado esperando para siempre (bloqueo) ni el entrelazado
+pasa de MAX_STEPS pasos. Una espera con plazo puede acabar por plazo en
+cualquier momento.
+
+Con el primer fallo se busca el caso más pequeño que lo reproduce: se
+quitan vehículos y vueltas mientras alguna de las SEARCH primeras semillas
+siga fallando igual (mismo tipo de fallo y, si es una excepción, mismo tipo
+de excepción en la misma línea del módulo; si no es seguro, con las mismas
+clases en el puente), y se queda la semilla con el entrelazado más corto. Se
+imprime ese entrelazado y la orden para repetirlo con --replay.
+"""
+
+import time
+import random
+import argparse
+import threading
+import importlib
+import traceback
+
+
+MAX_STEPS = 10000
+SEARCH = 200 # semillas que se prueban al reducir un fallo
+
+# tipos de fallo
+ERROR = 'error' # excepción en el monitor
+UNSAFE = 'unsafe' # coches en sentidos contrarios o con peatones
+DEADLOCK = 'deadlock' # vehículos esperando y nadie que pueda avanzar
+LIVELOCK = 'livelock' # demasiados pasos
+
+NORTH, SOUTH, PED = 0, 1, 2
+NAMES = ('north', 'south', 'ped')
+
+
+class _Abort(BaseException):
+    '''
+    Se lanza en los vehículos que quedan a medias para terminar sus hilos
+    '''
+
+
+class Scheduler():
+    '''
+    Planificador cooperativo. Cada vehículo es un hilo, pero sólo el que
+    tiene el testigo corre: lo devuelve en switch() y espera a que se lo
+    vuelvan a dar. Un vehículo bloqueado pasa en switch() la condición que
+    tiene que cumplirse para poder seguir (ready).
+    '''
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.tasks = []
+        self.current = None
+        self.back = threading.Semaphore(0)
+        self.aborting = False
+        self.trace = []
+        self.error = None #excepción del fallo ERROR
+
+    def spawn(self, name: str, target, *args) -> None:
+        task = {'name': name, 'sem': threading.Semaphore(0), 'ready': None,
+                'done': False, 'error': None, 'point': 'start'}
+        task['thread'] = threading.Thread(target=self._body,
+                                          args=(task, target, args), daemon=True)
+        self.tasks.append(task)
+
+    def _body(self, task: dict, target, args: tuple) -> None:
+        task['sem'].acquire()
+        try:
+            if not self.aborting:
+                target(*args)
+        except _Abort:
+            pass
+        except Exception as e:
+            task['error'] = e
+        task['done'] = True
+        self.back.release()
+
+    def switch(self, point: str, ready=None) -> None:
+        '''
+        Punto de planificación del vehículo que corre
+        '''
+        if self.aborting:
+            raise _Abort()
+        task = self.current
+        task['ready'] = ready
+        task['point'] = point
+        self.back.release()
+        task['sem'].acquire()
+        if self.aborting:
+            raise _Abort()
+
+    def run(self, check) -> tuple:
+        '''
+        Ejecuta hasta que todos acaban o algo falla. Devuelve (tipo de
+        fallo o None, mensaje)
+        '''
+        for task in self.tasks:
+            task['thread'].start()
+        try:
+            while True:
+                runnable = [t for t in self.tasks if not t['done'] and
+                            (t['ready'] is None or t['ready']())]
+                if not runnable:
+                    break
+                task = self.rng.choice(runnable)
+                task['ready'] = None
+                self.current = task
+                task['sem'].release()
+                self.back.acquire()
+                self.trace.append((task['name'], task['point']))
+                if task['error'] is not None:
+                    e = self.error = task['error']
+                    return ERROR, f"{task['name']}: {type(e).__name__}: {e}"
+                problem = check()
+                if problem:
+                    return UNSAFE, problem
+                if len(self.trace) >= MAX_STEPS:
+                    return LIVELOCK, f"más de {MAX_STEPS} pasos"
+            stuck = [t for t in self.tasks if not t['done']]
+            if stuck:
+                return DEADLOCK, ', '.join(f"{t['name']} en {t['point']}" for t in stuck)
+            return None, ''
+        finally:
+            self.aborting = True
+            for task in self.tasks:
+                if not task['done']:
+                    task['sem'].release()
+            for task in self.tasks:
+                task['thread'].join()
+
+
+class BatonLock():
+    '''
+    Sustituto de Lock
+    '''
+
+    def __init__(self, sched: Scheduler):
+        self.sched = sched
+        self.owner = None
+
+    def acquire(self, block: bool = True, timeout: float = None) -> bool:
+        self.sched.switch('acquire')
+        while self.owner is not None:
+            self.sched.switch('acquire', lambda: self.owner is None)
+        self.owner = self.sched.current
+        return True
+
+    def release(self) -> None:
+        if self.owner is None:
+            raise ValueError("lock released too many times")
+        self.owner = None
+        self.sched.switch('release')
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class BatonCondition():
+    '''
+    Sustituto de Condition. notify despierta a esperas elegidas al azar y
+    una espera con plazo puede acabar por plazo en cualquier momento.
+    '''
+
+    def __init__(self, sched: Scheduler, lock: BatonLock = None):
+        self.sched = sched
+        self.lock = lock if lock is not None else BatonLock(sched)
+        self.waiters = []
+
+    def wait(self, timeout: float = None) -> bool:
+        sched, lock = self.sched, self.lock
+        if lock.owner is not sched.current:
+            raise AssertionError("wait without holding the lock")
+        entry = [sched.current, False]
+        self.waiters.append(entry)
+        lock.owner = None
+        if timeout is None:
+            sched.switch('wait', lambda: entry[1])
+        else:
+            sched.switch('wait', lambda: True)
+        if not entry[1]:
+            self.waiters.remove(entry)
+        while lock.owner is not None:
+            sched.switch('wait', lambda: lock.owner is None)
+        lock.owner = sched.current
+        return entry[1]
+
+    def wait_for(self, predicate, timeout: float = None) -> bool:
+        result = predicate()
+        while not result:
+            self.wait(timeout)
+            result = predicate()
+            if timeout is not None:
+                break
+        return result
+
+    def notify(self, n: int = 1) -> None:
+        if self.lock.owner is not self.sched.current:
+            raise AssertionError("notify without holding the lock")
+        for entry in self.sched.rng.sample(self.waiters, min(n, len(self.waiters))):
+            entry[1] = True
+            self.waiters.remove(entry)
+
+    def notify_all(self) -> None:
+        self.notify(len(self.waiters))
+
+
+class BatonValue():
+    '''
+    Sustituto de Value: cada lectura y escritura de value es un punto de
+    planificación
+    '''
+
+    def __init__(self, sched: Scheduler, typecode, value=0, lock=True):
+        self.sched = sched
+        self._value = value
+        self._lock = BatonLock(sched)
+
+    @property
+    def value(self):
+        self.sched.switch('read')
+        return self._value
+
+    @value.setter
+    def value(self, value) -> None:
+        self.sched.switch('write')
+        self._value = value
+
+    def get_lock(self) -> BatonLock:
+        return self._lock
+
+
+def vehicle(sched: Scheduler, monitor, cls: int, laps: int, bridge: list) -> None:
+    for _ in range(laps):
+        if cls == PED:
+            monitor.wants_enter_pedestrian()
+        else:
+            monitor.wants_enter_car(cls)
+        bridge[cls] += 1
+        sched.switch('crossing')
+        bridge[cls] -= 1
+        if cls == PED:
+            monitor.leaves_pedestrian()
+        else:
+            monitor.leaves_car(cls)
+
+
+def unsafe(bridge: list) -> str:
+    if bridge[NORTH] and bridge[SOUTH]:
+        return f"coches en los dos sentidos: {bridge}"
+    if bridge[PED] and (bridge[NORTH] or bridge[SOUTH]):
+        return f"coches con peatones: {bridge}"
+    return ''
+
+
+def where(module, e: Exception) -> str:
+    '''
+    Tipo de una excepción y línea del módulo en que salta (o la más interna
+    si no pasa por el módulo)
+    '''
+    frames = traceback.extract_tb(e.__traceback__)
+    frame = ([f for f in frames if f.filename == module.__file__] or frames)[-1]
+    return f"{type(e).__name__} en {frame.name}, línea {frame.lineno}"
+
+
+def explore(module, workload: tuple, seed: int, policy: str = None) -> tuple:
+    '''
+    Un entrelazado: (fallo, mensaje, pasos dados). El fallo es None o un par
+    (tipo, dónde) que lo identifica al reducirlo: dónde es where() para las
+    excepciones, qué clases coinciden en el puente para UNSAFE y vacío para
+    el resto
+    '''
+    sched = Scheduler(seed)
+    saved = {name: getattr(module, name) for name in ('Lock', 'Condition', 'Value')
+             if hasattr(module, name)}
+    module.Lock = lambda: BatonLock(sched)
+    module.Condition = lambda lock=None: BatonCondition(sched, lock)
+    module.Value = lambda typecode, value=0, lock=True: BatonValue(sched, typecode, value)
+    try:
+        if policy is not None:
+            from puente_politicas import make_policy
+            monitor = module.Monitor(policy=make_policy(policy))
+        else:
+            monitor = module.Monitor()
+    finally:
+        for name in ('Lock', 'Condition', 'Value'):
+            if name in saved:
+                setattr(module, name, saved[name])
+            else:
+                delattr(module, name)
+    bridge = [0, 0, 0]
+    *counts, laps = workload
+    for cls, n in enumerate(counts):
+        for i in range(n):
+            sched.spawn(f"{NAMES[cls]}{i + 1}", vehicle, sched, monitor, cls, laps, bridge)
+    kind, message = sched.run(lambda: unsafe(bridge))
+    if kind is None:
+        return None, message, sched.trace
+    if kind == ERROR:
+        place = where(module, sched.error)
+    elif kind == UNSAFE:
+        place = message.split(':')[0]
+    else:
+        place = ''
+    return (kind, place), message, sched.trace
+
+
+def smaller(workload: tuple) -> list:
+    '''
+    Cargas con un vehículo o una vuelta menos
+    '''
+    result = []
+    for i, n in enumerate(workload):
+        if n > (1 if i == 3 else 0):
+            w = list(workload)
+            w[i] -= 1
+            if sum(w[:3]) > 0:
+                result.append(tuple(w))
+    return result
+
+
+def shortest(module, workload: tuple, failure: tuple, policy: str):
+    '''
+    La semilla de las SEARCH primeras con el mismo fallo más corto, o None
+    '''
+    best = None
+    for seed in range(SEARCH):
+        found, message, trace = explore(module, workload, seed, policy)
+        if found == failure and (best is None or len(trace) < len(best[2])):
+            best = (seed, message, trace)
+    return best
+
+
+def minimize(module, workload: tuple, seed: int, failure: tuple, policy: str) -> tuple:
+    '''
+    Reduce un fallo: (carga, semilla, mensaje, entrelazado)
+    '''
+    found = shortest(module, workload, failure, policy)
+    if found is None:
+        found = (seed, *explore(module, workload, seed, policy)[1:])
+    reduced = True
+    while reduced:
+        reduced = False
+        for w in smaller(workload):
+            candidate = shortest(module, w, failure, policy)
+            if candidate is not None:
+                workload, found = w, candidate
+                reduced = True
+                break
+    return (workload, *found)
+
+
+def describe(failure: tuple) -> str:
+    if failure is None:
+        return 'correcto'
+    kind, place = failure
+    return f"{kind} {place}" if place else kind
+
+
+def show(trace: list) -> None:
+    for i, (name, point) in enumerate(trace, 1):
+        print(f"  {i:4d} {name:<8} {point}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('module', nargs='?', default='puente_03')
+    parser.add_argument('--runs', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workload', default='2,2,1,2')
+    parser.add_argument('--policy', help='política de puente_politicas (sólo puente_03)')
+    parser.add_argument('--replay', action='store_true')
+    args = parser.parse_args()
+    module = importlib.import_module(args.module)
+    workload = tuple(int(x) for x in args.workload.split(','))
+    if len(workload) != 4:
+        parser.error("la carga es norte,sur,peatones,vueltas")
+
+    if args.replay:
+        failure, message, trace = explore(module, workload, args.seed, args.policy)
+        show(trace)
+        print(f"{describe(failure)} {message}")
+        return
+
+    start = time.perf_counter()
+    for seed in range(args.seed, args.seed + args.runs):
+        failure, message, trace = explore(module, workload, seed, args.policy)
+        if failure is not None:
+            break
+    runs = seed - args.seed + 1
+    elapsed = time.perf_counter() - start
+    print(f"{runs} entrelazados en {elapsed:.2f} s ({runs/elapsed:.0f}/s)")
+    if failure is None:
+        print("ningún fallo")
+        return
+    print(f"semilla {seed}: {describe(failure)} ({message})")
+    workload, seed, message, trace = minimize(module, workload, seed, failure, args.policy)
+    print(f"reducido a carga {','.join(map(str, workload))} semilla {seed}, "
+          f"{len(trace)} pasos: {describe(failure)} ({message})")
+    show(trace)
+    policy = f" --policy {args.policy}" if args.policy else ''
+    print(f"repetir: python puente_explorador.py {args.module} --replay --seed {seed} "
+          f"--workload {','.join(map(str, workload))}{policy}")
+
+
+if __name__ == '__main__':
+    main()
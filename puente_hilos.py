@@ -0,0 +1,199 @@
+"""
+Solution to the one-way tunnel: coches y peatones como hilos
+
+Uso:
+    python puente_hilos.py [process|thread]
+    python puente_hilos.py bench [vueltas] [vehículos]
+
+la primera forma es el main de puente_03 con el backend elegido al
+arrancar: process (por defecto) hace un proceso por vehículo con el Monitor
+de puente_03 y thread un hilo por vehículo con ThreadMonitor.
+
+bench compara los dos backends en este intérprete:
+    rendimiento  5 vehículos (2 norte, 2 sur, 1 peatón) entran y salen
+                 vueltas veces cada uno sin pausas (20000 por defecto);
+                 entradas y salidas por segundo
+    memoria      vehículos (200 por defecto) esperando a la vez; memoria
+                 propia (Pss) de cada proceso o aumento de memoria residente
+                 del proceso por cada hilo
+e indica si el intérprete tiene el GIL activo. Con CPython sin GIL
+(python3.13t o posterior) los hilos corren de verdad en paralelo y el
+backend thread deja de estar limitado a un núcleo.
+"""
+
+import sys
+import random
+import time
+import threading
+from multiprocessing import Process, Event, Semaphore
+
+import puente_03
+from puente_03 import Monitor, NORTH, SOUTH, PED, NCARS, NPED
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED
+from puente_03 import STATE_SIZE, car, pedestrian
+
+
+class ThreadMonitor(Monitor):
+    '''
+    El Monitor de puente_03 para vehículos que son hilos de un mismo
+    proceso: threading.Lock y threading.Condition en lugar de las de
+    multiprocessing y el estado en una lista normal en lugar de memoria
+    compartida. Los métodos, los predicados, la política de admisión y el
+    relevo contado son los de puente_03 sin cambios (también priority y
+    timeout, porque threading.Condition.wait devuelve si se le ha notificado
+    igual que la de multiprocessing).
+    '''
+
+    def __init__(self, metrics=None, policy=None):
+        self.mutex = threading.Lock()
+        self.state = [0] * STATE_SIZE
+        self.can_north_cars = threading.Condition(self.mutex)
+        self.can_south_cars = threading.Condition(self.mutex)
+        self.can_ped = threading.Condition(self.mutex)
+        self.metrics = metrics
+        self.policy = policy if policy is not None else puente_03.StrictRotation()
+
+
+#backend: (monitor, cómo se lanza cada vehículo)
+BACKENDS = {
+    'process': (Monitor, Process),
+    'thread': (ThreadMonitor, threading.Thread),
+}
+
+
+def gil() -> bool:
+    '''
+    Si este intérprete tiene el GIL activo (siempre antes de Python 3.13)
+    '''
+    is_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_enabled is None else is_enabled()
+
+
+def gen_pedestrian(monitor: Monitor, log=None, worker=threading.Thread) -> None:
+    '''
+    Con esta función se generan los peatones, cada uno con worker (un hilo
+    por defecto, o Process)
+    '''
+    plst = []
+    for pid in range(1, NPED + 1):
+        p = worker(target=pedestrian, args=(pid, monitor, log))
+        p.start()
+        plst.append(p)
+        time.sleep(random.expovariate(1/TIME_PED))
+    for p in plst:
+        p.join()
+
+def gen_cars(direction: int, time_cars, monitor: Monitor, log=None,
+             worker=threading.Thread) -> None:
+    '''
+    Con esta función se generan los coches, cada uno con worker
+    '''
+    plst = []
+    for cid in range(1, NCARS + 1):
+        p = worker(target=car, args=(cid, direction, monitor, log))
+        p.start()
+        plst.append(p)
+        time.sleep(random.expovariate(1/time_cars))
+    for p in plst:
+        p.join()
+
+
+def traffic(monitor: Monitor, cls: int, n: int) -> None:
+    for _ in range(n):
+        if cls == PED:
+            monitor.wants_enter_pedestrian()
+            monitor.leaves_pedestrian()
+        else:
+            monitor.wants_enter_car(cls)
+            monitor.leaves_car(cls)
+
+
+def throughput(backend: str, laps: int) -> float:
+    '''
+    Entradas y salidas por segundo de 5 vehículos sin pausas
+    '''
+    monitor_class, worker = BACKENDS[backend]
+    monitor = monitor_class()
+    plst = [worker(target=traffic, args=(monitor, cls, laps))
+            for cls in (NORTH, NORTH, SOUTH, SOUTH, PED)]
+    start = time.perf_counter()
+    for p in plst:
+        p.start()
+    for p in plst:
+        p.join()
+    return 2 * len(plst) * laps / (time.perf_counter() - start)
+
+
+def memory(pid: str = 'self', field: str = 'Pss') -> int:
+    '''
+    Un campo de /proc/<pid>/smaps_rollup, en bytes
+    '''
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def waiting(monitor: Monitor, go, ready) -> None:
+    '''
+    Un vehículo que espera a entrar al puente hasta que se le da paso con go
+    '''
+    ready.release()
+    go.wait()
+    monitor.wants_enter_pedestrian()
+    monitor.leaves_pedestrian()
+
+
+def per_vehicle(backend: str, n: int) -> float:
+    '''
+    Memoria por vehículo con n vehículos vivos a la vez
+    '''
+    monitor_class, worker = BACKENDS[backend]
+    monitor = monitor_class()
+    if backend == 'thread':
+        go, ready = threading.Event(), threading.Semaphore(0)
+    else:
+        go, ready = Event(), Semaphore(0)
+    before = memory(field='Rss')
+    plst = [worker(target=waiting, args=(monitor, go, ready)) for _ in range(n)]
+    for p in plst:
+        p.start()
+    for _ in plst:
+        ready.acquire()
+    if backend == 'thread':
+        used = memory(field='Rss') - before
+    else:
+        used = sum(memory(p.pid) for p in plst)
+    go.set()
+    for p in plst:
+        p.join()
+    return used / n
+
+
+def bench(laps: int = 20000, n: int = 200) -> None:
+    print(f"Python {sys.version.split()[0]}, GIL {'activo' if gil() else 'desactivado'}")
+    for backend in BACKENDS:
+        rate = throughput(backend, laps)
+        size = per_vehicle(backend, n)
+        print(f"  {backend:<8} {rate:10.0f} entradas y salidas/s   "
+              f"{size/1024:8.1f} KiB por vehículo")
+
+
+def main(backend: str = 'process'):
+    monitor_class, worker = BACKENDS[backend]
+    monitor = monitor_class()
+    glst = [worker(target=gen_cars, args=(NORTH, TIME_CARS_NORTH, monitor, None, worker)),
+            worker(target=gen_cars, args=(SOUTH, TIME_CARS_SOUTH, monitor, None, worker)),
+            worker(target=gen_pedestrian, args=(monitor, None, worker))]
+    for g in glst:
+        g.start()
+    for g in glst:
+        g.join()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        bench(*(int(x) for x in sys.argv[2:4]))
+    else:
+        main(sys.argv[1] if len(sys.argv) > 1 else 'process')
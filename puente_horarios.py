@@ -0,0 +1,145 @@
+"""
+Horarios de llegadas generados de una vez con NumPy
+
+Uso:
+    python puente_horarios.py [vehículos]
+
+compara el tiempo de generar un horario de ese tamaño con NumPy frente a
+puente_trazas.generate, que sortea cada llegada en Python, y lo simula en
+puente_sim.
+
+Un horario son tres arrays ordenados por tiempo: instante de llegada, clase
+(NORTH, SOUTH, PED) y tiempo en el puente. Los intervalos entre llegadas son
+exponenciales como en gen_cars y gen_pedestrian y los cruces siguen las
+normales TIME_IN_BRIDGE_CARS y TIME_IN_BRIDGE_PEDESTRIAN de puente_03. Este
+módulo necesita numpy; el resto del puente no.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import puente_trazas
+from puente_03 import Monitor, NORTH, SOUTH, PED, NCARS, NPED
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED
+from puente_03 import TIME_IN_BRIDGE_CARS, TIME_IN_BRIDGE_PEDESTRIAN
+from puente_03 import MIN_TIME_IN_BRIDGE
+
+
+CHUNK = 65536 # llegadas que se pasan a objetos de Python a la vez
+
+# el mismo registro que puente_trazas.RECORD ('<ddb'), sin relleno
+RECORD = np.dtype([('t', '<f8'), ('duration', '<f8'), ('cls', 'i1')])
+
+
+class Schedule():
+    '''
+    Llegadas ya calculadas: arrays t, cls y duration de la misma longitud y
+    ordenados por t
+    '''
+
+    def __init__(self, t: np.ndarray, cls: np.ndarray, duration: np.ndarray):
+        self.t = t
+        self.cls = cls
+        self.duration = duration
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def arrivals(self):
+        '''
+        Las llegadas como tuplas (instante, clase, cruce), igual que
+        puente_trazas.read, para puente_sim.simulate(arrivals=...) o
+        puente_trazas.replay. Se convierten a objetos de Python por bloques
+        de CHUNK
+        '''
+        for start in range(0, len(self), CHUNK):
+            end = start + CHUNK
+            yield from zip(self.t[start:end].tolist(),
+                           self.cls[start:end].tolist(),
+                           self.duration[start:end].tolist())
+
+    def save(self, path: str) -> None:
+        '''
+        Guarda el horario como traza binaria de puente_trazas de una vez
+        '''
+        records = np.empty(len(self), dtype=RECORD)
+        records['t'] = self.t
+        records['duration'] = self.duration
+        records['cls'] = self.cls
+        with open(path, 'wb') as f:
+            f.write(puente_trazas.MAGIC)
+            records.tofile(f)
+
+
+def load(path: str) -> Schedule:
+    '''
+    Lee una traza binaria de puente_trazas proyectada en memoria, sin copiar
+    los registros
+    '''
+    records = np.memmap(path, dtype=RECORD, mode='r',
+                        offset=len(puente_trazas.MAGIC))
+    return Schedule(records['t'], records['cls'], records['duration'])
+
+
+def build(ncars: int = NCARS, nped: int = NPED,
+          time_cars_north: float = TIME_CARS_NORTH,
+          time_cars_south: float = TIME_CARS_SOUTH,
+          time_ped: float = TIME_PED, seed=None) -> Schedule:
+    '''
+    Horario de main() de puente_03: ncars coches en cada dirección y nped
+    peatones, el primero de cada clase en el instante 0
+    '''
+    rng = np.random.default_rng(seed)
+    ts, classes, durations = [], [], []
+    for cls, n, mean, (mu, sd) in ((NORTH, ncars, time_cars_north, TIME_IN_BRIDGE_CARS),
+                                   (SOUTH, ncars, time_cars_south, TIME_IN_BRIDGE_CARS),
+                                   (PED, nped, time_ped, TIME_IN_BRIDGE_PEDESTRIAN)):
+        t = np.empty(n)
+        if n > 0:
+            t[0] = 0.0
+            np.cumsum(rng.exponential(mean, n - 1), out=t[1:])
+        ts.append(t)
+        classes.append(np.full(n, cls, dtype=np.int8))
+        durations.append(np.maximum(rng.normal(mu, sd, n), MIN_TIME_IN_BRIDGE))
+    t = np.concatenate(ts)
+    order = np.argsort(t, kind='stable')
+    return Schedule(t[order], np.concatenate(classes)[order],
+                    np.concatenate(durations)[order])
+
+
+def run(schedule: Schedule, scale: float = 1.0) -> None:
+    '''
+    Ejecuta el horario con procesos, como main() de puente_03
+    '''
+    puente_trazas.replay(schedule.arrivals(), Monitor(), scale=scale)
+
+
+def main():
+    from puente_sim import simulate
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ncars, nped = n * 10 // 21, n // 21
+
+    start = time.perf_counter()
+    schedule = build(ncars, nped, seed=0)
+    numpy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in puente_trazas.generate(ncars, nped, seed=0):
+        pass
+    python_time = time.perf_counter() - start
+    print(f"{len(schedule)} llegadas: numpy {numpy_time*1000:.1f} ms, "
+          f"python {python_time*1000:.1f} ms ({python_time/numpy_time:.0f}x)")
+
+    for cls, name in ((NORTH, 'north'), (SOUTH, 'south'), (PED, 'ped')):
+        d = schedule.duration[schedule.cls == cls]
+        print(f"    {name:<6} cruce medio {d.mean():.2f}s, desviación {d.std():.2f}s")
+
+    start = time.perf_counter()
+    records = simulate(arrivals=schedule.arrivals())
+    stuck = sum(1 for v in records if v[4] is None)
+    print(f"simulados en {time.perf_counter() - start:.1f} s, {stuck} bloqueados")
+
+
+if __name__ == '__main__':
+    main()
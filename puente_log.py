@@ -0,0 +1,181 @@
+"""
+Registro binario de eventos del puente
+
+Uso:
+    python puente_log.py run <fichero>    ejecuta puente_03 guardando el registro
+    python puente_log.py csv <fichero>    vuelca el registro como CSV
+
+Cada vehículo genera cuatro eventos (WANTS, ENTERS, LEAVING, OUT). En lugar
+de imprimirlos, los procesos los escriben como registros de tamaño fijo en un
+buffer circular de memoria compartida y un único proceso vaciador los pasa a
+disco en binario.
+"""
+
+import sys
+import time
+import struct
+from ctypes import Structure, c_double, c_int8, c_int32, c_uint64
+from multiprocessing import Process, Value, Event as StopFlag
+from multiprocessing.sharedctypes import RawArray
+
+import puente_03
+from puente_03 import NORTH, SOUTH, PED, MESSAGES, Monitor
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH
+
+
+CAPACITY = 4096 # registros en el buffer circular
+SNAPSHOT = 7 # ON, WAITING y TURN del bloque de estado del monitor
+
+# formato en disco: instante, id, clase, evento y la foto del monitor
+RECORD = struct.Struct(f'<dibb{SNAPSHOT}i')
+MAGIC = b'PUENTE01'
+
+COLUMNS = ('t', 'vid', 'kind', 'direction', 'event',
+           'cn', 'cs', 'p', 'cwn', 'cws', 'pw', 'turn')
+
+
+class Slot(Structure):
+    '''
+    Una posición del buffer circular. seq se escribe lo último: vale i + 1
+    cuando el registro número i está completo, así el vaciador sabe que puede
+    leerlo sin compartir ningún cerrojo con quien escribe.
+    '''
+    _fields_ = [('seq', c_uint64),
+                ('t', c_double),
+                ('vid', c_int32),
+                ('cls', c_int8),
+                ('event', c_int8),
+                ('snapshot', c_int32 * SNAPSHOT)]
+
+
+class EventLog():
+    '''
+    Buffer circular de registros en memoria compartida.
+
+    record() no coge el mutex del monitor: reserva un hueco con el cerrojo
+    propio del contador head (una suma), copia el registro y lo publica. La
+    foto del monitor es una copia coherente sacada sin cerrojo
+    (Monitor.snapshot). Si el buffer está lleno, quien escribe espera a
+    que el vaciador libere sitio en lugar de perder registros.
+    '''
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self.ring = RawArray(Slot, capacity)
+        self.head = Value('Q', 0) #siguiente registro a reservar
+        self.tail = Value('Q', 0, lock=False) #siguiente registro a vaciar
+        self.stop_flag = StopFlag()
+        self.drainer = None
+
+    def record(self, vid: int, cls: int, event: int, monitor: Monitor) -> None:
+        with self.head.get_lock():
+            i = self.head.value
+            self.head.value = i + 1
+        while i - self.tail.value >= self.capacity:
+            time.sleep(0.0005)
+        slot = self.ring[i % self.capacity]
+        slot.t = time.time()
+        slot.vid = vid
+        slot.cls = cls
+        slot.event = event
+        slot.snapshot[:] = monitor.snapshot()[:SNAPSHOT]
+        slot.seq = i + 1
+
+    def drain(self, path: str) -> None:
+        '''
+        Bucle del proceso vaciador: escribe en orden los registros publicados
+        hasta que se pide parar y no queda ninguno pendiente
+        '''
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            i = 0
+            while True:
+                slot = self.ring[i % self.capacity]
+                if slot.seq == i + 1:
+                    f.write(RECORD.pack(slot.t, slot.vid, slot.cls, slot.event,
+                                        *slot.snapshot))
+                    i += 1
+                    self.tail.value = i
+                elif self.stop_flag.is_set() and i == self.head.value:
+                    break
+                else:
+                    time.sleep(0.001)
+
+    def start(self, path: str) -> None:
+        self.drainer = Process(target=self.drain, args=(path,))
+        self.drainer.start()
+
+    def stop(self) -> None:
+        self.stop_flag.set()
+        self.drainer.join()
+
+
+class NullLog():
+    '''
+    Descarta los eventos: para ejecuciones en las que no interesan los
+    mensajes de cada vehículo
+    '''
+
+    def record(self, vid: int, cls: int, event: int, monitor: Monitor) -> None:
+        pass
+
+
+def read(path: str):
+    '''
+    Recorre un fichero de registro devolviendo tuplas con las columnas de
+    COLUMNS, sin cargarlo entero en memoria
+    '''
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un registro del puente")
+        while True:
+            data = f.read(RECORD.size * 1024)
+            if not data:
+                break
+            for t, vid, cls, event, *snapshot in RECORD.iter_unpack(data):
+                if cls == PED:
+                    kind, direction = 'pedestrian', ''
+                else:
+                    kind, direction = 'car', cls
+                yield (t, vid, kind, direction, MESSAGES[event], *snapshot)
+
+
+def to_csv(path: str, out=sys.stdout) -> None:
+    out.write(','.join(COLUMNS) + '\n')
+    for row in read(path):
+        out.write(f"{row[0]:.6f}," + ','.join(str(x) for x in row[1:]) + '\n')
+
+
+def run(path: str) -> None:
+    '''
+    main() de puente_03 con los eventos en el registro en lugar de en pantalla
+    '''
+    monitor = Monitor()
+    log = EventLog()
+    log.start(path)
+    gcars_north = Process(target=puente_03.gen_cars,
+                          args=(NORTH, TIME_CARS_NORTH, monitor, log))
+    gcars_south = Process(target=puente_03.gen_cars,
+                          args=(SOUTH, TIME_CARS_SOUTH, monitor, log))
+    gped = Process(target=puente_03.gen_pedestrian, args=(monitor, log))
+    gcars_north.start()
+    gcars_south.start()
+    gped.start()
+    gcars_north.join()
+    gcars_south.join()
+    gped.join()
+    log.stop()
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in ('run', 'csv'):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'run':
+        run(sys.argv[2])
+    else:
+        to_csv(sys.argv[2])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+Métricas del puente: tiempos de espera y de cruce, rendimiento y uso
+
+Uso:
+    python puente_metricas.py [periodo]
+
+ejecuta puente_03 con métricas e imprime una foto cada `periodo` segundos.
+"""
+
+import sys
+import math
+import time
+from multiprocessing import Process
+from multiprocessing.sharedctypes import RawArray
+
+import puente_03
+from puente_03 import NORTH, SOUTH, PED, Monitor
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH
+from puente_log import NullLog
+
+
+CLASSES = (NORTH, SOUTH, PED)
+NAMES = ('north', 'south', 'ped')
+
+# histogramas con cubetas logarítmicas: STEPS cubetas por cada potencia de 2
+# a partir de MIN_TIME segundos
+MIN_TIME = 1e-6
+STEPS = 4
+NBUCKETS = 40 * STEPS # hasta unos 10**6 s
+
+WAIT = 0 #histograma de espera (de wants_enter_* a la entrada)
+BRIDGE = 1 #histograma de tiempo en el puente
+
+#posiciones de los contadores enteros
+ADMITTED = 0 #ADMITTED + clase
+FINISHED = 3 #FINISHED + clase
+SWITCHES = 6 #cambios de la clase que ocupa el puente
+LAST = 7 #última clase que ha entrado (-1 al principio)
+OCCUPANCY = 8 #vehículos en el puente según las métricas
+NCOUNTERS = 9
+
+#posiciones de los contadores reales
+START = 0
+IDLE = 1 #tiempo total con el puente vacío hasta IDLE_SINCE
+IDLE_SINCE = 2
+WAIT_SUM = 3 #WAIT_SUM + clase
+NTIMES = 6
+
+
+def bucket(t: float) -> int:
+    if t <= MIN_TIME:
+        return 0
+    return min(int(math.log2(t / MIN_TIME) * STEPS), NBUCKETS - 1)
+
+
+def bucket_time(b: int) -> float:
+    '''
+    Extremo superior de la cubeta b
+    '''
+    return MIN_TIME * 2 ** ((b + 1) / STEPS)
+
+
+class Metrics():
+    '''
+    Contadores e histogramas en memoria compartida sin cerrojo propio.
+
+    Los métodos admitted y left los llama el Monitor con su mutex cogido, así
+    que no hace falta más sincronización para escribir. snapshot() lee sin
+    cerrojo desde cualquier proceso mientras sigue el tráfico: los valores
+    pueden ser de instantes ligeramente distintos, pero nunca se para a los
+    vehículos.
+    '''
+
+    def __init__(self):
+        self.hist = RawArray('Q', len(CLASSES) * 2 * NBUCKETS)
+        self.counters = RawArray('q', NCOUNTERS)
+        self.times = RawArray('d', NTIMES)
+        now = time.monotonic()
+        self.counters[LAST] = -1
+        self.times[START] = now
+        self.times[IDLE_SINCE] = now
+
+    def _add(self, cls: int, which: int, t: float) -> None:
+        self.hist[(cls * 2 + which) * NBUCKETS + bucket(t)] += 1
+
+    def admitted(self, cls: int, wait: float, now: float) -> None:
+        '''
+        Un vehículo de la clase cls acaba de entrar tras esperar wait segundos
+        '''
+        c = self.counters
+        self._add(cls, WAIT, wait)
+        c[ADMITTED + cls] += 1
+        self.times[WAIT_SUM + cls] += wait
+        if c[LAST] != cls:
+            if c[LAST] != -1:
+                c[SWITCHES] += 1
+            c[LAST] = cls
+        if c[OCCUPANCY] == 0:
+            self.times[IDLE] += now - self.times[IDLE_SINCE]
+        c[OCCUPANCY] += 1
+
+    def left(self, cls: int, entered: float, now: float) -> None:
+        '''
+        Un vehículo de la clase cls que entró en el instante entered sale.
+        Con entered None (quien sale no guardó su instante de entrada) se
+        cuentan igual la salida y la ocupación, y sólo falta su tiempo en el
+        histograma del puente.
+        '''
+        c = self.counters
+        if entered is not None:
+            self._add(cls, BRIDGE, now - entered)
+        c[FINISHED + cls] += 1
+        c[OCCUPANCY] -= 1
+        if c[OCCUPANCY] == 0:
+            self.times[IDLE_SINCE] = now
+
+    def percentiles(self, cls: int, which: int, ps=(0.5, 0.95, 0.99)) -> tuple:
+        start = (cls * 2 + which) * NBUCKETS
+        counts = self.hist[start:start + NBUCKETS]
+        total = sum(counts)
+        if total == 0:
+            return tuple(None for _ in ps)
+        result = []
+        for p in ps:
+            target = p * total
+            acc = 0
+            for b, n in enumerate(counts):
+                acc += n
+                if acc >= target:
+                    result.append(bucket_time(b))
+                    break
+        return tuple(result)
+
+    def snapshot(self) -> dict:
+        '''
+        Foto de las métricas en este instante
+        '''
+        now = time.monotonic()
+        c = self.counters
+        elapsed = now - self.times[START]
+        idle = self.times[IDLE]
+        if c[OCCUPANCY] == 0:
+            idle += now - self.times[IDLE_SINCE]
+        snap = {
+            'elapsed': elapsed,
+            'switches': c[SWITCHES],
+            'idle_fraction': idle / elapsed if elapsed > 0 else 0.0,
+            'throughput': sum(c[FINISHED + k] for k in CLASSES) / elapsed
+                          if elapsed > 0 else 0.0,
+        }
+        for k, name in zip(CLASSES, NAMES):
+            admitted = c[ADMITTED + k]
+            snap[name] = {
+                'admitted': admitted,
+                'finished': c[FINISHED + k],
+                'throughput': c[FINISHED + k] / elapsed if elapsed > 0 else 0.0,
+                'wait_mean': self.times[WAIT_SUM + k] / admitted if admitted else None,
+                'wait_p50_p95_p99': self.percentiles(k, WAIT),
+                'bridge_p50_p95_p99': self.percentiles(k, BRIDGE),
+            }
+        return snap
+
+
+def fmt(ps: tuple) -> str:
+    return '/'.join('-' if p is None else f"{p:.3f}" for p in ps)
+
+
+def show(snap: dict) -> None:
+    print(f"t={snap['elapsed']:.1f}s  {snap['throughput']:.2f} veh/s  "
+          f"cambios {snap['switches']}  vacío {100*snap['idle_fraction']:.0f}%")
+    for name in NAMES:
+        s = snap[name]
+        print(f"    {name:<6} {s['finished']:5d} cruzados  "
+              f"espera p50/p95/p99 {fmt(s['wait_p50_p95_p99'])} s  "
+              f"puente {fmt(s['bridge_p50_p95_p99'])} s")
+
+
+def run(period: float = 2.0) -> None:
+    '''
+    main() de puente_03 con métricas y sin mensajes por vehículo
+    '''
+    metrics = Metrics()
+    monitor = Monitor(metrics)
+    log = NullLog()
+    plst = [Process(target=puente_03.gen_cars, args=(NORTH, TIME_CARS_NORTH, monitor, log)),
+            Process(target=puente_03.gen_cars, args=(SOUTH, TIME_CARS_SOUTH, monitor, log)),
+            Process(target=puente_03.gen_pedestrian, args=(monitor, log))]
+    for p in plst:
+        p.start()
+    while any(p.is_alive() for p in plst):
+        time.sleep(period)
+        show(metrics.snapshot())
+    for p in plst:
+        p.join()
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
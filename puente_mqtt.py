@@ -0,0 +1,268 @@
+"""
+Publicación de los eventos del puente en MQTT
+
+Uso:
+    python puente_mqtt.py [coches] [procesos]
+
+mide cuánto tarda cada coche en pedir entrar, entrar, salir y salir del
+todo (wants_enter_car y leaves_car con sus cuatro eventos), y cuánto de eso
+son las llamadas al monitor, sin publicar, publicando en un LocalBroker y
+publicando en un LocalBroker lento.
+
+MqttPublisher es un registro con la interfaz de puente_log (record), así que
+se pasa como log a car, pedestrian o los generadores. Los vehículos dejan
+cada evento en el buffer circular de puente_log.EventLog, fuera del mutex
+del monitor, y un proceso publicador los agrupa y publica un mensaje JSON
+por tema con todos los eventos del lote. Los temas son
+<prefijo>/<puente>/<clase> (por ejemplo puente/0/north). Un lote se publica
+al llegar a batch eventos o period segundos después de su primer evento.
+
+Si el broker va lento, el buffer se llena y los vehículos esperan en record
+hasta que haya sitio (contrapresión): no se pierden eventos y el mutex del
+monitor no se retiene nunca por culpa del broker.
+
+Para publicar en un broker de verdad hace falta paho-mqtt; sin él se puede
+usar LocalBroker, que guarda los mensajes en una cola entre procesos.
+"""
+
+import sys
+import json
+import time
+import threading
+from multiprocessing import Process, Queue
+from multiprocessing.sharedctypes import RawArray
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    mqtt = None
+
+from puente_03 import Monitor, NORTH, MESSAGES
+from puente_03 import WANTS, ENTERS, LEAVING, OUT, report
+from puente_log import EventLog, NullLog, CAPACITY
+
+
+NAMES = ('north', 'south', 'ped')
+PREFIX = 'puente'
+BATCH = 256 # eventos por lote como mucho
+PERIOD = 0.05 # segundos que espera un lote a llenarse
+
+# marcas de LocalBroker en la cola de mensajes
+FLUSH = 'flush'
+CLOSE = 'close'
+
+
+def paho(host: str = 'localhost', port: int = 1883):
+    '''
+    Cliente paho conectado a un broker, con su hilo de red en marcha
+    '''
+    if mqtt is None:
+        raise ImportError("para publicar en un broker MQTT hace falta paho-mqtt")
+    if hasattr(mqtt, 'CallbackAPIVersion'):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    else:
+        client = mqtt.Client()
+    client.connect(host, port)
+    client.loop_start()
+    return client
+
+
+class LocalClient():
+    '''
+    Cliente de LocalBroker con la parte de la interfaz de paho que se usa
+    '''
+
+    def __init__(self, messages: Queue, delay: float):
+        self.messages = messages
+        self.delay = delay
+
+    def publish(self, topic: str, payload: str, qos: int = 0) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        self.messages.put((topic, payload))
+
+    def loop_stop(self) -> None:
+        pass
+
+    def disconnect(self) -> None:
+        pass
+
+
+class LocalBroker():
+    '''
+    Sustituto de un broker para pruebas: guarda los mensajes publicados
+    desde cualquier proceso. delay simula un broker lento (segundos por
+    mensaje). Un hilo del proceso que lo crea va recogiendo los mensajes
+    para que la cola no se llene.
+    '''
+
+    def __init__(self, delay: float = 0.0):
+        self.queue = Queue()
+        self.delay = delay
+        self.received = []
+        self.lock = threading.Lock() #received lo escribe el hilo recolector
+        self.flushed = threading.Event()
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+
+    def _collect(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item == FLUSH:
+                self.flushed.set()
+                continue
+            if item == CLOSE:
+                break
+            topic, payload = item
+            with self.lock:
+                self.received.append((topic, json.loads(payload)))
+
+    def connect(self) -> LocalClient:
+        return LocalClient(self.queue, self.delay)
+
+    def messages(self) -> list:
+        '''
+        Copia de los mensajes publicados hasta ahora, (tema, eventos). Antes
+        de copiar se espera a que el recolector llegue a una marca puesta en
+        la cola, así que están todos los publicados antes de la llamada
+        '''
+        self.flushed.clear()
+        self.queue.put(FLUSH)
+        self.flushed.wait()
+        with self.lock:
+            return list(self.received)
+
+    def close(self) -> None:
+        '''
+        Para el hilo recolector
+        '''
+        self.queue.put(CLOSE)
+        self.collector.join()
+
+
+class MqttPublisher(EventLog):
+    '''
+    Registro que publica los eventos en MQTT por lotes (ver el comentario
+    del módulo). connect se llama en el proceso publicador y devuelve el
+    cliente; por defecto paho() contra localhost:1883.
+    '''
+
+    def __init__(self, connect=None, bridge: int = 0, prefix: str = PREFIX,
+                 batch: int = BATCH, period: float = PERIOD,
+                 capacity: int = CAPACITY):
+        super().__init__(capacity)
+        self.connect = connect or paho
+        self.topics = [f"{prefix}/{bridge}/{name}" for name in NAMES]
+        self.batch = batch
+        self.period = period
+
+    def publish(self) -> None:
+        '''
+        Bucle del proceso publicador: recoge los eventos en orden y publica
+        cada lote hasta que se pide parar y no queda ninguno pendiente
+        '''
+        client = self.connect()
+        batches = [[], [], []]
+        pending = 0
+        deadline = 0.0
+        i = 0
+        while True:
+            slot = self.ring[i % self.capacity]
+            ready = slot.seq == i + 1
+            if ready:
+                if pending == 0:
+                    deadline = time.monotonic() + self.period
+                batches[slot.cls].append({'t': slot.t, 'vid': slot.vid,
+                                          'event': MESSAGES[slot.event],
+                                          'state': slot.snapshot[:]})
+                pending += 1
+                i += 1
+                self.tail.value = i
+            finishing = self.stop_flag.is_set() and i == self.head.value
+            if pending and (pending >= self.batch or finishing or
+                            time.monotonic() >= deadline):
+                for topic, events in zip(self.topics, batches):
+                    if events:
+                        client.publish(topic, json.dumps(events))
+                        events.clear()
+                pending = 0
+            if finishing:
+                break
+            if not ready:
+                time.sleep(0.001)
+        client.loop_stop()
+        client.disconnect()
+
+    def start(self) -> None:
+        self.drainer = Process(target=self.publish)
+        self.drainer.start()
+
+
+def cars(monitor: Monitor, log, first: int, n: int, latencies, calls) -> None:
+    '''
+    n coches seguidos hacia el norte; guarda en latencies lo que tarda cada
+    uno en entrar y salir con sus cuatro eventos y en calls lo que tardan
+    sólo wants_enter_car y leaves_car
+    '''
+    for cid in range(first, first + n):
+        start = time.perf_counter()
+        report(cid, NORTH, WANTS, monitor, log)
+        t0 = time.perf_counter()
+        monitor.wants_enter_car(NORTH)
+        t1 = time.perf_counter()
+        report(cid, NORTH, ENTERS, monitor, log)
+        report(cid, NORTH, LEAVING, monitor, log)
+        t2 = time.perf_counter()
+        monitor.leaves_car(NORTH)
+        t3 = time.perf_counter()
+        report(cid, NORTH, OUT, monitor, log)
+        latencies[cid] = time.perf_counter() - start
+        calls[cid] = t1 - t0 + t3 - t2
+
+
+def measure(log, ncars: int, nprocs: int) -> tuple:
+    '''
+    Latencia media y p99 por coche, en segundos: del coche entero y de las
+    llamadas al monitor
+    '''
+    monitor = Monitor()
+    latencies = RawArray('d', ncars)
+    calls = RawArray('d', ncars)
+    per = ncars // nprocs
+    plst = [Process(target=cars, args=(monitor, log, k * per, per, latencies, calls))
+            for k in range(nprocs)]
+    for p in plst:
+        p.start()
+    for p in plst:
+        p.join()
+    result = ()
+    for times in (latencies, calls):
+        values = sorted(times[:per * nprocs])
+        result += (sum(values) / len(values), values[int(0.99 * (len(values) - 1))])
+    return result
+
+
+def show(title: str, times: tuple, extra: str = '') -> None:
+    us = ' '.join(f"{t*1e6:8.1f}" for t in times)
+    print(f"{title:<20}{us}   {extra}")
+
+
+def main():
+    ncars = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    nprocs = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"{'':<20}coche media/p99 (µs)  monitor media/p99 (µs)")
+    show('sin publicar', measure(NullLog(), ncars, nprocs))
+    for title, delay in (("LocalBroker", 0.0), ("LocalBroker lento", 0.002)):
+        broker = LocalBroker(delay)
+        publisher = MqttPublisher(broker.connect)
+        publisher.start()
+        times = measure(publisher, ncars, nprocs)
+        publisher.stop()
+        messages = broker.messages()
+        broker.close()
+        events = sum(len(e) for _, e in messages)
+        show(title, times, f"{events} eventos en {len(messages)} mensajes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Panel del puente: consultas muy frecuentes del estado del Monitor
+
+Uso:
+    python puente_panel.py [vueltas] [periodo]
+
+hace cruzar el puente sin pausas a coches de las dos direcciones y peatones
+(vueltas entradas y salidas por proceso, 50000 por defecto) mientras un
+proceso panel consulta el estado cada periodo segundos (0 por defecto: sin
+pausa entre consultas) de tres maneras: copiando el bloque de estado tal
+cual, con Monitor.snapshot y cogiendo el mutex. Para cada una imprime
+cuánto tarda el tráfico, cuántas consultas se hacen y cuántas fotos son imposibles (coches
+en las dos direcciones a la vez, coches con peatones, contadores negativos
+o más entradas concedidas que vehículos en el puente).
+
+Panel se puede usar igual con cualquier ejecución: guarda en un CSV una
+fila por consulta con las columnas de COLUMNS.
+"""
+
+import sys
+import time
+from multiprocessing import Process, Event as StopFlag
+from multiprocessing.sharedctypes import RawArray
+
+from puente_03 import Monitor, NORTH, SOUTH, PED
+from puente_03 import ON, WAITING, TURN, GRANTED, ADMITTED, SEQ
+
+
+CLASSES = (NORTH, SOUTH, PED)
+NAMES = ('north', 'south', 'ped')
+COLUMNS = ('t',) + tuple(f"{what}_{name}" for what in ('on', 'waiting', 'admitted')
+                         for name in NAMES) + ('turn',)
+
+PERIOD = 0.0005
+
+# formas de leer el estado
+RAW = 'raw'
+SEQLOCK = 'seqlock'
+MUTEX = 'mutex'
+
+
+def possible(state: list) -> bool:
+    '''
+    Si una foto del estado puede darse de verdad
+    '''
+    if sum(1 for k in CLASSES if state[ON + k] > 0) > 1:
+        return False
+    return all(state[ON + k] >= 0 and state[WAITING + k] >= 0 and
+               0 <= state[GRANTED + k] <= state[ON + k] for k in CLASSES)
+
+
+class Panel():
+    '''
+    Proceso que consulta el estado de un monitor cada period segundos sin
+    frenar a los vehículos (Monitor.snapshot). Cuenta las consultas y las
+    fotos imposibles en counts y, si se da path, escribe cada foto en un CSV.
+    how elige cómo se lee el estado (RAW, SEQLOCK o MUTEX), para comparar.
+    '''
+
+    def __init__(self, monitor: Monitor, period: float = PERIOD,
+                 path: str = None, how: str = SEQLOCK):
+        self.monitor = monitor
+        self.period = period
+        self.path = path
+        self.how = how
+        self.counts = RawArray('q', 2) # consultas, fotos imposibles
+        self.stop_flag = StopFlag()
+        self.process = None
+
+    def read(self) -> list:
+        monitor = self.monitor
+        if self.how == RAW:
+            return monitor.state[:SEQ]
+        elif self.how == MUTEX:
+            with monitor.mutex:
+                return monitor.state[:SEQ]
+        return monitor.snapshot()
+
+    def poll(self) -> None:
+        out = open(self.path, 'w') if self.path else None
+        if out:
+            out.write(','.join(COLUMNS) + '\n')
+        start = time.monotonic()
+        while not self.stop_flag.is_set():
+            state = self.read()
+            self.counts[0] += 1
+            if not possible(state):
+                self.counts[1] += 1
+            if out:
+                row = [state[base + k] for base in (ON, WAITING, ADMITTED) for k in CLASSES]
+                out.write(f"{time.monotonic() - start:.6f}," +
+                          ','.join(str(x) for x in row + [state[TURN]]) + '\n')
+            if self.period > 0:
+                time.sleep(self.period)
+        if out:
+            out.close()
+
+    def start(self) -> None:
+        self.process = Process(target=self.poll)
+        self.process.start()
+
+    def stop(self) -> None:
+        self.stop_flag.set()
+        self.process.join()
+
+
+def traffic(monitor: Monitor, cls: int, n: int) -> None:
+    for _ in range(n):
+        if cls == PED:
+            monitor.wants_enter_pedestrian()
+            monitor.leaves_pedestrian()
+        else:
+            monitor.wants_enter_car(cls)
+            monitor.leaves_car(cls)
+
+
+def run(how: str, laps: int, period: float) -> tuple:
+    '''
+    Duración del tráfico, consultas y fotos imposibles con un panel que lee
+    de la manera how (None: sin panel)
+    '''
+    monitor = Monitor()
+    panel = None
+    if how is not None:
+        panel = Panel(monitor, period, how=how)
+        panel.start()
+    plst = [Process(target=traffic, args=(monitor, cls, laps))
+            for cls in (NORTH, NORTH, SOUTH, SOUTH, PED)]
+    start = time.monotonic()
+    for p in plst:
+        p.start()
+    for p in plst:
+        p.join()
+    elapsed = time.monotonic() - start
+    if panel is None:
+        return elapsed, 0, 0
+    panel.stop()
+    return elapsed, panel.counts[0], panel.counts[1]
+
+
+def main():
+    laps = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    period = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    for how in (None, RAW, SEQLOCK, MUTEX):
+        elapsed, polls, impossible = run(how, laps, period)
+        print(f"{how or 'sin panel':<10} tráfico {elapsed:6.2f}s   {polls:7d} consultas "
+              f"({polls/elapsed:8.0f}/s)   {impossible} fotos imposibles")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Pelotones de coches: los que llegan casi a la vez entran y salen juntos
+
+Uso:
+    python puente_pelotones.py [ventana] [escala]
+
+compara, con mucho tráfico de coches, cuántas veces se coge el mutex del
+monitor y cuánto esperan los coches sin agrupar y agrupando en pelotones
+los coches de cada dirección que llegan en menos de `ventana` segundos
+(0.5 por defecto). Los tiempos van comprimidos por `escala` (0.02).
+
+Un pelotón usa Monitor.wants_enter_cars y Monitor.leaves_cars: una sección
+crítica para entrar y otra para salir sea cual sea su tamaño, con las mismas
+reglas de turno que un coche suelto.
+"""
+
+import sys
+import time
+import random
+from multiprocessing import Process, Array
+
+from puente_03 import Monitor, NORTH, SOUTH, NCARS
+from puente_03 import WANTS, ENTERS, LEAVING, OUT
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH
+from puente_03 import report, crossing_time, delay_car_north, delay_car_south
+
+
+WINDOW = 0.5 # segundos desde el primer coche del pelotón
+
+
+def platoon(cids: list, direction: int, monitor: Monitor, log=None,
+            scale: float = 1.0, waits=None, arrivals: list = None) -> None:
+    '''
+    Un pelotón de coches de la misma dirección. Cruza el puente en lo que
+    tardaría el más lento de ellos. Si se da waits (un array compartido), se
+    suma en waits[0] la espera de sus coches desde que llegó cada uno
+    (arrivals, en time.monotonic()), incluido el tiempo esperando a que se
+    forme el pelotón, y en waits[1] cuántos son.
+    '''
+    for cid in cids:
+        report(cid, direction, WANTS, monitor, log)
+    entered = monitor.wants_enter_cars(direction, len(cids))
+    if waits is not None:
+        now = time.monotonic()
+        with waits.get_lock():
+            waits[0] += sum(now - t for t in arrivals)
+            waits[1] += len(cids)
+    for cid in cids:
+        report(cid, direction, ENTERS, monitor, log)
+    duration = max(crossing_time(direction) for _ in cids) * scale
+    if direction == NORTH:
+        delay_car_north(duration)
+    else:
+        delay_car_south(duration)
+    for cid in cids:
+        report(cid, direction, LEAVING, monitor, log)
+    monitor.leaves_cars(direction, len(cids), entered)
+    for cid in cids:
+        report(cid, direction, OUT, monitor, log)
+
+
+def gen_platoons(direction: int, time_cars, monitor: Monitor,
+                 window: float = WINDOW, ncars: int = NCARS, log=None,
+                 scale: float = 1.0, waits=None, seed: int = None) -> None:
+    '''
+    Con esta función se generan los coches, con las mismas llegadas que
+    gen_cars (de un generador propio con la semilla seed), pero agrupados:
+    todos los que llegan en menos de window segundos desde el primero que
+    espera forman un pelotón, que sale en cuanto llega el último. Con
+    window=0 cada coche va solo (salvo que lleguen exactamente a la vez).
+    Con scale < 1 los tiempos se comprimen.
+    '''
+    rng = random.Random(seed)
+    plst = []
+    cid = 0
+    next_arrival = time.monotonic()
+    while cid < ncars:
+        opened = next_arrival
+        cids, arrivals = [], []
+        while cid < ncars and next_arrival <= opened + window * scale:
+            delay = next_arrival - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            cid += 1
+            cids.append(cid)
+            arrivals.append(next_arrival)
+            next_arrival += rng.expovariate(1/time_cars) * scale
+        p = Process(target=platoon,
+                    args=(cids, direction, monitor, log, scale, waits, arrivals))
+        p.start()
+        plst.append(p)
+        if len(plst) > 64:
+            plst = [p for p in plst if p.is_alive()]
+
+    for p in plst:
+        p.join()
+
+
+def run(window: float, scale: float, ncars: int, time_cars: float,
+        seed: int = 0) -> tuple:
+    '''
+    Coches en las dos direcciones, sin peatones, con llegadas distintas en
+    cada dirección (semillas seed y seed + 1) pero las mismas en cada
+    ejecución. Devuelve las veces que se ha cogido el mutex, la espera
+    media y la duración total.
+    '''
+    import puente_perfil
+    from puente_log import NullLog
+    monitor = Monitor()
+    profiler = puente_perfil.profile(monitor)
+    waits = Array('d', 2)
+    log = NullLog()
+    start = time.monotonic()
+    plst = [Process(target=gen_platoons,
+                    args=(d, time_cars, monitor, window, ncars, log, scale, waits,
+                          seed + d))
+            for d in (NORTH, SOUTH)]
+    for p in plst:
+        p.start()
+    for p in plst:
+        p.join()
+    elapsed = time.monotonic() - start
+    calls = sum(m['calls'] for m in profiler.report()['methods'].values())
+    return calls, waits[0] / waits[1] / scale, elapsed / scale
+
+
+def main():
+    window = float(sys.argv[1]) if len(sys.argv) > 1 else WINDOW
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    ncars, time_cars = 500, min(TIME_CARS_NORTH, TIME_CARS_SOUTH) / 5
+    for w in (0.0, window):
+        calls, wait, elapsed = run(w, scale, ncars, time_cars)
+        print(f"ventana {w:4.2f}s: {calls:5d} veces el mutex, espera media "
+              f"{wait:6.2f}s, {elapsed:6.1f}s en total")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Perfil del Monitor: cerrojo, condiciones y predicados
+
+Uso:
+    python puente_perfil.py [escala] [timeline.csv]
+
+reproduce las llegadas de main() de puente_03 (comprimidas en el tiempo por
+escala, 0.05 por defecto) con el monitor perfilado, imprime el informe y
+guarda la evolución en el tiempo en timeline.csv.
+
+El perfil es opcional: profile(monitor) cambia el mutex, las tres
+condiciones y la política del monitor por envoltorios que miden, y un
+Monitor sin perfilar no lleva ningún código de medida. Todas las medidas se
+escriben con el mutex del monitor cogido, así que no necesitan cerrojo
+propio.
+"""
+
+import sys
+import time
+from multiprocessing import Process, Event as StopFlag
+from multiprocessing.sharedctypes import RawArray
+
+from puente_03 import Monitor, NORTH, SOUTH, PED, ON
+from puente_metricas import bucket, bucket_time, NBUCKETS
+
+
+CLASSES = (NORTH, SOUTH, PED)
+NAMES = ('north', 'south', 'ped')
+METHODS = ('wants_enter_car', 'leaves_car', 'wants_enter_pedestrian',
+           'leaves_pedestrian', 'wants_enter_cars', 'leaves_cars', 'other')
+OTHER = len(METHODS) - 1
+
+#posiciones de las medidas reales de cada método: método * NTIMES + medida
+CALLS = 0
+ACQUIRE_SUM = 1 #espera para coger el mutex
+ACQUIRE_MAX = 2
+HOLD_SUM = 3 #tiempo con el mutex cogido, sin contar las esperas en condiciones
+HOLD_MAX = 4
+NTIMES = 5
+
+ACQUIRE = 0 #histograma de espera por el mutex
+HOLD = 1 #histograma de tiempo con el mutex
+
+#posiciones de los contadores por clase: contador + clase
+EVALS = 0 #evaluaciones del predicado
+ADMISSIONS = 3 #entradas concedidas
+WAITS = 6 #veces que un proceso se ha dormido en la condición
+BLOCKED = 9 #procesos dormidos ahora en la condición
+MAX_BLOCKED = 12
+NCOUNTERS = 15
+
+TIMELINE = ('t', 'blocked_north', 'blocked_south', 'blocked_ped',
+            'on_north', 'on_south', 'on_ped', 'acquisitions', 'hold')
+
+
+class Stats():
+    '''
+    Medidas en memoria compartida del perfil
+    '''
+
+    def __init__(self):
+        self.times = RawArray('d', len(METHODS) * NTIMES)
+        self.hist = RawArray('Q', len(METHODS) * 2 * NBUCKETS)
+        self.counters = RawArray('q', NCOUNTERS)
+        self.start = time.monotonic()
+
+    def add(self, method: int, which: int, t: float) -> None:
+        base = method * NTIMES
+        if which == ACQUIRE:
+            self.times[base + CALLS] += 1
+            self.times[base + ACQUIRE_SUM] += t
+            self.times[base + ACQUIRE_MAX] = max(self.times[base + ACQUIRE_MAX], t)
+        else:
+            self.times[base + HOLD_SUM] += t
+            self.times[base + HOLD_MAX] = max(self.times[base + HOLD_MAX], t)
+        self.hist[(method * 2 + which) * NBUCKETS + bucket(t)] += 1
+
+    def p99(self, method: int, which: int) -> float:
+        start = (method * 2 + which) * NBUCKETS
+        counts = self.hist[start:start + NBUCKETS]
+        target = 0.99 * sum(counts)
+        acc = 0
+        for b, n in enumerate(counts):
+            acc += n
+            if n and acc >= target:
+                return bucket_time(b)
+        return None
+
+
+class ProfiledLock():
+    '''
+    Envoltorio del mutex. El método que lo coge se saca del marco de quien
+    llama a acquire (wants_enter_car, leaves_car...). Sólo hay un dueño a la
+    vez, así que method, since y held describen siempre la posesión actual.
+    '''
+
+    def __init__(self, lock, stats: Stats):
+        self.lock = lock
+        self.stats = stats
+        self.method = OTHER
+        self.since = 0.0
+        self.held = 0.0
+
+    def acquire(self) -> None:
+        start = time.perf_counter()
+        self.lock.acquire()
+        now = time.perf_counter()
+        frame = sys._getframe(1)
+        if frame.f_code.co_name == '__enter__':
+            frame = frame.f_back
+        name = frame.f_code.co_name
+        self.method = METHODS.index(name) if name in METHODS else OTHER
+        self.stats.add(self.method, ACQUIRE, now - start)
+        self.since = now
+        self.held = 0.0
+
+    def release(self) -> None:
+        self.stats.add(self.method, HOLD, self.held + time.perf_counter() - self.since)
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class ProfiledCondition():
+    '''
+    Envoltorio de una condición: cuenta los procesos dormidos en ella y saca
+    la espera del tiempo de posesión del mutex
+    '''
+
+    def __init__(self, condition, lock: ProfiledLock, cls: int):
+        self.condition = condition
+        self.lock = lock
+        self.cls = cls
+
+    def wait(self, timeout=None):
+        lock, counters = self.lock, self.lock.stats.counters
+        method = lock.method
+        held = lock.held + time.perf_counter() - lock.since
+        counters[WAITS + self.cls] += 1
+        counters[BLOCKED + self.cls] += 1
+        counters[MAX_BLOCKED + self.cls] = max(counters[MAX_BLOCKED + self.cls],
+                                               counters[BLOCKED + self.cls])
+        result = self.condition.wait(timeout)
+        counters[BLOCKED + self.cls] -= 1
+        lock.method, lock.held, lock.since = method, held, time.perf_counter()
+        return result
+
+    def notify(self, n=1):
+        self.condition.notify(n)
+
+    def notify_all(self):
+        self.condition.notify_all()
+
+
+class ProfiledPolicy():
+    '''
+    Envoltorio de la política: cuenta las evaluaciones de los predicados y
+    las entradas
+    '''
+
+    def __init__(self, policy, stats: Stats):
+        self.policy = policy
+        self.stats = stats
+
+    def admits(self, monitor, cls: int) -> bool:
+        self.stats.counters[EVALS + cls] += 1
+        return self.policy.admits(monitor, cls)
+
+    def entered(self, monitor, cls: int) -> None:
+        self.stats.counters[ADMISSIONS + cls] += 1
+        self.policy.entered(monitor, cls)
+
+    def leaves(self, monitor, cls: int):
+        return self.policy.leaves(monitor, cls)
+
+
+class Profiler():
+    '''
+    Perfil de un monitor: las medidas y, si se pide, un proceso que guarda
+    cada period segundos una fila de TIMELINE en un CSV
+    '''
+
+    def __init__(self, monitor: Monitor):
+        self.monitor = monitor
+        self.stats = Stats()
+        self.stop_flag = StopFlag()
+        self.sampler = None
+
+    def sample(self, path: str, period: float) -> None:
+        stats, state = self.stats, self.monitor.state
+        with open(path, 'w') as f:
+            f.write(','.join(TIMELINE) + '\n')
+            while not self.stop_flag.wait(period):
+                calls = sum(stats.times[m * NTIMES + CALLS] for m in range(len(METHODS)))
+                hold = sum(stats.times[m * NTIMES + HOLD_SUM] for m in range(len(METHODS)))
+                row = [time.monotonic() - stats.start]
+                row += [stats.counters[BLOCKED + k] for k in CLASSES]
+                row += [state[ON + k] for k in CLASSES]
+                row += [int(calls), hold]
+                f.write(','.join(f"{x:.6f}" if isinstance(x, float) else str(x)
+                                 for x in row) + '\n')
+
+    def start_timeline(self, path: str, period: float = 0.05) -> None:
+        self.sampler = Process(target=self.sample, args=(path, period))
+        self.sampler.start()
+
+    def stop(self) -> None:
+        if self.sampler is not None:
+            self.stop_flag.set()
+            self.sampler.join()
+
+    def report(self) -> dict:
+        stats = self.stats
+        elapsed = time.monotonic() - stats.start
+        result = {'elapsed': elapsed, 'methods': {}, 'classes': {}}
+        hold_total = 0.0
+        for m, name in enumerate(METHODS):
+            t = stats.times[m * NTIMES:(m + 1) * NTIMES]
+            if t[CALLS] == 0:
+                continue
+            hold_total += t[HOLD_SUM]
+            result['methods'][name] = {
+                'calls': int(t[CALLS]),
+                'acquire_mean': t[ACQUIRE_SUM] / t[CALLS],
+                'acquire_p99': capped(stats.p99(m, ACQUIRE), t[ACQUIRE_MAX]),
+                'acquire_max': t[ACQUIRE_MAX],
+                'hold_mean': t[HOLD_SUM] / t[CALLS],
+                'hold_p99': capped(stats.p99(m, HOLD), t[HOLD_MAX]),
+                'hold_max': t[HOLD_MAX],
+            }
+        result['lock_utilization'] = hold_total / elapsed if elapsed > 0 else 0.0
+        c = stats.counters
+        for k, name in zip(CLASSES, NAMES):
+            result['classes'][name] = {
+                'admissions': c[ADMISSIONS + k],
+                'evals_per_admission': c[EVALS + k] / c[ADMISSIONS + k]
+                                       if c[ADMISSIONS + k] else None,
+                'waits': c[WAITS + k],
+                'max_blocked': c[MAX_BLOCKED + k],
+            }
+        return result
+
+
+def capped(p99: float, maximum: float) -> float:
+    '''
+    El p99 del histograma, que va por cubetas, no pasa del máximo medido.
+    None si el método todavía no tiene muestras (por ejemplo, una llamada que
+    sigue esperando o con el mutex cogido)
+    '''
+    return None if p99 is None else min(p99, maximum)
+
+
+def profile(monitor: Monitor) -> Profiler:
+    '''
+    Activa el perfil en un monitor antes de empezar a usarlo (antes de
+    pasárselo a los procesos de los vehículos)
+    '''
+    profiler = Profiler(monitor)
+    lock = ProfiledLock(monitor.mutex, profiler.stats)
+    monitor.mutex = lock
+    monitor.can_north_cars = ProfiledCondition(monitor.can_north_cars, lock, NORTH)
+    monitor.can_south_cars = ProfiledCondition(monitor.can_south_cars, lock, SOUTH)
+    monitor.can_ped = ProfiledCondition(monitor.can_ped, lock, PED)
+    monitor.policy = ProfiledPolicy(monitor.policy, profiler.stats)
+    return profiler
+
+
+def show(r: dict) -> None:
+    ms = lambda x: f"{'-':>8}" if x is None else f"{x*1e6:8.1f}"
+    print(f"{r['elapsed']:.1f} s, mutex cogido el {100*r['lock_utilization']:.2f}% del tiempo")
+    print(f"{'método':<24}{'llamadas':>9}   espera mutex media/p99/máx (µs)"
+          f"      posesión media/p99/máx (µs)")
+    for name, s in r['methods'].items():
+        print(f"{name:<24}{s['calls']:9d}   {ms(s['acquire_mean'])} {ms(s['acquire_p99'])} "
+              f"{ms(s['acquire_max'])}   {ms(s['hold_mean'])} {ms(s['hold_p99'])} "
+              f"{ms(s['hold_max'])}")
+    for name, s in r['classes'].items():
+        evals = '-' if s['evals_per_admission'] is None else f"{s['evals_per_admission']:.2f}"
+        print(f"{name:<6} {s['admissions']:6d} entradas, {evals} evaluaciones del "
+              f"predicado por entrada, {s['waits']} esperas, "
+              f"como mucho {s['max_blocked']} dormidos a la vez")
+
+
+def main():
+    import puente_trazas
+    from puente_log import NullLog
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    path = sys.argv[2] if len(sys.argv) > 2 else 'timeline.csv'
+    monitor = Monitor()
+    profiler = profile(monitor)
+    profiler.start_timeline(path)
+    puente_trazas.replay(puente_trazas.generate(seed=0), monitor, NullLog(), scale)
+    profiler.stop()
+    show(profiler.report())
+    print(f"evolución en {path}")
+
+
+if __name__ == '__main__':
+    main()
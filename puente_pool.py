@@ -0,0 +1,111 @@
+"""
+Solution to the one-way tunnel: ejecución con un grupo fijo de trabajadores
+"""
+
+import os
+import time
+import random
+import threading
+from multiprocessing import Process, Queue
+
+from puente_03 import Monitor, car, pedestrian
+from puente_03 import NORTH, SOUTH, NCARS, NPED
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED
+
+
+NWORKERS = os.cpu_count() or 1
+
+
+def worker(jobs: Queue, monitor: Monitor) -> None:
+    '''
+    Un trabajador es un proceso de larga duración que va sacando trabajos de
+    la cola hasta recibir None.
+
+    Cada trabajo es un par (función, argumentos), por ejemplo
+    (car, (cid, direction)). Se ejecuta en un hilo propio dentro del proceso
+    porque un coche o un peatón pasa casi todo el tiempo bloqueado en el
+    monitor o cruzando el puente; así un mismo trabajador puede tener muchos
+    vehículos a la vez sin crear un proceso por cada uno.
+    '''
+    threads = []
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        target, args = job
+        t = threading.Thread(target=target, args=args + (monitor,))
+        t.start()
+        threads.append(t)
+        if len(threads) > 64:
+            threads = [t for t in threads if t.is_alive()]
+
+    for t in threads:
+        t.join()
+
+
+def start_workers(jobs: Queue, monitor: Monitor, nworkers: int = NWORKERS) -> list:
+    '''
+    Arranca el grupo de trabajadores. Por defecto hay uno por núcleo.
+    '''
+    wlst = []
+    for _ in range(nworkers):
+        w = Process(target=worker, args=(jobs, monitor))
+        w.start()
+        wlst.append(w)
+    return wlst
+
+
+def stop_workers(jobs: Queue, wlst: list) -> None:
+    '''
+    Envía un None a cada trabajador y espera a que terminen los vehículos
+    que todavía tengan en marcha.
+    '''
+    for _ in wlst:
+        jobs.put(None)
+    for w in wlst:
+        w.join()
+
+
+def gen_pedestrian(jobs: Queue) -> None:
+    '''
+    Con esta función se generan los peatones, que se encolan como trabajos
+    en lugar de lanzar un proceso por peatón
+    '''
+    pid = 0
+    for _ in range(NPED):
+        pid += 1
+        jobs.put((pedestrian, (pid,)))
+        time.sleep(random.expovariate(1/TIME_PED))
+
+
+def gen_cars(direction: int, time_cars, jobs: Queue) -> None:
+    '''
+    Con esta función se generan los coches, que se encolan como trabajos
+    en lugar de lanzar un proceso por coche
+    '''
+    cid = 0
+    for _ in range(NCARS):
+        cid += 1
+        jobs.put((car, (cid, direction)))
+        time.sleep(random.expovariate(1/time_cars))
+
+
+def main(nworkers: int = NWORKERS):
+
+    monitor = Monitor()
+    jobs = Queue()
+    wlst = start_workers(jobs, monitor, nworkers)
+    gcars_north = Process(target=gen_cars, args=(NORTH, TIME_CARS_NORTH, jobs))
+    gcars_south = Process(target=gen_cars, args=(SOUTH, TIME_CARS_SOUTH, jobs))
+    gped = Process(target=gen_pedestrian, args=(jobs,))
+    gcars_north.start()
+    gcars_south.start()
+    gped.start()
+    gcars_north.join()
+    gcars_south.join()
+    gped.join()
+    stop_workers(jobs, wlst)
+
+
+if __name__ == '__main__':
+    main()
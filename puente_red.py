@@ -0,0 +1,220 @@
+"""
+Red de varios puentes, cada uno con su propio Monitor
+
+Uso:
+    python puente_red.py [puentes] [periodo]
+
+Cada puente tiene su Monitor (con su mutex y sus métricas) y su propio grupo
+de trabajadores de puente_pool, así que los vehículos de puentes distintos
+nunca compiten por el mismo cerrojo ni por el mismo proceso. Un enrutador
+asigna cada vehículo que llega al puente en el que menos va a esperar según
+las colas del momento y los vehículos ya enviados a cada puente que aún no
+han entrado, e imprime cada `periodo` segundos las métricas de
+cada puente y de la red completa.
+"""
+
+import sys
+import time
+import random
+from multiprocessing import Process, Queue, Array
+
+from puente_03 import Monitor, car, pedestrian
+from puente_03 import NORTH, SOUTH, PED, NCARS, NPED, ON, ADMITTED
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED
+from puente_pool import NWORKERS, start_workers, stop_workers
+from puente_metricas import Metrics, CLASSES, NAMES, WAIT, BRIDGE, show
+from puente_log import NullLog
+
+
+NBRIDGES = 2
+
+
+def silent_car(cid: int, direction: int, monitor: Monitor) -> None:
+    car(cid, direction, monitor, NullLog())
+
+
+def silent_pedestrian(pid: int, monitor: Monitor) -> None:
+    pedestrian(pid, monitor, NullLog())
+
+
+class Network():
+    '''
+    Los puentes de la red: un Monitor con sus Metrics y una cola de trabajos
+    por puente. Los trabajadores de un puente sólo conocen su monitor.
+
+    routed cuenta, por puente y clase, los vehículos que el enrutador ha
+    enviado a ese puente desde el principio; restándole las entradas del
+    monitor quedan los que están en camino (en la cola de trabajos o
+    esperando en el monitor).
+
+    policy, si se da, es una función que crea la política de cada puente
+    (por ejemplo lambda: MaxBatch(5)): las políticas con cupo guardan estado
+    propio y no se pueden compartir entre monitores.
+    '''
+
+    def __init__(self, nbridges: int = NBRIDGES, policy=None):
+        self.metrics = [Metrics() for _ in range(nbridges)]
+        self.monitors = [Monitor(m, policy() if policy else None)
+                         for m in self.metrics]
+        self.jobs = [Queue() for _ in range(nbridges)]
+        self.routed = Array('q', nbridges * len(CLASSES))
+        self.total = Metrics()
+        self.workers = []
+
+    def __len__(self) -> int:
+        return len(self.monitors)
+
+    def start(self, nworkers: int = NWORKERS) -> None:
+        '''
+        Reparte los trabajadores entre los puentes, al menos uno por puente
+        '''
+        per_bridge = max(1, nworkers // len(self))
+        self.workers = [start_workers(jobs, monitor, per_bridge)
+                        for jobs, monitor in zip(self.jobs, self.monitors)]
+
+    def stop(self) -> None:
+        for jobs, wlst in zip(self.jobs, self.workers):
+            stop_workers(jobs, wlst)
+
+    def snapshot(self) -> dict:
+        '''
+        Métricas de la red: los contadores y rendimientos se suman, los
+        percentiles salen de sumar los histogramas de todos los puentes y la
+        fracción de tiempo vacío es la media de los puentes
+        '''
+        snaps = [m.snapshot() for m in self.metrics]
+        total = self.total
+        total.hist[:] = [sum(ns) for ns in zip(*(m.hist for m in self.metrics))]
+        snap = {
+            'elapsed': max(s['elapsed'] for s in snaps),
+            'switches': sum(s['switches'] for s in snaps),
+            'idle_fraction': sum(s['idle_fraction'] for s in snaps) / len(snaps),
+            'throughput': sum(s['throughput'] for s in snaps),
+        }
+        for k, name in zip(CLASSES, NAMES):
+            admitted = sum(s[name]['admitted'] for s in snaps)
+            waited = sum(s[name]['wait_mean'] * s[name]['admitted']
+                         for s in snaps if s[name]['admitted'])
+            snap[name] = {
+                'admitted': admitted,
+                'finished': sum(s[name]['finished'] for s in snaps),
+                'throughput': sum(s[name]['throughput'] for s in snaps),
+                'wait_mean': waited / admitted if admitted else None,
+                'wait_p50_p95_p99': total.percentiles(k, WAIT),
+                'bridge_p50_p95_p99': total.percentiles(k, BRIDGE),
+            }
+        snap['bridges'] = snaps
+        return snap
+
+
+class Router():
+    '''
+    Elige puente para cada vehículo mirando sin cerrojo el estado de los
+    monitores (lo mismo que enseña su __repr__) y los vehículos en camino
+    de cada puente. Un vehículo de la clase cls espera a los de su clase
+    enviados antes que él y, si el puente está ocupado o reclamado por otra
+    clase, a que se vacíe: el coste de un puente es la suma de ambas cosas.
+    Contar los enviados que aún no han entrado, y no sólo los que esperan
+    en el monitor, evita que una ráfaga vaya entera al mismo puente antes
+    de que sus trabajadores lleguen a cogerla. Los empates se rompen por
+    turnos para no cargar siempre el primer puente.
+
+    Se copia en cada proceso generador; el contador de turnos es local a
+    cada copia y los enviados se cuentan en memoria compartida.
+    '''
+
+    def __init__(self, network: Network):
+        self.states = [m.state for m in network.monitors]
+        self.jobs = network.jobs
+        self.routed = network.routed
+        self.next = 0
+
+    def pending(self, bridge: int, cls: int) -> int:
+        '''
+        Vehículos de la clase cls enviados al puente que aún no han entrado
+        '''
+        return self.routed[bridge * len(CLASSES) + cls] - self.states[bridge][ADMITTED + cls]
+
+    def cost(self, bridge: int, cls: int) -> int:
+        state = self.states[bridge]
+        cost = self.pending(bridge, cls)
+        for other in CLASSES:
+            if other != cls:
+                cost += state[ON + other] + self.pending(bridge, other)
+        return cost
+
+    def route(self, cls: int) -> int:
+        n = len(self.states)
+        order = [(self.next + i) % n for i in range(n)]
+        self.next = (self.next + 1) % n
+        return min(order, key=lambda b: self.cost(b, cls))
+
+    def send(self, cls: int, target, args: tuple) -> int:
+        with self.routed.get_lock():
+            bridge = self.route(cls)
+            self.routed[bridge * len(CLASSES) + cls] += 1
+        self.jobs[bridge].put((target, args))
+        return bridge
+
+
+def gen_pedestrian(router: Router, time_ped: float = TIME_PED,
+                   npeds: int = NPED, verbose: bool = False) -> None:
+    '''
+    Con esta función se generan los peatones, que el enrutador encola en el
+    puente que elige para cada uno
+    '''
+    target = pedestrian if verbose else silent_pedestrian
+    for pid in range(1, npeds + 1):
+        router.send(PED, target, (pid,))
+        time.sleep(random.expovariate(1/time_ped))
+
+
+def gen_cars(direction: int, time_cars, router: Router,
+             ncars: int = NCARS, verbose: bool = False) -> None:
+    '''
+    Con esta función se generan los coches, que el enrutador encola en el
+    puente que elige para cada uno
+    '''
+    target = car if verbose else silent_car
+    for cid in range(1, ncars + 1):
+        router.send(direction, target, (cid, direction))
+        time.sleep(random.expovariate(1/time_cars))
+
+
+def report(snap: dict) -> None:
+    for b, s in enumerate(snap['bridges']):
+        print(f"puente {b}:", end=' ')
+        show(s)
+    print("red:", end=' ')
+    show(snap)
+    print()
+
+
+def main(nbridges: int = NBRIDGES, period: float = 2.0):
+    '''
+    main() de puente_03 con nbridges puentes y nbridges veces más tráfico,
+    de modo que cada puente recibe de media la carga del puente original
+    '''
+    network = Network(nbridges)
+    network.start(max(NWORKERS, nbridges))
+    router = Router(network)
+    plst = [Process(target=gen_cars, args=(NORTH, TIME_CARS_NORTH / nbridges,
+                                           router, NCARS * nbridges)),
+            Process(target=gen_cars, args=(SOUTH, TIME_CARS_SOUTH / nbridges,
+                                           router, NCARS * nbridges)),
+            Process(target=gen_pedestrian, args=(router, TIME_PED / nbridges,
+                                                 NPED * nbridges))]
+    for p in plst:
+        p.start()
+    while any(p.is_alive() for p in plst):
+        time.sleep(period)
+        report(network.snapshot())
+    for p in plst:
+        p.join()
+    network.stop()
+    report(network.snapshot())
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else NBRIDGES,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 2.0)
@@ -0,0 +1,169 @@
+"""
+Registro por columnas de los vehículos de una ejecución
+
+Uso:
+    python puente_registros.py [vehículos] [fichero.npz|fichero.parquet]
+
+simula ese número de vehículos (200000 por defecto) guardándolos en una
+lista de listas, como devuelve puente_sim.simulate, y en un RecordStore, y
+compara la memoria y el tiempo. Después exporta el RecordStore al fichero
+(registros.npz por defecto).
+
+Un RecordStore tiene una fila por vehículo, reservada de antemano, y una
+columna por dato: instante de llegada (WANTS), de entrada (ENTERS) y de
+salida (OUT), clase (NORTH, SOUTH o PED, que da también la dirección) e id.
+Los vehículos de cada clase van en un tramo propio de filas, en el orden de
+sus ids, así que escribir un dato es asignar un número en un array: no se
+crea ningún objeto por vehículo. Los datos que no han llegado a pasar (un
+vehículo bloqueado) quedan en NaN.
+
+Con shared=True las columnas están en memoria compartida (RawArray) y los
+procesos de los vehículos escriben directamente en ellas: se pasa como log a
+car, pedestrian, los generadores o puente_trazas.replay. El simulador
+escribe en él con simulate(store=...) cada instante según pasa, así que un
+vehículo que se queda bloqueado tiene la llegada, pero la entrada y la
+salida en NaN. columns() devuelve las columnas como arrays de NumPy sin
+copiarlas. Este módulo necesita numpy, y pyarrow para
+exportar a Parquet.
+"""
+
+import sys
+import time
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+from puente_03 import Monitor, NORTH, SOUTH, PED, NCARS, NPED
+from puente_03 import WANTS, ENTERS, OUT
+
+
+TIMES = {WANTS: 'arrival', ENTERS: 'enter', OUT: 'exit'}
+COLUMNS = ('cls', 'vid') + tuple(TIMES.values())
+
+
+class RecordStore():
+    '''
+    Columnas de ncars coches en cada dirección y nped peatones (ver el
+    comentario del módulo). Los instantes de record() se miden en segundos
+    desde que se crea el registro.
+    '''
+
+    def __init__(self, ncars: int = NCARS, nped: int = NPED, shared: bool = True):
+        self.offsets = (0, ncars, 2 * ncars)
+        self.sizes = (ncars, ncars, nped)
+        n = 2 * ncars + nped
+        if shared:
+            self.buffers = [RawArray('b', n), RawArray('i', n)] + \
+                           [RawArray('d', n) for _ in TIMES]
+            arrays = [np.frombuffer(b, dtype=d) for b, d in
+                      zip(self.buffers, ('i1', 'i4') + ('f8',) * len(TIMES))]
+        else:
+            arrays = [np.empty(n, dtype='i1'), np.empty(n, dtype='i4')] + \
+                     [np.empty(n) for _ in TIMES]
+        self.cls, self.vid, *times = arrays
+        self.times = dict(zip(TIMES, times))
+        for cls, (offset, size) in enumerate(zip(self.offsets, self.sizes)):
+            self.cls[offset:offset + size] = cls
+            self.vid[offset:offset + size] = np.arange(1, size + 1)
+        for column in times:
+            column.fill(np.nan)
+        self.start = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.cls)
+
+    def row(self, cls: int, vid: int) -> int:
+        if not 1 <= vid <= self.sizes[cls]:
+            raise IndexError(f"el vehículo {vid} de la clase {cls} no cabe en el registro")
+        return self.offsets[cls] + vid - 1
+
+    def record(self, vid: int, cls: int, event: int, monitor: Monitor) -> None:
+        '''
+        Interfaz de registro de puente_03.report: guarda el instante de los
+        eventos de TIMES y descarta LEAVING
+        '''
+        column = self.times.get(event)
+        if column is not None:
+            column[self.row(cls, vid)] = time.monotonic() - self.start
+
+    def mark(self, cls: int, vid: int, event: int, t: float) -> None:
+        '''
+        Un instante ya medido (simulador) de un evento de TIMES
+        '''
+        self.times[event][self.row(cls, vid)] = t
+
+    def columns(self) -> dict:
+        '''
+        Las columnas como arrays de NumPy, sin copiar
+        '''
+        result = {'cls': self.cls, 'vid': self.vid}
+        for event, name in TIMES.items():
+            result[name] = self.times[event]
+        return result
+
+    def save_npz(self, path: str) -> None:
+        np.savez(path, **self.columns())
+
+    def save_parquet(self, path: str) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("para exportar a Parquet hace falta pyarrow") from None
+        table = pyarrow.table(self.columns())
+        pyarrow.parquet.write_table(table, path)
+
+    def save(self, path: str) -> None:
+        if path.endswith('.parquet'):
+            self.save_parquet(path)
+        else:
+            self.save_npz(path)
+
+
+def load(path: str) -> dict:
+    '''
+    Columnas de un fichero de save_npz (o de save_parquet, con pyarrow)
+    '''
+    if path.endswith('.parquet'):
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(path)
+        return {name: table[name].to_numpy() for name in COLUMNS}
+    with np.load(path) as data:
+        return {name: data[name] for name in COLUMNS}
+
+
+def main():
+    import tracemalloc
+    import puente_trazas
+    from puente_sim import simulate
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    path = sys.argv[2] if len(sys.argv) > 2 else 'registros.npz'
+    ncars, nped = n * 10 // 21, n // 21
+
+    for title in ('lista', 'RecordStore'):
+        tracemalloc.start()
+        start = time.perf_counter()
+        store = RecordStore(ncars, nped, shared=False) if title == 'RecordStore' else None
+        records = simulate(arrivals=puente_trazas.generate(ncars, nped, seed=0),
+                           store=store)
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{title:<12} {elapsed:6.1f} s  memoria al acabar {current/2**20:7.1f} MiB, "
+              f"pico {peak/2**20:7.1f} MiB")
+        del records
+
+    columns = store.columns()
+    waits = columns['enter'] - columns['arrival']
+    for cls, name in ((NORTH, 'north'), (SOUTH, 'south'), (PED, 'ped')):
+        w = waits[columns['cls'] == cls]
+        print(f"    {name:<6} espera media {np.nanmean(w):7.2f}s  "
+              f"p99 {np.nanpercentile(w, 99):7.2f}s")
+    store.save(path)
+    check = load(path)
+    same = all(np.array_equal(check[c], columns[c], equal_nan=True) for c in COLUMNS)
+    print(f"exportado a {path}{'' if same else ' (NO coincide al leerlo)'}")
+
+
+if __name__ == '__main__':
+    main()
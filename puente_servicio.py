@@ -0,0 +1,338 @@
+"""
+El Monitor del puente como servicio de red
+
+Uso:
+    python puente_servicio.py serve <dirección>
+    python puente_servicio.py bench [pares] [procesos] [hilos]
+
+La dirección es tcp:host:puerto o unix:/ruta/al/socket. El servidor guarda
+un único AsyncMonitor (puente_async) con la política por defecto y atiende
+a todos los clientes en un bucle de eventos; RemoteMonitor es el cliente,
+con los mismos cuatro métodos que el Monitor de puente_03, así que se le
+puede pasar a car, pedestrian o los generadores en lugar de un Monitor.
+Cada respuesta espera a que el socket la acepte (drain): un cliente que no
+lee sus respuestas no hace crecer sin límite el búfer del servidor.
+
+Protocolo: cada petición es un registro fijo (id, operación, clase) y cada
+respuesta (id, estado). Un cliente puede tener muchas peticiones en vuelo
+por la misma conexión (por ejemplo una por hilo) y las respuestas llegan
+según se resuelven, no en orden: un coche que espera su turno no retrasa la
+salida de otro. Una entrada o una salida cuesta un viaje de ida y vuelta.
+
+Si un cliente se desconecta, el servidor saca del puente a los vehículos
+que ese cliente tenía dentro, incluidos los que entren después porque ya
+estaban esperando.
+
+El banco compara latencia (pares entrada/salida seguidos desde un hilo) y
+rendimiento (procesos x hilos cruzando a la vez en la misma dirección) del
+Monitor en el propio proceso frente al servicio por socket Unix y por TCP.
+"""
+
+import os
+import sys
+import time
+import socket
+import struct
+import asyncio
+import threading
+from multiprocessing import Process
+
+from puente_03 import Monitor, NORTH, SOUTH, PED
+from puente_async import AsyncMonitor
+
+
+REQUEST = struct.Struct('<IBb') # id, operación, clase
+RESPONSE = struct.Struct('<IB') # id, estado
+
+# operaciones
+WANTS_CAR = 0
+LEAVES_CAR = 1
+WANTS_PED = 2
+LEAVES_PED = 3
+
+# estados
+OK = 0
+ERROR = 1
+
+
+def parse_address(address: str) -> tuple:
+    '''
+    ('unix', ruta) o ('tcp', (host, puerto))
+    '''
+    kind, _, rest = address.partition(':')
+    if kind == 'unix' and rest:
+        return kind, rest
+    elif kind == 'tcp':
+        host, _, port = rest.rpartition(':')
+        if host and port.isdigit():
+            return kind, (host, int(port))
+    raise ValueError(f"dirección no válida: {address}")
+
+
+async def handle(reader, writer, monitor: AsyncMonitor) -> None:
+    '''
+    Una conexión: cada petición se atiende en su propia tarea para que una
+    entrada bloqueada no frene a las demás. on cuenta los vehículos de esta
+    conexión que están en el puente.
+    '''
+    on = [0, 0, 0]
+    tasks = set()
+    closed = False
+
+    async def serve_one(rid: int, op: int, cls: int) -> None:
+        status = OK
+        try:
+            if op == WANTS_CAR and cls in (NORTH, SOUTH):
+                await monitor.wants_enter_car(cls)
+                on[cls] += 1
+            elif op == LEAVES_CAR and cls in (NORTH, SOUTH) and on[cls] > 0:
+                on[cls] -= 1
+                await monitor.leaves_car(cls)
+            elif op == WANTS_PED:
+                await monitor.wants_enter_pedestrian()
+                on[PED] += 1
+            elif op == LEAVES_PED and on[PED] > 0:
+                on[PED] -= 1
+                await monitor.leaves_pedestrian()
+            else:
+                status = ERROR
+        except Exception:
+            status = ERROR
+        if not closed:
+            writer.write(RESPONSE.pack(rid, status))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    try:
+        while True:
+            rid, op, cls = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+            task = asyncio.create_task(serve_one(rid, op, cls))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    closed = True
+    writer.close()
+    #primero salen los que están en el puente: los que aún esperan pueden
+    #estar esperando precisamente a que salgan
+    await leave_all(monitor, on)
+    if tasks:
+        await asyncio.gather(*tasks)
+    await leave_all(monitor, on)
+
+
+async def leave_all(monitor: AsyncMonitor, on: list) -> None:
+    '''
+    Saca del puente a los vehículos de una conexión cerrada
+    '''
+    for cls in (NORTH, SOUTH):
+        while on[cls] > 0:
+            on[cls] -= 1
+            await monitor.leaves_car(cls)
+    while on[PED] > 0:
+        on[PED] -= 1
+        await monitor.leaves_pedestrian()
+
+
+async def aserve(address: str, ready=None) -> None:
+    monitor = AsyncMonitor()
+    kind, where = parse_address(address)
+    client = lambda r, w: handle(r, w, monitor)
+    if kind == 'unix':
+        if os.path.exists(where):
+            os.unlink(where)
+        server = await asyncio.start_unix_server(client, path=where)
+    else:
+        server = await asyncio.start_server(client, *where)
+        for s in server.sockets:
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def serve(address: str, ready=None) -> None:
+    asyncio.run(aserve(address, ready))
+
+
+def start_server(address: str) -> Process:
+    '''
+    Arranca el servidor en otro proceso y espera a que acepte conexiones
+    '''
+    from multiprocessing import Event
+    ready = Event()
+    p = Process(target=serve, args=(address, ready), daemon=True)
+    p.start()
+    if not ready.wait(10):
+        p.terminate()
+        raise ConnectionError(f"el servidor no arranca en {address}")
+    return p
+
+
+class RemoteMonitor():
+    '''
+    Cliente del servicio con la interfaz del Monitor de puente_03.
+
+    Cada proceso abre una sola conexión, la primera vez que la necesita, y la
+    reutiliza para todas sus peticiones; si se copia a un proceso hijo, el
+    hijo abre la suya. Los hilos de un mismo proceso comparten la conexión:
+    envían sus peticiones sin esperar a las de los demás y un hilo lector
+    entrega cada respuesta a quien la espera.
+    '''
+
+    def __init__(self, address: str):
+        self.address = address
+        self.pid = None
+
+    def __getstate__(self) -> dict:
+        return {'address': self.address, 'pid': None}
+
+    def _connect(self) -> None:
+        kind, where = parse_address(self.address)
+        if kind == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect(where)
+        self.sock = sock
+        self.send_lock = threading.Lock()
+        self.pending = {}
+        self.next_id = 0
+        self.pid = os.getpid()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self) -> None:
+        '''
+        Hilo lector: entrega cada respuesta al hilo que espera ese id. Una
+        respuesta con un id que nadie espera se descarta; cuando se cierra
+        la conexión se despierta a todos los que esperan.
+        '''
+        f = self.sock.makefile('rb')
+        while True:
+            data = f.read(RESPONSE.size)
+            if len(data) < RESPONSE.size:
+                break
+            rid, status = RESPONSE.unpack(data)
+            with self.send_lock:
+                slot = self.pending.pop(rid, None)
+            if slot is None:
+                continue
+            slot[1] = status
+            slot[0].set()
+        with self.send_lock:
+            for slot in self.pending.values():
+                slot[0].set()
+            self.pending.clear()
+
+    def _call(self, op: int, cls: int) -> None:
+        if self.pid != os.getpid():
+            self._connect()
+        slot = [threading.Event(), None]
+        with self.send_lock:
+            rid = self.next_id
+            self.next_id = (rid + 1) % 2**32
+            self.pending[rid] = slot
+            self.sock.sendall(REQUEST.pack(rid, op, cls))
+        slot[0].wait()
+        if slot[1] is None:
+            raise ConnectionError(f"conexión cerrada con {self.address}")
+        elif slot[1] != OK:
+            raise ValueError(f"petición rechazada por {self.address}")
+
+    def close(self) -> None:
+        '''
+        Cierra la conexión; shutdown despierta al hilo lector, que tiene el
+        socket abierto en su makefile, y con él a los hilos que esperan
+        '''
+        if self.pid == os.getpid():
+            self.sock.shutdown(socket.SHUT_RDWR)
+            self.sock.close()
+            self.pid = None
+
+    def wants_enter_car(self, direction: int) -> None:
+        self._call(WANTS_CAR, direction)
+
+    def leaves_car(self, direction: int, entered: float = None) -> None:
+        self._call(LEAVES_CAR, direction)
+
+    def wants_enter_pedestrian(self) -> None:
+        self._call(WANTS_PED, PED)
+
+    def leaves_pedestrian(self, entered: float = None) -> None:
+        self._call(LEAVES_PED, PED)
+
+    def __repr__(self) -> str:
+        return f"RemoteMonitor<{self.address}>"
+
+
+def pairs(monitor, n: int) -> None:
+    for _ in range(n):
+        monitor.wants_enter_car(NORTH)
+        monitor.leaves_car(NORTH)
+
+
+def threaded_pairs(monitor, n: int, nthreads: int) -> None:
+    threads = [threading.Thread(target=pairs, args=(monitor, n // nthreads))
+               for _ in range(nthreads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def bench(n: int = 5000, nprocs: int = 4, nthreads: int = 8) -> None:
+    path = f"/tmp/puente_servicio_{os.getpid()}.sock"
+    servers = []
+    try:
+        for title, address in (("proceso", None), ("unix", f"unix:{path}"),
+                               ("tcp", "tcp:127.0.0.1:0")):
+            if address is None:
+                monitor = Monitor()
+            else:
+                if address.startswith('tcp'):
+                    address = f"tcp:127.0.0.1:{free_port()}"
+                servers.append(start_server(address))
+                monitor = RemoteMonitor(address)
+            t0 = time.perf_counter()
+            pairs(monitor, n)
+            latency = (time.perf_counter() - t0) / n
+            plst = [Process(target=threaded_pairs, args=(monitor, n // nprocs, nthreads))
+                    for _ in range(nprocs)]
+            t0 = time.perf_counter()
+            for p in plst:
+                p.start()
+            for p in plst:
+                p.join()
+            total = time.perf_counter() - t0
+            print(f"{title:<8} latencia {latency*1e6:8.1f} µs por par   "
+                  f"{nprocs}x{nthreads} clientes {n/total:9.0f} pares/s")
+    finally:
+        for p in servers:
+            p.terminate()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('serve', 'bench') or \
+            (sys.argv[1] == 'serve' and len(sys.argv) != 3):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'serve':
+        serve(sys.argv[2])
+    else:
+        bench(*(int(a) for a in sys.argv[2:]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Solution to the one-way tunnel: simulación de eventos discretos con reloj virtual
+"""
+
+import sys
+import heapq
+import random
+from collections import deque
+
+from puente_03 import Monitor, StrictRotation, crossing_time
+from puente_03 import NORTH, SOUTH, PED, NCARS, NPED
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED
+from puente_03 import GRANTED, WAKEUPS, FAILED_WAKEUPS, STATE_SIZE
+from puente_03 import WANTS, ENTERS, OUT
+
+# tipos de evento del calendario
+ARRIVAL = 0
+LEAVE = 1
+TRACE = 2 #llegada leída de una traza
+
+
+class _NullLock():
+    def acquire(self):
+        pass
+
+    def release(self):
+        pass
+
+
+class _SimCondition():
+    '''
+    Sustituto de Condition. Los vehículos bloqueados se guardan en orden de
+    llegada; notify y notify_all no los despiertan directamente sino que los
+    pasan a la lista de despertados del simulador, que vuelve a evaluar su
+    predicado cuando el monitor "suelta" el mutex, igual que haría wait_for.
+    '''
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.waiters = deque()
+
+    def notify(self, n=1):
+        while n > 0 and self.waiters:
+            self.sim.woken.append(self.waiters.popleft())
+            n -= 1
+
+    def notify_all(self):
+        self.sim.woken.extend(self.waiters)
+        self.waiters.clear()
+
+
+class SimMonitor(Monitor):
+    '''
+    El mismo Monitor de puente_03 con las primitivas de multiprocessing
+    cambiadas por sustitutos de un solo proceso. Los predicados (north_cars,
+    south_cars, ped) y la lógica de turnos de leaves_car y leaves_pedestrian
+    son los originales, igual que el relevo contado de _admit_waiting; sólo
+    la espera de wants_enter_* la hace el simulador.
+    '''
+
+    def __init__(self, sim, policy=None):
+        self.sim = sim
+        self.mutex = _NullLock()
+        #el simulador es un único proceso: basta una lista normal
+        self.state = [0] * STATE_SIZE
+        self.can_north_cars = _SimCondition(sim)
+        self.can_south_cars = _SimCondition(sim)
+        self.can_ped = _SimCondition(sim)
+        self.metrics = None
+        self.policy = policy if policy is not None else StrictRotation()
+
+    def clock(self) -> float:
+        return self.sim.now
+
+
+class Simulation():
+    '''
+    Calendario de eventos (un montículo ordenado por tiempo virtual) y el
+    monitor simulado.
+
+    Cada vehículo es una lista [clase, id, llegada, entrada, salida, cruce],
+    donde la clase es NORTH, SOUTH o PED y cruce es el tiempo que pasa en el
+    puente. Las llegadas se generan o se leen de forma perezosa: en el
+    calendario sólo está la siguiente llegada de cada generador o traza, así
+    que la memoria no crece con el número de vehículos pendientes de llegar.
+    Con store (un puente_registros.RecordStore) los instantes de cada
+    vehículo se escriben en él según pasan (llegada, entrada y salida) y no
+    se guarda en records, así que tampoco crece con los que ya han cruzado;
+    uno que no llega a entrar se queda en el registro con la entrada y la
+    salida sin escribir (NaN).
+    '''
+
+    def __init__(self, seed=None, verbose: bool = False, policy=None,
+                 crossing: dict = None, store=None):
+        self.now = 0.0
+        self.calendar = []
+        self.seq = 0
+        self.woken = []
+        self.records = []
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        self.monitor = SimMonitor(self, policy)
+        m = self.monitor
+        self.conditions = {NORTH: m.can_north_cars, SOUTH: m.can_south_cars,
+                           PED: m.can_ped}
+        #normales (media, desviación) del cruce por clase; None: las de puente_03
+        self.crossing = crossing or {}
+        self.store = store
+
+    def schedule(self, t: float, event: int, data) -> None:
+        self.seq += 1
+        heapq.heappush(self.calendar, (t, self.seq, event, data))
+
+    def add_generator(self, cls: int, n: int, mean_time: float) -> None:
+        '''
+        Equivalente a gen_cars/gen_pedestrian: el primer vehículo llega en el
+        instante 0 y los siguientes tras un tiempo exponencial de media
+        mean_time. El tiempo en el puente de cada uno sale de las mismas
+        normales que usan delay_car_north, delay_car_south y delay_pedestrian
+        '''
+        if n > 0:
+            self.schedule(0.0, ARRIVAL, (cls, 1, n, mean_time))
+
+    def add_trace(self, arrivals) -> None:
+        '''
+        Llegadas tomadas de un iterable de tuplas (instante, clase, cruce) en
+        orden de tiempo, por ejemplo puente_trazas.read(fichero). Se van
+        sacando de una en una según avanza la simulación y los vehículos se
+        numeran por clase en orden de llegada
+        '''
+        self._next_trace(iter(arrivals), [0, 0, 0])
+
+    def _next_trace(self, arrivals, ids: list) -> None:
+        item = next(arrivals, None)
+        if item is not None:
+            t, cls, duration = item
+            ids[cls] += 1
+            self.schedule(max(t, self.now), TRACE,
+                          (cls, ids[cls], duration, arrivals, ids))
+
+    def say(self, v: list, what: str) -> None:
+        if v[0] == PED:
+            who = f"pedestrian {v[1]}"
+        else:
+            who = f"car {v[1]} heading {v[0]}"
+        print(f"{self.now:10.3f} {who} {what}. {self.monitor}")
+
+    def arrival(self, data) -> None:
+        cls, vid, n, mean_time = data
+        if vid < n:
+            self.schedule(self.now + self.rng.expovariate(1/mean_time),
+                          ARRIVAL, (cls, vid + 1, n, mean_time))
+        self.arrive(cls, vid, crossing_time(cls, self.rng, self.crossing.get(cls)))
+
+    def trace_arrival(self, data) -> None:
+        cls, vid, duration, arrivals, ids = data
+        self._next_trace(arrivals, ids)
+        self.arrive(cls, vid, duration)
+
+    def arrive(self, cls: int, vid: int, duration: float) -> None:
+        v = [cls, vid, self.now, None, None, duration]
+        if self.store is None:
+            self.records.append(v)
+        else:
+            self.store.mark(cls, vid, WANTS, self.now)
+        if self.verbose:
+            self.say(v, "wants to enter")
+        if self.monitor._try_enter(cls):
+            self.admit(v)
+        else:
+            self.conditions[cls].waiters.append(v)
+
+    def admit(self, v: list) -> None:
+        v[3] = self.now
+        if self.store is not None:
+            self.store.mark(v[0], v[1], ENTERS, self.now)
+        if self.verbose:
+            self.say(v, "enters the bridge")
+        self.schedule(self.now + v[5], LEAVE, v)
+
+    def leave(self, v: list) -> None:
+        if self.verbose:
+            self.say(v, "leaving the bridge")
+        if v[0] == PED:
+            self.monitor.leaves_pedestrian()
+        else:
+            self.monitor.leaves_car(v[0])
+        v[4] = self.now
+        if self.verbose:
+            self.say(v, "out of the bridge")
+        if self.store is not None:
+            self.store.mark(v[0], v[1], OUT, self.now)
+        # los despertados recogen por orden la entrada que les ha concedido
+        # _admit_waiting, como harían al ir recuperando el mutex en _enter
+        state = self.monitor.state
+        woken, self.woken = self.woken, []
+        for w in woken:
+            state[WAKEUPS] += 1
+            if state[GRANTED + w[0]] > 0:
+                state[GRANTED + w[0]] -= 1
+                self.admit(w)
+            else:
+                state[FAILED_WAKEUPS] += 1
+                self.conditions[w[0]].waiters.append(w)
+
+    def run(self, until: float = None) -> list:
+        calendar = self.calendar
+        while calendar:
+            if until is not None and calendar[0][0] > until:
+                break
+            self.now, _, event, data = heapq.heappop(calendar)
+            if event == ARRIVAL:
+                self.arrival(data)
+            elif event == TRACE:
+                self.trace_arrival(data)
+            else:
+                self.leave(data)
+        return self.records
+
+
+def simulate(ncars: int = NCARS, nped: int = NPED,
+             time_cars_north: float = TIME_CARS_NORTH,
+             time_cars_south: float = TIME_CARS_SOUTH,
+             time_ped: float = TIME_PED,
+             seed=None, verbose: bool = False, policy=None,
+             arrivals=None, crossing: dict = None, store=None) -> list:
+    '''
+    Simula una ejecución completa de main() de puente_03 en tiempo virtual y
+    devuelve los vehículos como listas [clase, id, llegada, entrada, salida,
+    cruce]. policy es la política de admisión del monitor (por defecto la de
+    puente_03). Con arrivals (tuplas (instante, clase, cruce), ver add_trace)
+    las llegadas salen de ahí en lugar de los generadores aleatorios.
+    crossing cambia para las clases que aparezcan la normal (media,
+    desviación) del tiempo en el puente. Con store los vehículos se
+    escriben ahí en lugar de devolverse (la lista queda vacía).
+
+    Los vehículos que se queden bloqueados para siempre (por ejemplo por un
+    aviso perdido) quedan con la entrada y la salida a None, o a NaN en
+    store.
+    '''
+    sim = Simulation(seed, verbose, policy, crossing, store)
+    if arrivals is not None:
+        sim.add_trace(arrivals)
+    else:
+        sim.add_generator(NORTH, ncars, time_cars_north)
+        sim.add_generator(SOUTH, ncars, time_cars_south)
+        sim.add_generator(PED, nped, time_ped)
+    return sim.run()
+
+
+def main():
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    records = simulate(seed=seed, verbose=True)
+    stuck = sum(1 for v in records if v[4] is None)
+    end = max((v[4] for v in records if v[4] is not None), default=0.0)
+    print(f"{len(records)} vehículos, {stuck} bloqueados, fin en t={end:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+Trazas de llegadas al puente
+
+Uso:
+    python puente_trazas.py gen <fichero> [semilla]   traza aleatoria como la de main()
+    python puente_trazas.py sim <fichero>             la reproduce en puente_sim
+    python puente_trazas.py run <fichero> [escala]    la reproduce con procesos
+    python puente_trazas.py record <fichero>          graba las llegadas de main()
+
+Una traza es una secuencia de llegadas (instante, tipo, dirección, cruce) en
+orden de tiempo: instante en segundos desde el principio, tipo car o
+pedestrian, dirección 0 o 1 (vacía para los peatones) y segundos que pasa
+en el puente. Se guarda en CSV con esas columnas si el fichero acaba en
+.csv y si no en binario con registros de tamaño fijo. Las dos se leen de
+forma perezosa, así que el tamaño de la traza no influye en la memoria.
+"""
+
+import sys
+import csv
+import mmap
+import time
+import heapq
+import random
+import struct
+from collections import OrderedDict
+from multiprocessing import Process, Queue
+
+import puente_03
+from puente_03 import Monitor, NORTH, SOUTH, PED, NCARS, NPED
+from puente_03 import WANTS, ENTERS, LEAVING
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED
+from puente_03 import crossing_time
+
+
+COLUMNS = ('t', 'kind', 'direction', 'duration')
+RECORD = struct.Struct('<ddb') # instante, cruce, clase
+MAGIC = b'PUENTETR'
+CHUNK = 4096 # registros por lectura del fichero binario
+
+
+def to_columns(cls: int) -> tuple:
+    '''
+    Tipo y dirección de una clase (NORTH, SOUTH, PED) como en el CSV
+    '''
+    if cls == PED:
+        return 'pedestrian', ''
+    return 'car', cls
+
+
+def from_columns(kind: str, direction: str) -> int:
+    if kind == 'pedestrian':
+        return PED
+    elif kind == 'car' and direction in ('0', '1'):
+        return int(direction)
+    raise ValueError(f"llegada desconocida: {kind} {direction}")
+
+
+def read_csv(path: str):
+    '''
+    Recorre una traza CSV devolviendo tuplas (instante, clase, cruce)
+    '''
+    with open(path, newline='') as f:
+        rows = csv.reader(f)
+        if tuple(next(rows, ())) != COLUMNS:
+            raise ValueError(f"{path} no tiene las columnas {','.join(COLUMNS)}")
+        for t, kind, direction, duration in rows:
+            yield float(t), from_columns(kind, direction), float(duration)
+
+
+def read_binary(path: str):
+    '''
+    Recorre una traza binaria proyectada en memoria devolviendo tuplas
+    (instante, clase, cruce). Sólo se decodifican CHUNK registros a la vez y
+    el sistema operativo carga y descarta las páginas del fichero según hace
+    falta.
+    '''
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es una traza del puente")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            end = len(MAGIC) + (len(mm) - len(MAGIC)) // RECORD.size * RECORD.size
+            step = RECORD.size * CHUNK
+            try:
+                for start in range(len(MAGIC), end, step):
+                    for t, duration, cls in RECORD.iter_unpack(view[start:min(start + step, end)]):
+                        yield t, cls, duration
+            finally:
+                view.release()
+
+
+def read(path: str):
+    '''
+    Lee una traza en cualquiera de los dos formatos
+    '''
+    with open(path, 'rb') as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    return read_binary(path) if binary else read_csv(path)
+
+
+class TraceWriter():
+    '''
+    Escribe llegadas (instante, clase, cruce) en CSV o en binario según la
+    extensión del fichero
+    '''
+
+    def __init__(self, path: str):
+        self.binary = not path.endswith('.csv')
+        if self.binary:
+            self.f = open(path, 'wb')
+            self.f.write(MAGIC)
+        else:
+            self.f = open(path, 'w', newline='')
+            self.rows = csv.writer(self.f)
+            self.rows.writerow(COLUMNS)
+
+    def write(self, t: float, cls: int, duration: float) -> None:
+        if self.binary:
+            self.f.write(RECORD.pack(t, duration, cls))
+        else:
+            self.rows.writerow((f"{t:.6f}", *to_columns(cls), f"{duration:.6f}"))
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def write(path: str, arrivals) -> int:
+    '''
+    Guarda un iterable de llegadas en path y devuelve cuántas había
+    '''
+    writer = TraceWriter(path)
+    n = 0
+    for t, cls, duration in arrivals:
+        writer.write(t, cls, duration)
+        n += 1
+    writer.close()
+    return n
+
+
+def generate(ncars: int = NCARS, nped: int = NPED,
+             time_cars_north: float = TIME_CARS_NORTH,
+             time_cars_south: float = TIME_CARS_SOUTH,
+             time_ped: float = TIME_PED, seed=None):
+    '''
+    Las llegadas que harían gen_cars y gen_pedestrian en main(), con los
+    tiempos de cruce de puente_03.crossing_time, mezcladas en orden de
+    tiempo sin generarlas todas de antemano
+    '''
+    rng = random.Random(seed)
+
+    def stream(cls, n, mean):
+        t = 0.0
+        for _ in range(n):
+            yield t, cls, crossing_time(cls, rng)
+            t += rng.expovariate(1/mean)
+
+    return heapq.merge(stream(NORTH, ncars, time_cars_north),
+                       stream(SOUTH, ncars, time_cars_south),
+                       stream(PED, nped, time_ped))
+
+
+def replay(arrivals, monitor: Monitor, log=None, scale: float = 1.0) -> None:
+    '''
+    Reproduce las llegadas con un proceso por vehículo, como gen_cars y
+    gen_pedestrian, usando el cruce de cada llegada en lugar de sortearlo.
+    Con scale < 1 todo (llegadas y cruces) va más deprisa. Sólo se
+    guardan los procesos que siguen vivos.
+    '''
+    ids = [0, 0, 0]
+    plst = []
+    start = time.monotonic()
+    for t, cls, duration in arrivals:
+        delay = start + t * scale - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        ids[cls] += 1
+        if cls == PED:
+            p = Process(target=puente_03.pedestrian,
+                        args=(ids[cls], monitor, log, duration * scale))
+        else:
+            p = Process(target=puente_03.car,
+                        args=(ids[cls], cls, monitor, log, duration * scale))
+        p.start()
+        plst.append(p)
+        if len(plst) > 64:
+            plst = [p for p in plst if p.is_alive()]
+
+    for p in plst:
+        p.join()
+
+
+class TraceRecorder():
+    '''
+    Graba las llegadas de una ejecución real con la interfaz de registro de
+    puente_03.report (record), así que se pasa como log a car, pedestrian o
+    los generadores. Cada evento se reenvía a log (o se imprime si no hay).
+
+    Cada vehículo manda su llegada al apuntarse (WANTS) y su cruce al salir
+    (LEAVING), medido desde ENTERS en su propio proceso. Un proceso escritor
+    va guardando las llegadas en el orden en que se apuntan en cuanto se
+    conoce su cruce, de modo que sólo tiene en memoria los vehículos que
+    todavía no han salido. Los instantes nunca retroceden en la traza aunque
+    dos procesos se apunten casi a la vez.
+    '''
+
+    def __init__(self, path: str, log=None):
+        self.log = log
+        self.queue = Queue()
+        self.start = time.monotonic()
+        self.entered = {}
+        self.writer = Process(target=self._write, args=(path,))
+        self.writer.start()
+
+    def record(self, vid: int, cls: int, event: int, monitor: Monitor) -> None:
+        now = time.monotonic()
+        if event == WANTS:
+            self.queue.put((cls, vid, now - self.start, None))
+        elif event == ENTERS:
+            self.entered[cls, vid] = now
+        elif event == LEAVING:
+            self.queue.put((cls, vid, None, now - self.entered.pop((cls, vid))))
+        puente_03.report(vid, cls, event, monitor, self.log)
+
+    def _write(self, path: str) -> None:
+        writer = TraceWriter(path)
+        pending = OrderedDict()
+        last = 0.0
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            cls, vid, t, duration = item
+            if t is not None:
+                pending[cls, vid] = [t, None]
+            else:
+                pending[cls, vid][1] = duration
+            while pending:
+                (cls, _), (t, duration) = next(iter(pending.items()))
+                if duration is None:
+                    break
+                pending.popitem(last=False)
+                last = max(last, t)
+                writer.write(last, cls, duration)
+        writer.close()
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self.writer.join()
+
+
+def record(path: str) -> None:
+    '''
+    main() de puente_03 grabando la traza de llegadas en path
+    '''
+    monitor = Monitor()
+    recorder = TraceRecorder(path)
+    plst = [Process(target=puente_03.gen_cars, args=(NORTH, TIME_CARS_NORTH, monitor, recorder)),
+            Process(target=puente_03.gen_cars, args=(SOUTH, TIME_CARS_SOUTH, monitor, recorder)),
+            Process(target=puente_03.gen_pedestrian, args=(monitor, recorder))]
+    for p in plst:
+        p.start()
+    for p in plst:
+        p.join()
+    recorder.stop()
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('gen', 'sim', 'run', 'record'):
+        print(__doc__)
+        sys.exit(1)
+    command, path = sys.argv[1:3]
+    if command == 'gen':
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        print(f"{write(path, generate(seed=seed))} llegadas en {path}")
+    elif command == 'sim':
+        from puente_sim import simulate
+        records = simulate(arrivals=read(path))
+        stuck = sum(1 for v in records if v[4] is None)
+        end = max((v[4] for v in records if v[4] is not None), default=0.0)
+        print(f"{len(records)} vehículos, {stuck} bloqueados, fin en t={end:.3f}")
+    elif command == 'run':
+        scale = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        replay(read(path), Monitor(), scale=scale)
+    else:
+        record(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Vehículos de emergencia: prioridad y plazo de entrada
+
+Uso:
+    python puente_urgencias.py [escala] [plazo]
+
+llena el puente de tráfico (coches en las dos direcciones y peatones
+llegando más deprisa de lo que caben) y mete ambulancias cada cierto tiempo,
+primero sin prioridad y luego con priority=1. Imprime la espera de las
+ambulancias hasta entrar (p50, p99 y máximo, en segundos sin comprimir) y,
+si se da un plazo, cuántas se quedan sin entrar a tiempo. Los tiempos van
+comprimidos por escala (0.02 por defecto).
+
+Las ambulancias no adelantan a los que ya están en el puente: con prioridad
+dejan de entrar los vehículos de las otras clases y entran en cuanto el
+puente se vacía (ver Monitor._admits).
+"""
+
+import sys
+import time
+import random
+from multiprocessing import Process
+from multiprocessing.sharedctypes import RawArray
+
+from puente_03 import Monitor, NORTH, SOUTH, PED, TIMEOUT
+from puente_03 import TIME_CARS_NORTH, TIME_CARS_SOUTH, TIME_PED, crossing_time
+
+
+NURGENT = 40 # ambulancias por ejecución
+TIME_URGENT = 10 # una ambulancia cada 10s
+LOAD = 4 # el tráfico de fondo llega LOAD veces más deprisa que en puente_03
+
+
+def vehicle(cls: int, monitor: Monitor, scale: float, priority: int = 0,
+            timeout: float = None, waits=None, i: int = 0) -> None:
+    '''
+    Un vehículo cualquiera. Si se da waits, guarda en waits[i] su espera
+    hasta entrar (o -1 si se le acaba el plazo)
+    '''
+    start = time.monotonic()
+    if cls == PED:
+        entered = monitor.wants_enter_pedestrian(priority, timeout)
+    else:
+        entered = monitor.wants_enter_car(cls, priority, timeout)
+    if entered == TIMEOUT:
+        if waits is not None:
+            waits[i] = -1
+        return
+    if waits is not None:
+        waits[i] = (time.monotonic() - start) / scale
+    time.sleep(crossing_time(cls) * scale)
+    if cls == PED:
+        monitor.leaves_pedestrian()
+    else:
+        monitor.leaves_car(cls)
+
+
+def arrivals(cls: int, mean: float, n: int, monitor: Monitor, scale: float,
+             seed: int, priority: int = 0, timeout: float = None,
+             waits=None) -> None:
+    '''
+    n vehículos de la clase cls (para las ambulancias, alternando norte y
+    sur), con llegadas exponenciales de media mean segundos
+    '''
+    random.seed(seed)
+    plst = []
+    for i in range(n):
+        time.sleep(random.expovariate(1/mean) * scale)
+        k = i % 2 if cls is None else cls
+        p = Process(target=vehicle,
+                    args=(k, monitor, scale, priority, timeout, waits, i))
+        p.start()
+        plst.append(p)
+        if len(plst) > 64:
+            plst = [p for p in plst if p.is_alive()]
+    for p in plst:
+        p.join()
+
+
+def run(priority: int, scale: float, timeout: float = None) -> list:
+    '''
+    Esperas de las ambulancias con tráfico de fondo saturado
+    '''
+    monitor = Monitor()
+    waits = RawArray('d', NURGENT)
+    duration = NURGENT * TIME_URGENT
+    background = [(NORTH, TIME_CARS_NORTH / LOAD), (SOUTH, TIME_CARS_SOUTH / LOAD),
+                  (PED, TIME_PED / LOAD)]
+    plst = [Process(target=arrivals,
+                    args=(cls, mean, int(duration / mean), monitor, scale, cls))
+            for cls, mean in background]
+    plst.append(Process(target=arrivals,
+                        args=(None, TIME_URGENT, NURGENT, monitor, scale, 3,
+                              priority, None if timeout is None else timeout * scale,
+                              waits)))
+    for p in plst:
+        p.start()
+    for p in plst:
+        p.join()
+    return list(waits)
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 0.02
+    timeout = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    for priority in (0, 1):
+        waits = run(priority, scale, timeout)
+        late = sum(1 for w in waits if w < 0)
+        waits = sorted(w for w in waits if w >= 0)
+        p = lambda q: waits[min(int(q * len(waits)), len(waits) - 1)] if waits else float('nan')
+        print(f"prioridad {priority}: espera p50 {p(0.5):7.2f}s  p99 {p(0.99):7.2f}s  "
+              f"máx {waits[-1] if waits else float('nan'):7.2f}s"
+              + (f"  {late} sin entrar en {timeout}s" if timeout is not None else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Evaluación vectorizada de políticas de admisión con NumPy
+
+Uso:
+    python puente_vectorial.py [vehículos] [política ...]
+
+genera con NumPy llegadas de Poisson de coches en las dos direcciones y de
+peatones (vehículos, 1000000 por defecto, con los ritmos del main de
+puente_politicas) y calcula para cada política (strict, batch:3, batch:10 y
+slice:3 por defecto) el instante de entrada y de salida de todos los
+vehículos. Imprime cuántos vehículos por segundo evalúa y el mismo resumen
+que puente_politicas.score. Antes comprueba en casos pequeños con semilla
+que el resultado coincide con el de puente_sim, que usa la lógica del
+Monitor de puente_03.
+
+evaluate no sigue los eventos de uno en uno: recorre el horario turno a
+turno. Dentro de un turno de la clase k, cuántos de k entran, cuándo deja de
+entrar la clase y cuándo se vacía el puente se calculan sobre los arrays de
+llegadas de k con searchsorted, máximos acumulados y mínimos. Con carga
+alta cada turno admite a muchos vehículos y el coste por vehículo es el de
+NumPy; con carga baja hay casi un turno por vehículo y es más lento.
+
+Las políticas que sabe evaluar son las de reglas fijas: strict
+(StrictRotation) y las de cupo de puente_politicas por número de
+vehículos (batch:N) o por tiempo (slice:T). fair y adaptive dependen de su
+historia y se simulan con puente_sim.
+"""
+
+import sys
+import time
+import math
+
+import numpy as np
+
+from puente_03 import NORTH, SOUTH, PED, TIME_IN_BRIDGE_CARS, TIME_IN_BRIDGE_PEDESTRIAN
+from puente_03 import MIN_TIME_IN_BRIDGE
+from puente_politicas import others, CLASSES, NAMES
+
+INF = math.inf
+RATES = {NORTH: 1/0.3, SOUTH: 1/0.3, PED: 1/3} # llegadas por segundo
+STEP = 0.1 #redondeo de las llegadas de check, como en una traza gruesa
+
+
+def parse(spec: str) -> tuple:
+    '''
+    (cupo de vehículos, cupo de tiempo) de una política, como en
+    puente_politicas.make_policy; None para strict
+    '''
+    name, _, args = spec.partition(':')
+    if name == 'strict':
+        return None
+    elif name == 'batch':
+        if int(args) < 1:
+            raise ValueError("el cupo tiene que ser de al menos un vehículo")
+        return int(args), INF
+    elif name == 'slice':
+        if float(args) <= 0:
+            raise ValueError("la duración del turno tiene que ser positiva")
+        return INF, float(args)
+    raise ValueError(f"política sin evaluación vectorizada: {spec} (usa puente_sim)")
+
+
+def evaluate(arrival, cls, duration, policy: str = 'strict') -> tuple:
+    '''
+    Instantes de entrada y de salida de cada vehículo, en el orden de los
+    arrays de entrada: arrival (llegada), cls (NORTH, SOUTH o PED) y
+    duration (tiempo en el puente). Los vehículos de una clase entran en
+    orden de llegada, como en puente_sim.
+
+    Cada turno empieza en un instante s con una clase k: entran a la vez los
+    de k que esperan y después los que llegan mientras no espere nadie de
+    otra clase. Desde la primera llegada de otra clase (w) siguen entrando
+    según la política:
+        strict  si el turno es de k, hasta la primera salida después de w; si
+                el puente se llenó sin turno (nadie esperaba), ninguno más,
+                salvo que alguien de k haya salido antes de w (el turno
+                pasa entonces a k)
+        cupo    mientras no se pasen del cupo de vehículos o de tiempo del
+                turno y el puente no se vacíe
+    Cuando el puente se vacía, el turno pasa a la siguiente clase de la
+    rotación que esté esperando. Si se vacía antes de w, el siguiente turno
+    empieza en w con la clase que llega, sin turno en strict.
+
+    Las llegadas simultáneas (por ejemplo de una traza con los instantes
+    redondeados) se atienden en el orden de los arrays, como en puente_sim
+    (ver untie). Lo que no se reproduce es una llegada en el mismo instante
+    exacto en que sale otro vehículo: puente_sim los atiende en el orden en
+    que los programó y aquí la llegada cuenta como ya esperando. Sólo pasa
+    si los cruces también caen en la rejilla de las llegadas, por ejemplo
+    cruces recortados a MIN_TIME_IN_BRIDGE con llegadas en centésimas.
+    '''
+    quota = parse(policy)
+    given = np.asarray(arrival, dtype=float)
+    arrival = untie(given)
+    cls = np.asarray(cls)
+    duration = np.asarray(duration, dtype=float)
+    enter = np.full(len(arrival), np.nan)
+    exit = np.full(len(arrival), np.nan)
+    # por clase: llegadas ordenadas, cruces y posición en los arrays de entrada
+    order = [np.flatnonzero(cls == k) for k in CLASSES]
+    order = [o[np.argsort(arrival[o], kind='stable')] for o in order]
+    A = [arrival[o] for o in order]
+    D = [duration[o] for o in order]
+    E = [np.empty(len(o)) for o in order]
+    p = [0, 0, 0] # primer vehículo de cada clase que no ha entrado
+
+    def pending(j: int) -> float:
+        return A[j][p[j]] if p[j] < len(A[j]) else INF
+
+    starts = [pending(k) for k in CLASSES]
+    k = int(np.argmin(starts))
+    s = starts[k]
+    turn = k == NORTH #strict empieza con el turno 0
+    while s < INF:
+        a, d = A[k], D[k]
+        i0 = p[k]
+        w = min(pending(j) for j in others(k))
+        i1 = np.searchsorted(a, s, 'right') #los que esperan en s
+        if quota is not None and w <= s:
+            i1 = min(i1, i0 + quota[0]) if quota[0] < INF else i1
+        iw = np.searchsorted(a, w, 'left') if w > s else i1
+        E[k][i0:iw] = np.maximum(a[i0:iw], s)
+        exits = E[k][i0:iw] + d[i0:iw]
+        cm = exits.max()
+        if w > s and cm < w:
+            #el puente se vacía sin que nadie espere: el turno sigue en k
+            p[k] = iw
+            k = min(others(k), key=pending)
+            s, turn = w, False
+            continue
+        ie = iw
+        if quota is None:
+            if turn or w <= s or exits.min() < w:
+                close = exits[exits > w].min()
+                iz = np.searchsorted(a, close, 'left')
+                if iz > iw:
+                    close = min(close, (a[iw:iz] + d[iw:iz]).min())
+                ie = np.searchsorted(a, close, 'left')
+        else:
+            n, slice = quota
+            extra = n - (iw - i0)
+            iz = np.searchsorted(a, s + slice, 'left')
+            iz = min(iz, iw + extra) if extra < INF else iz
+            if iz > iw:
+                ends = a[iw:iz] + d[iw:iz]
+                before = np.maximum.accumulate(np.concatenate(([cm], ends[:-1])))
+                empty = a[iw:iz] > before
+                ie = iw + (int(np.argmax(empty)) if empty.any() else iz - iw)
+        if ie > iw:
+            E[k][iw:ie] = a[iw:ie]
+            cm = max(cm, (a[iw:ie] + d[iw:ie]).max())
+        p[k] = ie
+        s = cm
+        k = next(j for j in others(k) if pending(j) <= s)
+        turn = True
+    for k in CLASSES:
+        enter[order[k]] = E[k]
+        exit[order[k]] = E[k] + D[k]
+    #quien entra al llegar entra en su instante de llegada sin desempatar
+    entered = enter == arrival
+    enter[entered] = given[entered]
+    exit[entered] = given[entered] + duration[entered]
+    return enter, exit
+
+
+def untie(arrival):
+    '''
+    Separa las llegadas simultáneas por el orden en que aparecen, como las
+    atiende puente_sim: la m-ésima de un mismo instante t pasa a llegar m
+    ulp (np.spacing(t)) después. El orden entre todas las llegadas queda
+    fijado sin empates y los instantes sólo cambian en la última cifra.
+    '''
+    first = np.argsort(arrival, kind='stable')
+    t = arrival[first]
+    tied = np.concatenate(([False], t[1:] == t[:-1]))
+    pos = np.arange(len(t))
+    rank = pos - np.maximum.accumulate(np.where(tied, 0, pos))
+    untied = np.empty_like(arrival)
+    untied[first] = t + rank * np.spacing(t)
+    return untied
+
+
+def generate(n: int, seed: int = 0, rates: dict = RATES) -> tuple:
+    '''
+    n llegadas de Poisson repartidas entre las clases según rates, con los
+    tiempos en el puente de puente_03: (arrival, cls, duration)
+    '''
+    rng = np.random.default_rng(seed)
+    total = sum(rates.values())
+    cls = rng.choice(len(CLASSES), size=n, p=[rates[k] / total for k in CLASSES])
+    arrival = np.cumsum(rng.exponential(1 / total, size=n))
+    duration = np.where(cls == PED,
+                        rng.normal(*TIME_IN_BRIDGE_PEDESTRIAN, size=n),
+                        rng.normal(*TIME_IN_BRIDGE_CARS, size=n))
+    return arrival, cls, np.maximum(duration, MIN_TIME_IN_BRIDGE)
+
+
+def score(arrival, cls, enter, exit) -> dict:
+    '''
+    Lo mismo que puente_politicas.score, sobre los arrays de evaluate
+    '''
+    end = np.max(exit)
+    first = np.argsort(enter, kind='stable')
+    result = {'completed': len(enter), 'stuck': 0,
+              'throughput': len(enter) / end if end else 0.0,
+              'switches': int(np.count_nonzero(np.diff(cls[first])))}
+    waits = enter - arrival
+    for k, name in zip(CLASSES, NAMES):
+        w = np.sort(waits[cls == k])
+        result[name] = {
+            'mean': w.mean() if len(w) else None,
+            'p99': w[min(len(w) - 1, int(0.99 * len(w)))] if len(w) else None,
+            'max': w[-1] if len(w) else None,
+        }
+    return result
+
+
+def check(policy: str, n: int = 300, seeds: int = 20) -> float:
+    '''
+    Mayor diferencia entre los instantes de entrada de evaluate y los de
+    puente_sim con las mismas llegadas, en seeds casos de n vehículos. Cada
+    caso se prueba también con las llegadas redondeadas a STEP segundos,
+    con llegadas simultáneas de la misma clase y de clases distintas.
+    '''
+    from puente_sim import simulate
+    from puente_politicas import make_policy
+    worst = 0.0
+    for seed in range(seeds):
+        #ritmos distintos por semilla: de puente casi vacío a saturado
+        load = 0.2 + 2 * seed / seeds
+        arrival, cls, duration = generate(n, seed, {k: r * load for k, r in RATES.items()})
+        for times in (arrival, np.round(arrival / STEP) * STEP):
+            enter, _ = evaluate(times, cls, duration, policy)
+            records = simulate(arrivals=zip(times.tolist(), cls.tolist(), duration.tolist()),
+                               policy=make_policy(policy))
+            for k in CLASSES:
+                mine = enter[cls == k]
+                theirs = np.array([v[3] for v in sorted(records, key=lambda v: v[1])
+                                   if v[0] == k], dtype=float)
+                worst = max(worst, np.max(np.abs(mine - theirs), initial=0.0))
+    return worst
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    specs = sys.argv[2:] or ['strict', 'batch:3', 'batch:10', 'slice:3']
+    arrival, cls, duration = generate(n)
+    for spec in specs:
+        worst = check(spec)
+        start = time.perf_counter()
+        enter, exit = evaluate(arrival, cls, duration, spec)
+        elapsed = time.perf_counter() - start
+        r = score(arrival, cls, enter, exit)
+        waits = '  '.join(f"{name} media {r[name]['mean']:.1f}s p99 {r[name]['p99']:.1f}s"
+                          for name in NAMES if r[name]['mean'] is not None)
+        print(f"{spec:<10} {n/elapsed:10.0f} veh/s evaluados  "
+              f"{'coincide' if worst < 1e-9 else f'difiere {worst:.3g}s'} con puente_sim")
+        print(f"           {r['throughput']:5.2f} veh/s  cambios {r['switches']:6d}  {waits}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Vigilante de avisos perdidos e inanición para el Monitor de puente_03
+
+Uso:
+    python puente_vigilante.py [--correct] [--lose 0.2] [--scale 0.05]
+
+reproduce las llegadas de main() con un monitor cuyas condiciones pierden la
+fracción --lose de los avisos, para ver al vigilante detectarlo (y con
+--correct recuperarlo).
+
+El vigilante es un proceso aparte que cada period segundos mira el bloque de
+estado del monitor sin cerrojo. Sólo coge el mutex, una vez por periodo,
+cuando hay vehículos esperando, para comprobar con el predicado de la
+política si alguno podría entrar. Detecta tres cosas:
+    - avisos perdidos: una clase tiene entradas concedidas (GRANTED) que
+      nadie recoge desde hace más de deadline segundos. El vehículo ya
+      cuenta como en el puente pero sigue dormido, así que nunca sale.
+    - entradas sin conceder: hay vehículos de una clase esperando que su
+      predicado admite desde hace más de deadline segundos. Con el relevo
+      contado de _admit_waiting eso no debería durar nada: quien sale los
+      admite él mismo.
+    - inanición: una clase lleva más de starvation segundos con vehículos
+      esperando y sin que entre ninguno.
+En todos los casos escribe una foto del estado. Con correct=True además
+repite el aviso a tantos como entradas concedidas queden, o concede las
+pendientes como lo haría quien sale del puente (_admit_waiting, que avisa
+exactamente a los admitidos) y, si el puente está vacío y aun así nadie
+puede entrar, da el turno a la clase que espera.
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+from multiprocessing import Process, Event as StopFlag
+
+from puente_03 import Monitor, NORTH, SOUTH, PED
+from puente_03 import ON, WAITING, TURN, GRANTED, WAKEUPS, FAILED_WAKEUPS, ADMITTED, SEQ
+
+
+CLASSES = (NORTH, SOUTH, PED)
+NAMES = ('north', 'south', 'ped')
+
+LOST_WAKEUP = 'lost_wakeup'
+MISSED_ADMISSION = 'missed_admission'
+STARVATION = 'starvation'
+
+
+def snapshot(monitor: Monitor) -> dict:
+    '''
+    Foto del estado del monitor para el diagnóstico
+    '''
+    state = monitor.snapshot()
+    snap = {'turn': state[TURN], 'wakeups': state[WAKEUPS],
+            'failed_wakeups': state[FAILED_WAKEUPS],
+            'policy': type(monitor.policy).__name__}
+    for k, name in zip(CLASSES, NAMES):
+        snap[name] = {'on': state[ON + k], 'waiting': state[WAITING + k],
+                      'granted': state[GRANTED + k], 'admitted': state[ADMITTED + k]}
+    return snap
+
+
+class Watchdog():
+    '''
+    Proceso vigilante de un Monitor (ver el comentario del módulo). Las
+    alarmas se escriben en out (por defecto la salida de error).
+    '''
+
+    def __init__(self, monitor: Monitor, period: float = 1.0,
+                 deadline: float = 5.0, starvation: float = 60.0,
+                 correct: bool = False, out=None):
+        self.monitor = monitor
+        self.period = period
+        self.deadline = deadline
+        self.starvation = starvation
+        self.correct = correct
+        self.out = out
+        self.stop_flag = StopFlag()
+        self.process = None
+
+    def admissible(self) -> list:
+        '''
+        Clases con vehículos esperando que su predicado admite, con el mutex
+        cogido para ver un estado coherente
+        '''
+        monitor, state = self.monitor, self.monitor.state
+        with monitor.mutex:
+            return [k for k in CLASSES
+                    if state[WAITING + k] > 0 and monitor._gate(k)[1]()]
+
+    def recover(self, kind: str, cls: int) -> int:
+        '''
+        Vuelve a avisar a los vehículos de la clase cls con entrada concedida
+        o concede las que se hayan quedado sin dar. Devuelve a cuántos avisa.
+        '''
+        monitor, state = self.monitor, self.monitor.state
+        with monitor.mutex:
+            if kind == LOST_WAKEUP:
+                n = state[GRANTED + cls]
+                if n > 0:
+                    monitor._gate(cls)[0].notify(n)
+                return n
+            state[SEQ] += 1
+            before = state[ADMITTED + cls]
+            monitor._admit_waiting(cls)
+            if state[ADMITTED + cls] == before and state[WAITING + cls] > 0 and \
+                    all(state[ON + k] == 0 for k in CLASSES):
+                state[TURN] = cls
+                monitor._admit_waiting(cls)
+            state[SEQ] += 1
+            return state[ADMITTED + cls] - before
+
+    def alarm(self, kind: str, cls: int, since: float, now: float) -> None:
+        out = self.out or sys.stderr
+        print(f"VIGILANTE {kind} {NAMES[cls]}: {now - since:.1f}s "
+              f"{snapshot(self.monitor)}", file=out, flush=True)
+        if self.correct:
+            n = self.recover(kind, cls)
+            print(f"VIGILANTE {NAMES[cls]}: {n} avisados", file=out, flush=True)
+
+    def watch(self) -> None:
+        state = self.monitor.state
+        granted_since = [None, None, None]
+        admissible_since = [None, None, None]
+        stalled_since = [None, None, None]
+        last_admitted = [state[ADMITTED + k] for k in CLASSES]
+        while not self.stop_flag.wait(self.period):
+            now = time.monotonic()
+            waiting = [k for k in CLASSES if state[WAITING + k] > 0]
+            admissible = self.admissible() if waiting else []
+            for k in CLASSES:
+                admitted = state[ADMITTED + k]
+                if k not in waiting or admitted != last_admitted[k]:
+                    stalled_since[k] = None
+                elif stalled_since[k] is None:
+                    stalled_since[k] = now
+                last_admitted[k] = admitted
+
+                if state[GRANTED + k] == 0:
+                    granted_since[k] = None
+                elif granted_since[k] is None:
+                    granted_since[k] = now
+
+                if k not in admissible:
+                    admissible_since[k] = None
+                elif admissible_since[k] is None:
+                    admissible_since[k] = now
+
+                if granted_since[k] is not None and \
+                        now - granted_since[k] >= self.deadline:
+                    self.alarm(LOST_WAKEUP, k, granted_since[k], now)
+                    granted_since[k] = None
+                elif admissible_since[k] is not None and \
+                        now - admissible_since[k] >= self.deadline:
+                    self.alarm(MISSED_ADMISSION, k, admissible_since[k], now)
+                    admissible_since[k] = None
+                    stalled_since[k] = None
+                elif stalled_since[k] is not None and \
+                        now - stalled_since[k] >= self.starvation:
+                    self.alarm(STARVATION, k, stalled_since[k], now)
+                    stalled_since[k] = None
+
+    def start(self) -> None:
+        self.process = Process(target=self.watch)
+        self.process.start()
+
+    def stop(self) -> None:
+        self.stop_flag.set()
+        self.process.join()
+
+
+class _LossyCondition():
+    '''
+    Condición que pierde avisos: para la demostración
+    '''
+
+    def __init__(self, condition, lose: float, rng):
+        self.condition = condition
+        self.lose = lose
+        self.rng = rng
+
+    def wait(self, timeout=None):
+        return self.condition.wait(timeout)
+
+    def notify(self, n=1):
+        n = sum(1 for _ in range(n) if self.rng.random() >= self.lose)
+        if n > 0:
+            self.condition.notify(n)
+
+    def notify_all(self):
+        self.condition.notify_all()
+
+
+def _replay(scale: float, monitor: Monitor) -> None:
+    '''
+    Las llegadas de la demostración, en un grupo de procesos propio para
+    poder acabar con todos los vehículos si se quedan bloqueados
+    '''
+    import puente_trazas
+    from puente_log import NullLog
+    os.setpgrp()
+    puente_trazas.replay(puente_trazas.generate(seed=0), monitor, NullLog(), scale)
+
+
+def main():
+    import random
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--correct', action='store_true')
+    parser.add_argument('--lose', type=float, default=0.2)
+    parser.add_argument('--scale', type=float, default=0.05)
+    args = parser.parse_args()
+
+    monitor = Monitor()
+    rng = random.Random(0)
+    for name in ('can_north_cars', 'can_south_cars', 'can_ped'):
+        setattr(monitor, name, _LossyCondition(getattr(monitor, name), args.lose, rng))
+    watchdog = Watchdog(monitor, period=0.1, deadline=0.5, starvation=5.0,
+                        correct=args.correct)
+    watchdog.start()
+    replay = Process(target=_replay, args=(args.scale, monitor))
+    replay.start()
+    replay.join(timeout=60)
+    if replay.is_alive():
+        print(f"bloqueado: {snapshot(monitor)}")
+        os.killpg(replay.pid, signal.SIGKILL)
+        replay.join()
+    else:
+        print(f"terminado: {snapshot(monitor)}")
+    watchdog.stop()
+
+
+if __name__ == '__main__':
+    main()
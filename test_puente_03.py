@@ -0,0 +1,256 @@
+"""
+Pruebas de comportamiento del Monitor de puente_03
+
+Se ejecutan sin procesos: con el simulador de puente_sim (SimMonitor), con
+el planificador cooperativo de puente_explorador, que hace correr los
+métodos del Monitor con Lock y Condition sustitutos en un entrelazado fijo
+por semilla, o con hilos (puente_hilos.ThreadMonitor) para los plazos.
+"""
+
+import time
+import threading
+
+import pytest
+
+import puente_03
+import puente_explorador as explorador
+from puente_03 import Monitor, NORTH, SOUTH, PED
+from puente_03 import ON, WAITING, GRANTED, WAKEUPS, FAILED_WAKEUPS, ADMITTED
+from puente_03 import URGENT, TIMEOUT
+from puente_sim import Simulation
+from puente_hilos import ThreadMonitor
+
+CLASSES = (NORTH, SOUTH, PED)
+
+
+def baton_run(monkeypatch, seed: int, workload: tuple, **kwargs) -> tuple:
+    '''
+    Un entrelazado de la carga (norte, sur, peatones, vueltas) con el
+    Monitor de puente_03: (fallo o None, mensaje, monitor, n de cada notify)
+    '''
+    sched = explorador.Scheduler(seed)
+    notified = []
+    notify = explorador.BatonCondition.notify
+
+    def counting(self, n=1):
+        notified.append(min(n, len(self.waiters)))
+        notify(self, n)
+
+    monkeypatch.setattr(explorador.BatonCondition, 'notify', counting)
+    monkeypatch.setattr(puente_03, 'Lock', lambda: explorador.BatonLock(sched))
+    monkeypatch.setattr(puente_03, 'Condition',
+                        lambda lock=None: explorador.BatonCondition(sched, lock))
+    monitor = Monitor(**kwargs)
+    bridge = [0, 0, 0]
+    *counts, laps = workload
+    for cls, n in enumerate(counts):
+        for i in range(n):
+            sched.spawn(f"{explorador.NAMES[cls]}{i + 1}", explorador.vehicle,
+                        sched, monitor, cls, laps, bridge)
+    kind, message = sched.run(lambda: explorador.unsafe(bridge))
+    return kind, message, monitor, notified
+
+
+def test_handoff_wakes_exactly_the_admitted():
+    '''
+    Cuando sale el coche del sur, los cinco del norte que esperan entran en
+    el mismo relevo: un notify(5), cinco despertares que recogen su entrada
+    y ninguno inútil
+    '''
+    sim = Simulation()
+    calls = []
+    condition = sim.conditions[NORTH]
+    notify = condition.notify
+    condition.notify = lambda n=1: (calls.append(n), notify(n))
+    sim.add_trace([(0.0, SOUTH, 10.0)] + [(float(t), NORTH, 1.0) for t in range(1, 6)])
+    sim.run(until=9.0)
+    state = sim.monitor.state
+    assert state[WAITING + NORTH] == 5 and len(condition.waiters) == 5
+    sim.run(until=10.5)
+    assert calls == [5]
+    assert state[ON + NORTH] == 5 and state[WAITING + NORTH] == 0
+    assert state[GRANTED + NORTH] == 0
+    assert (state[WAKEUPS], state[FAILED_WAKEUPS]) == (5, 0)
+    assert [v[3] for v in sim.records if v[0] == NORTH] == [10.0] * 5
+
+
+def test_handoff_counters_over_a_run():
+    '''
+    En una ejecución entera cada vehículo que espera se despierta una sola
+    vez y con entrada, y no queda ninguna entrada concedida sin recoger
+    '''
+    sim = Simulation(seed=1)
+    sim.add_generator(NORTH, 200, 0.3)
+    sim.add_generator(SOUTH, 200, 0.3)
+    sim.add_generator(PED, 20, 3)
+    records = sim.run()
+    state = sim.monitor.state
+    waited = sum(1 for v in records if v[3] > v[2])
+    assert all(v[4] is not None for v in records)
+    assert state[WAKEUPS] == waited and state[FAILED_WAKEUPS] == 0
+    assert all(state[GRANTED + k] == 0 and state[WAITING + k] == 0 for k in CLASSES)
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_handoff_interleavings(monkeypatch, seed):
+    '''
+    Con las primitivas del Monitor en cualquier entrelazado: puente seguro,
+    todos cruzan y cada notify despierta exactamente a los admitidos
+    '''
+    kind, message, monitor, notified = baton_run(monkeypatch, seed, (2, 2, 1, 2))
+    assert kind is None, message
+    state = monitor.state
+    assert [state[ADMITTED + k] for k in CLASSES] == [4, 4, 2]
+    assert all(state[GRANTED + k] == 0 and state[ON + k] == 0 for k in CLASSES)
+    assert state[WAKEUPS] == sum(notified) and state[FAILED_WAKEUPS] == 0
+
+
+def turn_after(cls: int, turn: int, on: dict = {}, waiting: dict = {}) -> tuple:
+    '''
+    (turno, clase a la que se da paso) tras StrictRotation.leaves de un
+    vehículo de cls, con el puente ya descontado
+    '''
+    monitor = Monitor()
+    state = monitor.state
+    state[puente_03.TURN] = turn
+    for k, n in on.items():
+        state[ON + k] = n
+    for k, n in waiting.items():
+        state[WAITING + k] = n
+    admit = puente_03.StrictRotation().leaves(monitor, cls)
+    return state[puente_03.TURN], admit
+
+
+def test_turn_pedestrian_leaves_alone():
+    assert turn_after(PED, NORTH) == (PED, None)
+
+
+def test_turn_south_keeps_passing_to_north():
+    '''
+    Con coches del norte esperando y aún coches del sur en el puente, el
+    turno pasa al norte aunque todavía no se les pueda dar paso
+    '''
+    assert turn_after(SOUTH, SOUTH, on={SOUTH: 1}, waiting={NORTH: 2}) == (NORTH, None)
+    assert turn_after(SOUTH, SOUTH, waiting={NORTH: 2}) == (NORTH, NORTH)
+
+
+def test_turn_south_leaves_alone():
+    assert turn_after(SOUTH, NORTH) == (SOUTH, None)
+
+
+def test_turn_south_arrivals_wait_once_north_waits():
+    '''
+    Mientras el turno ya es del norte no entran más coches del sur aunque
+    el puente siga siendo suyo
+    '''
+    sim = Simulation()
+    sim.add_trace([(0.0, SOUTH, 10.0), (0.5, SOUTH, 2.0), (1.0, NORTH, 1.0),
+                   (3.0, SOUTH, 1.0)])
+    records = {(v[0], v[1]): v for v in sim.run()}
+    north, late_south = records[NORTH, 1], records[SOUTH, 3]
+    assert north[3] == 10.0
+    assert late_south[3] >= north[4]
+
+
+def start(method, *args) -> list:
+    '''
+    Llama a un método del monitor en un hilo; la lista recibe lo que devuelve
+    '''
+    result = []
+    threading.Thread(target=lambda: result.append(method(*args)), daemon=True).start()
+    return result
+
+
+def until(predicate) -> None:
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline, "el monitor no llega al estado esperado"
+        time.sleep(0.001)
+
+
+def test_timeout_withdraws():
+    monitor = ThreadMonitor()
+    monitor.wants_enter_car(SOUTH)
+    assert monitor.wants_enter_car(NORTH, priority=1, timeout=0.05) == TIMEOUT
+    state = monitor.state
+    assert state[WAITING + NORTH] == 0 and state[URGENT + NORTH] == 0
+    assert state[ON + NORTH] == 0 and state[ADMITTED + NORTH] == 0
+
+
+def test_timeout_unblocks_other_classes():
+    '''
+    Un peatón que espera frena a los coches del sur que llegan sin turno;
+    cuando se le acaba el plazo, entran sin esperar a que el puente se vacíe
+    '''
+    monitor = ThreadMonitor()
+    monitor.wants_enter_car(SOUTH)
+    ped = start(monitor.wants_enter_pedestrian, 0, 0.2)
+    until(lambda: monitor.state[WAITING + PED] == 1)
+    south = start(monitor.wants_enter_car, SOUTH)
+    until(lambda: monitor.state[WAITING + SOUTH] == 1)
+    until(lambda: south)
+    assert ped == [TIMEOUT]
+    assert monitor.state[ON + SOUTH] == 2 and monitor.state[GRANTED + SOUTH] == 0
+
+
+def test_priority_jumps_the_turn():
+    '''
+    Al salir el coche del sur el turno sería de los peatones, pero entra
+    antes el coche del norte con prioridad; mientras espera, no entran más
+    coches del sur
+    '''
+    monitor = ThreadMonitor()
+    state = monitor.state
+    monitor.wants_enter_car(SOUTH)
+    ped = start(monitor.wants_enter_pedestrian)
+    until(lambda: state[WAITING + PED] == 1)
+    north = start(monitor.wants_enter_car, NORTH, 1)
+    until(lambda: state[URGENT + NORTH] == 1)
+    assert monitor.wants_enter_car(SOUTH, timeout=0.05) == TIMEOUT
+    monitor.leaves_car(SOUTH)
+    until(lambda: north)
+    assert state[ON + NORTH] == 1 and state[URGENT + NORTH] == 0
+    assert state[WAITING + PED] == 1 and not ped
+    monitor.leaves_car(NORTH)
+    until(lambda: ped)
+    assert state[ON + PED] == 1
+    assert all(state[GRANTED + k] == 0 for k in CLASSES)
+
+
+def test_platoon():
+    monitor = Monitor()
+    monitor.wants_enter_cars(SOUTH, 3)
+    assert monitor.state[ON + SOUTH] == 3 and monitor.state[ADMITTED + SOUTH] == 3
+    monitor.leaves_cars(SOUTH, 3)
+    assert monitor.state[ON + SOUTH] == 0
+
+
+@pytest.mark.parametrize('direction, k', [(NORTH, 0), (SOUTH, -2), (PED, 2), (5, 1)])
+def test_platoon_rejects_bad_arguments(direction, k):
+    monitor = Monitor()
+    with pytest.raises(ValueError):
+        monitor.wants_enter_cars(direction, k)
+    with pytest.raises(ValueError):
+        monitor.leaves_cars(direction, k)
+    assert monitor.state[:puente_03.SEQ] == [0] * puente_03.SEQ
+
+
+def test_entry_returns_the_instant_without_metrics():
+    monitor = Monitor()
+    before = time.monotonic()
+    entered = monitor.wants_enter_car(NORTH)
+    assert entered != TIMEOUT and before <= entered <= time.monotonic()
+    monitor.leaves_car(NORTH, entered)
+    assert monitor.wants_enter_pedestrian() != TIMEOUT
+    monitor.leaves_pedestrian()
+    assert monitor.wants_enter_cars(SOUTH, 2) >= entered
+
+
+@pytest.mark.parametrize('direction', [PED, 5, -1])
+def test_bad_direction_is_an_error(direction):
+    monitor = Monitor()
+    with pytest.raises(ValueError):
+        monitor.wants_enter_car(direction)
+    with pytest.raises(ValueError):
+        monitor.leaves_car(direction)
+    assert monitor.state[:puente_03.SEQ] == [0] * puente_03.SEQ
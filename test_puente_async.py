@@ -0,0 +1,105 @@
+"""
+Pruebas de AsyncMonitor y de los tiempos en el puente de puente_async
+"""
+
+import asyncio
+
+import pytest
+
+import puente_async
+from puente_03 import NORTH, SOUTH, PED, ON, WAITING, ADMITTED, URGENT, TIMEOUT
+
+
+def test_crossing_times_come_from_the_configuration(monkeypatch):
+    '''
+    Sin duración, coches y peatones cruzan en crossing_time de su clase
+    '''
+    asked = []
+
+    def crossing_time(cls):
+        asked.append(cls)
+        return 0.01
+
+    monkeypatch.setattr(puente_async, 'crossing_time', crossing_time)
+
+    async def run():
+        monitor = puente_async.AsyncMonitor()
+        await asyncio.gather(puente_async.car(1, NORTH, monitor, False),
+                             puente_async.car(1, SOUTH, monitor, False),
+                             puente_async.pedestrian(1, monitor, False))
+        return monitor
+
+    state = asyncio.run(run()).state
+    assert sorted(asked) == [NORTH, SOUTH, PED]
+    assert [state[ADMITTED + k] for k in (NORTH, SOUTH, PED)] == [1, 1, 1]
+    assert all(state[ON + k] == 0 for k in (NORTH, SOUTH, PED))
+
+
+def test_duration_overrides_the_configuration(monkeypatch):
+    monkeypatch.setattr(puente_async, 'crossing_time', None)
+    monitor = puente_async.AsyncMonitor()
+    asyncio.run(puente_async.car(1, SOUTH, monitor, False, duration=0.01))
+    assert monitor.state[ADMITTED + SOUTH] == 1
+
+
+def test_platoon():
+    async def run():
+        monitor = puente_async.AsyncMonitor()
+        await monitor.wants_enter_cars(SOUTH, 3)
+        on = monitor.state[ON + SOUTH]
+        await monitor.leaves_cars(SOUTH, 3)
+        return on, monitor.state
+
+    on, state = asyncio.run(run())
+    assert on == 3 and state[ADMITTED + SOUTH] == 3 and state[ON + SOUTH] == 0
+
+
+def test_timeout_withdraws():
+    async def run():
+        monitor = puente_async.AsyncMonitor()
+        await monitor.wants_enter_car(SOUTH)
+        entered = await monitor.wants_enter_car(NORTH, priority=1, timeout=0.05)
+        return entered, monitor.state
+
+    entered, state = asyncio.run(run())
+    assert entered == TIMEOUT
+    assert state[WAITING + NORTH] == 0 and state[URGENT + NORTH] == 0
+    assert state[ON + NORTH] == 0 and state[ADMITTED + NORTH] == 0
+
+
+def test_priority_jumps_the_turn():
+    '''
+    Al salir el coche del sur entra antes el del norte con prioridad que el
+    peatón al que le tocaba el turno
+    '''
+    async def run():
+        monitor = puente_async.AsyncMonitor()
+        order = []
+
+        async def vehicle(cls, priority=0):
+            if cls == PED:
+                await monitor.wants_enter_pedestrian(priority)
+            else:
+                await monitor.wants_enter_car(cls, priority)
+            order.append(cls)
+
+        await monitor.wants_enter_car(SOUTH)
+        ped = asyncio.create_task(vehicle(PED))
+        await asyncio.sleep(0)
+        north = asyncio.create_task(vehicle(NORTH, 1))
+        await asyncio.sleep(0)
+        await monitor.leaves_car(SOUTH)
+        await north
+        await monitor.leaves_car(NORTH)
+        await ped
+        return order
+
+    assert asyncio.run(run()) == [NORTH, PED]
+
+
+def test_bad_direction_is_an_error():
+    monitor = puente_async.AsyncMonitor()
+    with pytest.raises(ValueError):
+        asyncio.run(monitor.wants_enter_car(PED))
+    with pytest.raises(ValueError):
+        asyncio.run(monitor.wants_enter_cars(5, 2))
@@ -0,0 +1,32 @@
+"""
+Pruebas del explorador de entrelazados con los monitores con fallos
+conocidos de puente_01 y puente_02
+"""
+
+import puente_01
+import puente_02
+import puente_03
+from puente_explorador import explore, minimize, ERROR
+
+
+def test_finds_known_bugs():
+    for module in (puente_01, puente_02):
+        failure, message, trace = explore(module, (2, 2, 1, 2), 0)
+        assert failure is not None and failure[0] == ERROR
+
+
+def test_minimize_keeps_the_same_bug():
+    '''
+    puente_02 tiene varios fallos; al reducir el del += sobre Value no se
+    puede acabar en otro (el peatón que llega a ncar_south)
+    '''
+    failure, message, trace = explore(puente_02, (2, 2, 1, 2), 0)
+    assert failure[1].startswith('TypeError')
+    workload, seed, message, trace = minimize(puente_02, (2, 2, 1, 2), 0, failure, None)
+    assert explore(puente_02, workload, seed)[0] == failure
+    assert sum(workload[:3]) == 1 and 'TypeError' in message
+
+
+def test_correct_monitor():
+    for seed in range(50):
+        assert explore(puente_03, (2, 2, 1, 2), seed)[0] is None
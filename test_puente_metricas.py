@@ -0,0 +1,39 @@
+"""
+Pruebas de las métricas del Monitor de puente_03
+"""
+
+from puente_03 import Monitor, NORTH, SOUTH
+from puente_metricas import Metrics, OCCUPANCY
+
+
+def test_plain_api_counts_exits():
+    '''
+    Con los cuatro métodos sin pasar el instante de entrada, las salidas,
+    la ocupación y el tiempo vacío se cuentan igual; sólo falta el tiempo
+    en el puente
+    '''
+    metrics = Metrics()
+    monitor = Monitor(metrics)
+    monitor.wants_enter_car(NORTH)
+    monitor.leaves_car(NORTH)
+    monitor.wants_enter_pedestrian()
+    monitor.leaves_pedestrian()
+    monitor.wants_enter_cars(SOUTH, 3)
+    monitor.leaves_cars(SOUTH, 3)
+    snap = metrics.snapshot()
+    assert metrics.counters[OCCUPANCY] == 0
+    assert [snap[name]['finished'] for name in ('north', 'south', 'ped')] == [1, 3, 1]
+    assert snap['throughput'] > 0
+    assert snap['idle_fraction'] > 0
+    assert snap['north']['bridge_p50_p95_p99'] == (None, None, None)
+    assert metrics.snapshot()['idle_fraction'] >= snap['idle_fraction']
+
+
+def test_entered_measures_the_bridge_time():
+    metrics = Metrics()
+    monitor = Monitor(metrics)
+    entered = monitor.wants_enter_pedestrian()
+    monitor.leaves_pedestrian(entered)
+    snap = metrics.snapshot()
+    assert snap['ped']['finished'] == 1
+    assert None not in snap['ped']['bridge_p50_p95_p99']
@@ -0,0 +1,76 @@
+"""
+Pruebas de MqttPublisher contra LocalBroker
+"""
+
+import time
+import threading
+
+import pytest
+
+from puente_03 import Monitor, NORTH, SOUTH, WANTS
+from puente_mqtt import LocalBroker, MqttPublisher
+
+
+@pytest.fixture
+def broker():
+    broker = LocalBroker()
+    yield broker
+    broker.close()
+
+
+def events(broker: LocalBroker) -> list:
+    return [len(e) for _, e in broker.messages()]
+
+
+def test_batch_size(broker):
+    publisher = MqttPublisher(broker.connect, batch=10, period=60)
+    monitor = Monitor()
+    publisher.start()
+    for vid in range(25):
+        publisher.record(vid, NORTH, WANTS, monitor)
+    time.sleep(0.3)
+    assert events(broker) == [10, 10] #el resto espera a llenar el lote
+    publisher.stop()
+    assert events(broker) == [10, 10, 5]
+
+
+def test_flush_period(broker):
+    publisher = MqttPublisher(broker.connect, batch=1000, period=0.1)
+    monitor = Monitor()
+    publisher.start()
+    for vid in range(3):
+        publisher.record(vid, SOUTH, WANTS, monitor)
+    time.sleep(0.5)
+    messages = broker.messages()
+    publisher.stop()
+    assert [(topic, len(e)) for topic, e in messages] == [('puente/0/south', 3)]
+
+
+def test_full_buffer_blocks(broker):
+    publisher = MqttPublisher(broker.connect, capacity=4)
+    monitor = Monitor()
+    writer = threading.Thread(
+        target=lambda: [publisher.record(vid, NORTH, WANTS, monitor) for vid in range(6)],
+        daemon=True)
+    writer.start()
+    writer.join(0.3)
+    assert writer.is_alive() #sin publicador no hay sitio para el quinto
+    assert publisher.head.value == 5 and publisher.tail.value == 0
+    publisher.start()
+    writer.join(5)
+    assert not writer.is_alive()
+    publisher.stop()
+    assert sum(events(broker)) == 6 #no se pierde ninguno
+
+
+def test_stop_drains_pending(broker):
+    broker.delay = 0.001 #broker lento: el buffer se llena
+    publisher = MqttPublisher(broker.connect, batch=7, period=60, capacity=16)
+    monitor = Monitor()
+    publisher.start()
+    for vid in range(200):
+        publisher.record(vid, NORTH if vid % 2 else SOUTH, WANTS, monitor)
+    publisher.stop()
+    messages = broker.messages()
+    assert sum(len(e) for _, e in messages) == 200
+    assert sorted(ev['vid'] for _, e in messages for ev in e) == list(range(200))
@@ -0,0 +1,24 @@
+"""
+Pruebas del informe del perfilador
+"""
+
+from puente_03 import Monitor, NORTH
+from puente_perfil import profile, show, METHODS, NTIMES, CALLS
+
+
+def test_report_without_samples(capsys):
+    '''
+    Una llamada contada que aún no tiene muestras de espera ni de posesión
+    (sigue dentro del monitor) sale con p99 None y '-' en el informe
+    '''
+    monitor = Monitor()
+    profiler = profile(monitor)
+    monitor.wants_enter_car(NORTH)
+    m = METHODS.index('leaves_car')
+    profiler.stats.times[m * NTIMES + CALLS] = 1
+    r = profiler.report()
+    assert r['methods']['leaves_car']['acquire_p99'] is None
+    assert r['methods']['leaves_car']['hold_p99'] is None
+    assert r['methods']['wants_enter_car']['hold_p99'] is not None
+    show(r)
+    assert '-' in capsys.readouterr().out
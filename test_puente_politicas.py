@@ -0,0 +1,70 @@
+"""
+Pruebas de las políticas de admisión de puente_politicas
+"""
+
+import pytest
+
+from puente_03 import NORTH, SOUTH, PED
+from puente_politicas import QuotaRotation, MaxBatch, TimeSlice, Adaptive
+from puente_politicas import make_policy
+from puente_sim import simulate
+from test_puente_03 import baton_run
+
+
+def test_quota_rotation_is_abstract():
+    with pytest.raises(TypeError):
+        QuotaRotation()
+
+
+def test_make_policy():
+    assert isinstance(make_policy('batch:5'), MaxBatch)
+    assert isinstance(make_policy('slice:2.5'), TimeSlice)
+    assert make_policy('fair:2,2,1:3').weights == (2, 2, 1)
+    assert isinstance(make_policy('adaptive'), Adaptive)
+    for spec in ('nope', 'batch:0', 'slice:-1', 'fair:1,1'):
+        with pytest.raises(ValueError):
+            make_policy(spec)
+
+
+def runs(records: list) -> list:
+    '''
+    Clase y número de vehículos de cada tanda seguida de la misma clase, en
+    orden de entrada
+    '''
+    result = []
+    for v in sorted(records, key=lambda v: v[3]):
+        if result and result[-1][0] == v[0]:
+            result[-1][1] += 1
+        else:
+            result.append([v[0], 1])
+    return result
+
+
+def test_max_batch_caps_turns():
+    '''
+    Con las dos colas de coches llenas, cada turno admite como mucho dos y
+    el turno pasa cuando el puente se vacía
+    '''
+    trace = [(0.0, PED, 10.0)]
+    trace += [(1.0 + i, NORTH, 1.0) for i in range(5)]
+    trace += [(1.5 + i, SOUTH, 1.0) for i in range(5)]
+    records = simulate(arrivals=trace, policy=MaxBatch(2))
+    assert runs(records) == [[PED, 1], [NORTH, 2], [SOUTH, 2], [NORTH, 2],
+                             [SOUTH, 2], [NORTH, 1], [SOUTH, 1]]
+    assert all(v[4] is not None for v in records)
+
+
+@pytest.mark.parametrize('spec', ['batch:1', 'batch:3', 'slice:2', 'fair:2,2,1:2',
+                                  'adaptive:20'])
+def test_policies_complete(spec):
+    records = simulate(ncars=300, nped=30, time_cars_north=0.4, time_cars_south=0.4,
+                       time_ped=4, seed=2, policy=make_policy(spec))
+    assert all(v[4] is not None for v in records)
+
+
+@pytest.mark.parametrize('spec', ['batch:1', 'batch:2', 'fair:2,2,1:1'])
+@pytest.mark.parametrize('seed', range(10))
+def test_policies_interleavings(monkeypatch, spec, seed):
+    kind, message, monitor, notified = baton_run(monkeypatch, seed, (2, 2, 1, 2),
+                                                 policy=make_policy(spec))
+    assert kind is None, message
@@ -0,0 +1,45 @@
+"""
+Pruebas del enrutador y de las métricas de puente_red, sin trabajadores:
+los trabajos se quedan en las colas de la red
+"""
+
+from puente_03 import NORTH, SOUTH
+from puente_red import Network, Router, silent_car
+
+
+def test_routed_but_not_admitted_count():
+    '''
+    Otro generador (otra copia del enrutador) ve el coche del norte enviado
+    al puente 0 aunque aún no haya entrado, y manda el del sur al puente 1;
+    cuando el del norte ha cruzado, el puente 0 vuelve a estar libre
+    '''
+    network = Network(2)
+    assert Router(network).send(NORTH, silent_car, (1, NORTH)) == 0
+    assert Router(network).send(SOUTH, silent_car, (1, SOUTH)) == 1
+    monitor = network.monitors[0]
+    monitor.wants_enter_car(NORTH)
+    monitor.leaves_car(NORTH)
+    router = Router(network)
+    assert router.pending(0, NORTH) == 0 and router.pending(1, SOUTH) == 1
+    assert router.send(SOUTH, silent_car, (2, SOUTH)) == 0
+
+
+def test_burst_spreads_over_bridges():
+    network = Network(3)
+    bridges = [Router(network).send(NORTH, silent_car, (cid, NORTH))
+               for cid in range(1, 7)]
+    assert sorted(bridges) == [0, 0, 1, 1, 2, 2]
+
+
+def test_snapshot_reuses_metrics():
+    network = Network(2)
+    for monitor in network.monitors:
+        monitor.wants_enter_car(SOUTH)
+        monitor.leaves_car(SOUTH)
+    total = network.total
+    first = network.snapshot()
+    second = network.snapshot()
+    assert network.total is total
+    assert sum(total.hist) == 2
+    assert first['south']['wait_p50_p95_p99'] == second['south']['wait_p50_p95_p99']
+    assert second['south']['admitted'] == second['south']['finished'] == 2
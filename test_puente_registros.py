@@ -0,0 +1,41 @@
+"""
+Pruebas del RecordStore con el simulador
+"""
+
+import numpy as np
+
+from puente_03 import StrictRotation, NORTH, SOUTH, PED
+from puente_registros import RecordStore
+from puente_sim import simulate
+
+
+class NoPedestrians(StrictRotation):
+    '''
+    Política rota: los peatones no entran nunca
+    '''
+
+    def admits(self, monitor, cls: int) -> bool:
+        return cls != PED and super().admits(monitor, cls)
+
+
+def test_store_matches_records():
+    trace = [(0.5 * i, i % 3, 1.0 + 0.1 * i) for i in range(30)]
+    records = simulate(arrivals=trace)
+    store = RecordStore(10, 10, shared=False)
+    assert simulate(arrivals=trace, store=store) == []
+    columns = store.columns()
+    for cls, vid, arrival, enter, exit, _ in records:
+        i = store.row(cls, vid)
+        assert (columns['arrival'][i], columns['enter'][i], columns['exit'][i]) == \
+            (arrival, enter, exit)
+
+
+def test_store_keeps_stuck_vehicles():
+    trace = [(0.0, NORTH, 1.0), (0.5, PED, 5.0), (2.0, SOUTH, 1.0)]
+    records = simulate(arrivals=trace, policy=NoPedestrians())
+    assert [v[3] for v in records if v[0] == PED] == [None]
+    store = RecordStore(1, 1, shared=False)
+    simulate(arrivals=trace, policy=NoPedestrians(), store=store)
+    i = store.row(PED, 1)
+    assert store.columns()['arrival'][i] == 0.5
+    assert np.isnan(store.columns()['enter'][i]) and np.isnan(store.columns()['exit'][i])
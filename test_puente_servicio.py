@@ -0,0 +1,144 @@
+"""
+Pruebas del servicio de puente_servicio por socket Unix, en local: un
+servidor en otro proceso y RemoteMonitor desde varios hilos
+"""
+
+import os
+import time
+import socket
+import threading
+
+import pytest
+
+from puente_03 import NORTH, SOUTH, PED
+from puente_servicio import RemoteMonitor, start_server, REQUEST, RESPONSE, OK
+
+CLASSES = (NORTH, SOUTH, PED)
+
+
+@pytest.fixture
+def address():
+    path = f"/tmp/puente_servicio_test_{os.getpid()}.sock"
+    server = start_server(f"unix:{path}")
+    yield f"unix:{path}"
+    server.terminate()
+    server.join()
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def run(threads: list) -> None:
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+        assert not t.is_alive(), "un vehículo no termina de cruzar"
+
+
+def disconnected(method, *args) -> None:
+    '''
+    Una petición que puede quedarse sin respuesta porque su cliente cierra
+    '''
+    try:
+        method(*args)
+    except ConnectionError:
+        pass
+
+
+def test_mutual_exclusion_with_pipelined_threads(address):
+    '''
+    Hilos de las tres clases comparten una conexión: sus peticiones van a la
+    vez por el mismo socket y nunca hay dos clases en el puente
+    '''
+    monitor = RemoteMonitor(address)
+    lock = threading.Lock()
+    bridge = [0, 0, 0]
+    errors = []
+
+    def vehicle(cls: int, laps: int) -> None:
+        for _ in range(laps):
+            if cls == PED:
+                monitor.wants_enter_pedestrian()
+            else:
+                monitor.wants_enter_car(cls)
+            with lock:
+                bridge[cls] += 1
+                if any(bridge[k] for k in CLASSES if k != cls):
+                    errors.append(list(bridge))
+            with lock:
+                bridge[cls] -= 1
+            if cls == PED:
+                monitor.leaves_pedestrian()
+            else:
+                monitor.leaves_car(cls)
+
+    run([threading.Thread(target=vehicle, args=(cls, 50))
+         for cls in (NORTH, NORTH, SOUTH, SOUTH, SOUTH, PED)])
+    monitor.close()
+    assert errors == []
+
+
+def test_responses_out_of_order(address):
+    '''
+    Un coche del sur que espera en la conexión no retrasa la salida del
+    coche del norte que le deja entrar
+    '''
+    monitor = RemoteMonitor(address)
+    monitor.wants_enter_car(NORTH)
+    south = threading.Thread(target=monitor.wants_enter_car, args=(SOUTH,))
+    south.start()
+    monitor.leaves_car(NORTH)
+    south.join(10)
+    assert not south.is_alive()
+    monitor.leaves_car(SOUTH)
+    monitor.close()
+
+
+def test_disconnect_frees_the_bridge(address):
+    '''
+    Un cliente se desconecta con un coche del norte en el puente y otro del
+    norte pendiente de respuesta, que se queda sin ella; el servidor los
+    saca a los dos y entran el peatón y el coche del sur del otro cliente
+    '''
+    gone = RemoteMonitor(address)
+    gone.wants_enter_car(NORTH)
+    other = RemoteMonitor(address)
+    ped = threading.Thread(target=other.wants_enter_pedestrian)
+    ped.start()
+    late = threading.Thread(target=disconnected, args=(gone.wants_enter_car, NORTH))
+    late.start()
+    time.sleep(0.2) #que las dos peticiones lleguen al servidor antes del cierre
+    gone.close()
+    late.join(10)
+    ped.join(10)
+    assert not late.is_alive()
+    assert not ped.is_alive()
+    other.leaves_pedestrian()
+    other.wants_enter_car(SOUTH)
+    other.leaves_car(SOUTH)
+    other.close()
+
+
+def test_unknown_response_id_is_ignored(tmp_path):
+    '''
+    Una respuesta con un id que nadie espera no tumba al hilo lector
+    '''
+    path = str(tmp_path / 's.sock')
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+
+    def server() -> None:
+        conn, _ = listener.accept()
+        with conn:
+            for _ in range(2):
+                rid, _, _ = REQUEST.unpack(conn.recv(REQUEST.size))
+                conn.sendall(RESPONSE.pack(rid + 1000, OK) + RESPONSE.pack(rid, OK))
+
+    t = threading.Thread(target=server, daemon=True)
+    t.start()
+    monitor = RemoteMonitor(f"unix:{path}")
+    run([threading.Thread(target=lambda: (monitor.wants_enter_car(NORTH),
+                                          monitor.leaves_car(NORTH)))])
+    monitor.close()
+    listener.close()
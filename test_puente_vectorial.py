@@ -0,0 +1,66 @@
+"""
+Pruebas de la evaluación vectorizada de puente_vectorial frente a
+puente_sim, con horarios pequeños con semilla
+"""
+
+import numpy as np
+import pytest
+
+from puente_03 import NORTH, SOUTH, PED
+from puente_sim import simulate
+from puente_politicas import make_policy
+from puente_vectorial import evaluate, generate, check, RATES, STEP
+
+POLICIES = ['strict', 'batch:1', 'batch:3', 'batch:10', 'slice:0.5', 'slice:3']
+
+
+def simulated(arrival, cls, duration, policy: str) -> np.ndarray:
+    '''
+    Instantes de entrada de puente_sim, en el orden de los arrays
+    '''
+    records = simulate(arrivals=zip(arrival.tolist(), cls.tolist(), duration.tolist()),
+                       policy=make_policy(policy))
+    entered = {(v[0], v[1]): v[3] for v in records}
+    ids = [0, 0, 0]
+    enter = []
+    for k in cls.tolist():
+        ids[k] += 1
+        enter.append(entered[k, ids[k]])
+    return np.array(enter, dtype=float)
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('step', [None, STEP, 1.0])
+def test_matches_simulation(policy, seed, step):
+    '''
+    Mismas entradas que puente_sim de puente casi vacío a saturado, también
+    con las llegadas redondeadas (llegadas simultáneas de varias clases)
+    '''
+    load = 0.2 + seed / 2
+    arrival, cls, duration = generate(200, seed, {k: r * load for k, r in RATES.items()})
+    if step is not None:
+        arrival = np.round(arrival / step) * step
+    enter, exit = evaluate(arrival, cls, duration, policy)
+    assert np.allclose(enter, simulated(arrival, cls, duration, policy), rtol=0, atol=1e-9)
+    assert np.allclose(exit, enter + duration)
+
+
+@pytest.mark.parametrize('order', [(SOUTH, NORTH, SOUTH), (NORTH, SOUTH, SOUTH),
+                                   (PED, SOUTH, NORTH)])
+def test_simultaneous_arrivals_in_input_order(order):
+    '''
+    Con el puente vacío entra primero la clase que aparece antes, como en
+    puente_sim, y no la de menor número
+    '''
+    arrival = np.ones(3)
+    cls = np.array(order)
+    duration = np.ones(3)
+    enter, _ = evaluate(arrival, cls, duration)
+    assert enter[0] == 1.0
+    assert enter.tolist() == simulated(arrival, cls, duration, 'strict').tolist()
+
+
+@pytest.mark.parametrize('policy', ['strict', 'batch:3', 'slice:3'])
+def test_check(policy):
+    assert check(policy, n=100, seeds=4) < 1e-9